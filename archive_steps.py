@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+步驟歸檔腳本
+立即執行一輪保留策略，將舊任務的步驟壓縮歸檔
+"""
+
+import os
+import sys
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.app_factory import create_app
+from src.retention import RetentionPolicy, run_retention
+
+# 不做啟動時的版本檢查，也不啟動後台線程
+app = create_app(check_schema=False)
+
+
+def archive_steps(policy: RetentionPolicy):
+    """循環執行直到沒有可歸檔的任務"""
+    total = {'tasks': 0, 'steps': 0, 'blobs_removed': 0}
+    with app.app_context():
+        try:
+            while True:
+                stats = run_retention(policy)
+                for key in total:
+                    total[key] += stats[key]
+                if stats['tasks'] < policy.max_tasks:
+                    break
+        except Exception as e:
+            print(f"❌ 歸檔失敗: {str(e)}")
+            return None
+
+    return total
+
+
+if __name__ == "__main__":
+    defaults = RetentionPolicy.from_env() or RetentionPolicy()
+
+    parser = argparse.ArgumentParser(description='歸檔舊任務的步驟')
+    parser.add_argument('--days', type=int, default=defaults.days, help='任務完成多少天後歸檔')
+    parser.add_argument('--statuses', default=','.join(defaults.statuses), help='需要歸檔的任務狀態，逗號分隔')
+    parser.add_argument('--batch-size', type=int, default=defaults.batch_size, help='每批刪除的步驟數')
+    args = parser.parse_args()
+
+    policy = RetentionPolicy(
+        days=args.days,
+        statuses=[s.strip() for s in args.statuses.split(',') if s.strip()],
+        batch_size=args.batch_size,
+        max_tasks=defaults.max_tasks,
+    )
+
+    print(f"開始歸檔 {args.days} 天前的任務步驟...")
+    total = archive_steps(policy)
+    if total is None:
+        sys.exit(1)
+
+    print(f"✅ 歸檔完成：{total['tasks']} 個任務，{total['steps']} 個步驟，清理壓縮內容 {total['blobs_removed']} 條")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+ASGI 與 Flask 部署的長輪詢對比
+
+分別啟動 gunicorn（同步工作進程，src.main:app）和 uvicorn（src.asgi:app），
+用 N 個連接同時長輪詢 N 個任務（GET /api/tasks/<id>/wait），測量：
+- 監聽者都在等待時普通請求（/api/health）的延遲
+- 所有任務更新後，監聽者收到變化的數量和延遲
+- 服務進程的內存佔用（RSS，包括所有工作進程）
+
+gunicorn 每個工作進程同時只能處理一個請求，等待中的長輪詢會佔滿工作進程。
+
+用法：
+    python benchmarks/asgi_watchers.py --watchers 500 --gunicorn-workers 4
+"""
+
+import os
+import sys
+import time
+import shutil
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+import statistics
+import subprocess
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+bench_dir = tempfile.mkdtemp(prefix='lynus-bench-')
+DB_PATH = os.path.join(bench_dir, 'bench.db')
+os.environ['DATABASE_URL'] = f"sqlite:///{DB_PATH}"
+os.environ['LYNUS_ARTIFACT_DIR'] = os.path.join(bench_dir, 'artifacts')
+os.environ['LYNUS_RATE_LIMIT_ENABLED'] = '0'
+
+from src.app_factory import create_app
+from src.models.user import db
+from src import migrations, task_watch
+
+
+def setup(watchers: int):
+    """創建用戶和任務，返回（會話 Cookie, {task_id: cursor}）"""
+    app = create_app(serverless=True)
+    with app.app_context():
+        migrations.upgrade(db.engine)
+
+    client = app.test_client()
+    client.post('/api/auth/register', json={'username': 'bench', 'email': 'bench@example.com', 'password': 'secret123'})
+    client.post('/api/tasks/batch', json={'tasks': [
+        {'title': f'Task {i}', 'description': f'Watcher benchmark task {i}'} for i in range(watchers)
+    ]})
+    cookie = client.get_cookie('session').value
+    with app.app_context():
+        ids = [row[0] for row in db.session.execute(db.text("SELECT id FROM task")).all()]
+        cursors = {task_id: state['cursor'] for task_id, (_, state) in task_watch.read_states(ids).items()}
+    return cookie, cursors
+
+
+async def http_get(port: int, path: str, cookie: str = '', timeout: float = 60):
+    """最簡單的 HTTP/1.1 GET，返回（狀態碼, 完成時間）"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: session={cookie}\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), timeout)
+        return int(data.split(b' ', 2)[1]), time.perf_counter()
+    finally:
+        writer.close()
+
+
+def rss_mb(pid: int) -> float:
+    """進程及其子進程的 RSS 總和"""
+    total = 0
+    pids = [pid]
+    try:
+        children = subprocess.run(['pgrep', '-P', str(pid)], capture_output=True, text=True).stdout.split()
+        pids += [int(child) for child in children]
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open(f'/proc/{p}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+async def run_watchers(port: int, pid: int, cookie: str, cursors, wait_timeout: float, probe_timeout: float):
+    watchers = [
+        asyncio.ensure_future(http_get(port, f'/api/tasks/{task_id}/wait?since={cursor}&timeout={wait_timeout}',
+                                       cookie, wait_timeout + 30))
+        for task_id, cursor in cursors.items()
+    ]
+    # 等所有連接建立並進入等待
+    await asyncio.sleep(2)
+    rss = rss_mb(pid)
+
+    start = time.perf_counter()
+    try:
+        await http_get(port, '/api/health', timeout=probe_timeout)
+        probe = (time.perf_counter() - start) * 1000
+    except (asyncio.TimeoutError, OSError):
+        probe = None
+
+    # 更新所有任務
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("UPDATE task SET progress = 50, status = 'running', updated_at = CURRENT_TIMESTAMP")
+    conn.commit()
+    conn.close()
+    updated = time.perf_counter()
+
+    results = await asyncio.gather(*watchers, return_exceptions=True)
+    latencies = sorted(
+        (finished - updated) * 1000 for result in results
+        if not isinstance(result, BaseException) and result[0] == 200
+        for finished in [result[1]]
+    )
+    return probe, latencies, rss
+
+
+def wait_ready(port: int, process, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Server exited during startup')
+        try:
+            asyncio.run(http_get(port, '/api/health', timeout=1))
+            return
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            time.sleep(0.2)
+    raise RuntimeError('Server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lynus ASGI 與 Flask 長輪詢對比')
+    parser.add_argument('--watchers', type=int, default=500, help='同時長輪詢的連接數')
+    parser.add_argument('--gunicorn-workers', type=int, default=4, help='gunicorn 同步工作進程數')
+    parser.add_argument('--wait-timeout', type=float, default=20, help='長輪詢超時（秒）')
+    parser.add_argument('--probe-timeout', type=float, default=10, help='普通請求的最長等待（秒）')
+    args = parser.parse_args()
+
+    cookie, cursors = setup(args.watchers)
+    servers = {
+        f'gunicorn x{args.gunicorn_workers}': [
+            'gunicorn', '-w', str(args.gunicorn_workers), '-b', '127.0.0.1:{port}',
+            '--backlog', str(args.watchers * 2), '--timeout', str(int(args.wait_timeout * 3)), 'src.main:app'
+        ],
+        'uvicorn x1': [
+            sys.executable, '-m', 'uvicorn', 'src.asgi:app', '--port', '{port}',
+            '--backlog', str(args.watchers * 2), '--log-level', 'warning'
+        ],
+    }
+
+    print(f"{args.watchers} 個長輪詢連接，更新任務後統計收到變化的連接")
+    print(f"{'部署':<16}{'health(ms)':>12}{'收到變化':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'RSS(MB)':>10}")
+    for port, (name, command) in enumerate(servers.items(), start=18401):
+        if shutil.which(command[0]) is None:
+            print(f"{name:<16}未安裝 {command[0]}，跳過")
+            continue
+
+        # 每輪重置任務狀態
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("UPDATE task SET progress = 0, status = 'pending'")
+        conn.commit()
+        conn.close()
+        with create_app(serverless=True).app_context():
+            cursors = {task_id: state['cursor'] for task_id, (_, state) in task_watch.read_states(list(cursors)).items()}
+
+        process = subprocess.Popen(
+            [part.replace('{port}', str(port)) for part in command],
+            cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_ready(port, process)
+            probe, latencies, rss = asyncio.run(
+                run_watchers(port, process.pid, cookie, cursors, args.wait_timeout, args.probe_timeout)
+            )
+        finally:
+            process.terminate()
+            process.wait()
+
+        probe_text = f"{probe:.1f}" if probe is not None else f">{args.probe_timeout * 1000:.0f}"
+        p50 = f"{statistics.median(latencies):.0f}" if latencies else '-'
+        p95 = f"{latencies[int(len(latencies) * 0.95) - 1]:.0f}" if latencies else '-'
+        print(f"{name:<16}{probe_text:>12}{len(latencies):>10}{p50:>10}{p95:>10}{rss:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+批量創建任務基準測試
+
+比較逐個調用 POST /api/tasks/create 與一次 POST /api/tasks/batch
+創建 N 個任務的耗時（使用 Flask 測試客戶端，包含認證、驗證和提交）。
+
+用法：
+    python benchmarks/batch_create.py --count 500
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='lynus-bench-'), 'bench.db')}"
+
+from src.app_factory import create_app
+from src.models.user import db, Task
+from src import migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lynus 批量創建任務基準測試')
+    parser.add_argument('--count', type=int, default=500, help='創建的任務數')
+    args = parser.parse_args()
+
+    app = create_app(serverless=True)
+    with app.app_context():
+        migrations.upgrade(db.engine)
+
+    client = app.test_client()
+    client.post('/api/auth/register', json={'email': 'bench@example.com', 'password': 'secret123'})
+
+    items = [
+        {'title': f'批量任務 {i}', 'description': f'生成第 {i} 份報告的網頁', 'task_type': 'webpage'}
+        for i in range(args.count)
+    ]
+
+    start = time.perf_counter()
+    for item in items:
+        response = client.post('/api/tasks/create', json=item)
+        assert response.status_code == 201, response.get_json()
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post('/api/tasks/batch', json={'tasks': items})
+    assert response.status_code == 201, response.get_json()
+    batch = time.perf_counter() - start
+
+    with app.app_context():
+        total = Task.query.count()
+
+    print(f"創建 {args.count} 個任務（數據庫中共 {total} 個）")
+    print(f"{'方式':<12}{'耗時(s)':>10}{'任務/秒':>12}")
+    print(f"{'逐個創建':<12}{single:>10.3f}{args.count / single:>12.1f}")
+    print(f"{'批量創建':<12}{batch:>10.3f}{args.count / batch:>12.1f}")
+    print(f"加速: {single / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
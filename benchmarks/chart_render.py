@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+圖表渲染基準測試
+
+生成包含指定點數的 CSV（默認5,000,000點），上傳到產物存儲後分別渲染折線圖
+（LTTB 和 min-max 降採樣）、散點圖和柱狀圖，報告首次渲染（進程池中讀取、降採樣、
+生成 SVG）和命中緩存的耗時、輸入/輸出點數以及 SVG 大小。
+
+用法：
+    python benchmarks/chart_render.py --points 5000000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('LYNUS_ARTIFACT_DIR', tempfile.mkdtemp(prefix='lynus-bench-artifacts-'))
+
+import numpy as np
+
+from src import artifact_store, chart_renderer
+
+
+def generate_csv(path: str, points: int) -> None:
+    """寫入帶噪聲和尖峰的時間序列"""
+    rng = np.random.default_rng(42)
+    with open(path, 'w') as f:
+        f.write('t,value,region\n')
+        for start in range(0, points, 500000):
+            t = np.arange(start, min(start + 500000, points))
+            value = np.sin(t / 40000) * 100 + rng.normal(0, 5, len(t))
+            value[rng.random(len(t)) < 1e-5] += 300
+            regions = np.array(['north', 'south', 'east', 'west'])[t % 4]
+            f.write(''.join(f"{a},{b:.3f},{c}\n" for a, b, c in zip(t.tolist(), value.tolist(), regions.tolist())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lynus 圖表渲染基準測試')
+    parser.add_argument('--points', type=int, default=5000000, help='數據點數')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='lynus-bench-chart-')
+    csv_path = os.path.join(workdir, 'series.csv')
+    start = time.perf_counter()
+    generate_csv(csv_path, args.points)
+    with open(csv_path, 'rb') as f:
+        digest = artifact_store.put_stream(f, 'text/csv')['hash']
+    os.unlink(csv_path)
+    print(f"生成並上傳 {args.points} 個數據點，耗時 {time.perf_counter() - start:.1f}s")
+
+    charts = [
+        {'chart_type': 'line', 'x': 't', 'y': 'value', 'downsample': 'lttb'},
+        {'chart_type': 'line', 'x': 't', 'y': 'value', 'downsample': 'minmax'},
+        {'chart_type': 'scatter', 'x': 't', 'y': 'value'},
+        {'chart_type': 'bar', 'x': 'region', 'y': 'value'},
+    ]
+
+    print(f"{'圖表':<16}{'首次(s)':>10}{'緩存(s)':>10}{'輸入點數':>12}{'輸出點數':>10}{'SVG(KB)':>10}")
+    for chart in charts:
+        params = dict(chart, file=digest, title='benchmark')
+        start = time.perf_counter()
+        result = chart_renderer.render(params)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        cached = chart_renderer.render(params)
+        warm = time.perf_counter() - start
+        assert cached['cached'] and cached['artifact'] == result['artifact']
+        name = f"{chart['chart_type']}/{chart.get('downsample', '-')}" if chart['chart_type'] == 'line' else chart['chart_type']
+        print(f"{name:<16}{cold:>10.2f}{warm:>10.4f}{result['points_in']:>12}"
+              f"{result['points_rendered']:>10}{result['size'] / 1024:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+數據庫寫入競爭基準測試
+
+模擬多個Agent線程同時寫入任務步驟（與 LynusAgent._add_task_step 相同的
+查詢+插入+提交模式），比較 SQLite 默認 PRAGMA 與 WAL 調優後的吞吐量和
+"database is locked" 錯誤數。
+
+用法：
+    python benchmarks/db_contention.py --writers 16 --steps 200
+    DATABASE_URL=postgresql://... python benchmarks/db_contention.py --modes env
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+from src.models.user import db, User, Task, TaskStep
+from src.db_engine import configure_database
+
+# 每種模式對應的環境變量，"env" 表示直接使用當前環境
+MODES = {
+    'default': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_BUSY_TIMEOUT_MS': '0',
+    },
+    'tuned': {
+        'SQLITE_JOURNAL_MODE': 'WAL',
+        'SQLITE_SYNCHRONOUS': 'NORMAL',
+        'SQLITE_BUSY_TIMEOUT_MS': '5000',
+    },
+    'env': {},
+}
+
+
+def build_app(db_path: str) -> Flask:
+    app = Flask(__name__)
+    if db_path:
+        os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    configure_database(app)
+    db.init_app(app)
+    return app
+
+
+def writer(app: Flask, task_id: int, steps: int, stats: dict, lock: threading.Lock) -> None:
+    """單個Agent寫入線程"""
+    ok = errors = 0
+    with app.app_context():
+        for i in range(steps):
+            try:
+                last_step = TaskStep.query.filter_by(task_id=task_id).order_by(TaskStep.step_number.desc()).first()
+                step_number = (last_step.step_number + 1) if last_step else 1
+                db.session.add(TaskStep(
+                    task_id=task_id,
+                    step_number=step_number,
+                    step_type='thought',
+                    content='x' * 2048
+                ))
+                db.session.commit()
+                ok += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+        db.session.remove()
+
+    with lock:
+        stats['ok'] += ok
+        stats['errors'] += errors
+
+
+def run_mode(mode: str, writers: int, steps: int) -> dict:
+    saved_env = {key: os.environ.get(key) for key in list(MODES['default']) + ['DATABASE_URL']}
+    os.environ.update(MODES[mode])
+
+    tmpdir = tempfile.mkdtemp(prefix='lynus-bench-')
+    db_path = os.path.join(tmpdir, 'bench.db') if mode != 'env' or not os.getenv('DATABASE_URL') else ''
+    app = build_app(db_path)
+
+    try:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            user = User(username='bench', email='bench@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            task_ids = []
+            for i in range(writers):
+                task = Task(user_id=user.id, title=f'bench {i}', description='bench', task_type='general')
+                db.session.add(task)
+                db.session.commit()
+                task_ids.append(task.id)
+
+        stats = {'ok': 0, 'errors': 0}
+        lock = threading.Lock()
+        threads = [
+            threading.Thread(target=writer, args=(app, task_id, steps, stats, lock))
+            for task_id in task_ids
+        ]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        with app.app_context():
+            db.drop_all()
+            db.engine.dispose()
+    finally:
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    stats['elapsed'] = elapsed
+    stats['rate'] = stats['ok'] / elapsed if elapsed else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lynus 數據庫寫入競爭基準測試')
+    parser.add_argument('--writers', type=int, default=16, help='並發寫入線程數')
+    parser.add_argument('--steps', type=int, default=200, help='每個線程寫入的步驟數')
+    parser.add_argument('--modes', default='default,tuned', help='逗號分隔：default, tuned, env')
+    args = parser.parse_args()
+
+    print(f"並發寫入者: {args.writers}，每個寫入 {args.steps} 個步驟")
+    print(f"{'模式':<10}{'成功':>10}{'鎖錯誤':>10}{'耗時(s)':>12}{'步驟/秒':>12}")
+    for mode in args.modes.split(','):
+        mode = mode.strip()
+        if mode not in MODES:
+            print(f"未知模式: {mode}")
+            continue
+        stats = run_mode(mode, args.writers, args.steps)
+        print(f"{mode:<10}{stats['ok']:>10}{stats['errors']:>10}{stats['elapsed']:>12.2f}{stats['rate']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
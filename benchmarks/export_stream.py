@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+流式導出基準測試
+
+創建 N 個任務，比較一次性載入全部任務序列化（原 /api/users/users 的做法）與
+GET /api/tasks/export 流式導出（NDJSON / CSV）的總耗時、首字節時間和 Python
+內存峰值（tracemalloc）。流式導出的內存峰值只與批大小有關，不隨行數增長。
+
+用法：
+    python benchmarks/export_stream.py --tasks 50000 --batch-size 1000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='lynus-bench-'), 'bench.db')}"
+
+from src.app_factory import create_app
+from src.models.user import db, Task
+from src.json_provider import dumps
+from src import migrations, export
+
+
+def measure(fn):
+    """返回（結果, 耗時秒, 內存峰值 MB）"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lynus 流式導出基準測試')
+    parser.add_argument('--tasks', type=int, default=50000, help='任務數')
+    parser.add_argument('--batch-size', type=int, default=export.BATCH_SIZE, help='導出批大小')
+    args = parser.parse_args()
+    export.BATCH_SIZE = args.batch_size
+
+    app = create_app(serverless=True)
+    with app.app_context():
+        migrations.upgrade(db.engine)
+
+    client = app.test_client()
+    client.post('/api/auth/register', json={'username': 'bench', 'email': 'bench@example.com', 'password': 'secret123'})
+    client.post('/api/auth/login', json={'username': 'bench', 'password': 'secret123'})
+
+    with app.app_context():
+        user_id = db.session.execute(db.text("SELECT id FROM user LIMIT 1")).scalar()
+        start = time.perf_counter()
+        for offset in range(0, args.tasks, 10000):
+            db.session.execute(db.insert(Task), [
+                {
+                    'user_id': user_id, 'task_type': 'general', 'status': 'completed', 'progress': 100,
+                    'title': f'Export benchmark task #{i}',
+                    'description': f'Summarise the quarterly figures for team {i % 50} and publish the report',
+                    'result_data': f'{{"summary": "done {i}"}}',
+                }
+                for i in range(offset, min(offset + 10000, args.tasks))
+            ])
+            db.session.commit()
+        print(f"插入 {args.tasks} 個任務：{time.perf_counter() - start:.2f}s")
+
+        def load_all():
+            # 對照：一次查詢全部 ORM 對象並序列化為一個 JSON 數組（to_dict 逐個任務加載步驟）
+            tasks = Task.query.filter_by(user_id=user_id).all()
+            return len(dumps([task.to_dict(full=False) for task in tasks]))
+
+        size, elapsed, peak = measure(load_all)
+        db.session.remove()
+
+    print(f"{'方式':<16}{'總耗時(s)':>11}{'首字節(ms)':>12}{'行/s':>12}{'MB':>9}{'峰值MB':>9}")
+    print(f"{'一次性載入':<16}{elapsed:>11.2f}{elapsed * 1000:>12.1f}{args.tasks / elapsed:>12.0f}"
+          f"{size / 1024 / 1024:>9.1f}{peak:>9.1f}")
+
+    for output_format in export.FORMATS:
+        def stream():
+            # 測試客戶端在返回響應前已取出第一塊數據，首字節時間從發出請求算起
+            begin = time.perf_counter()
+            response = client.get('/api/tasks/export', query_string={'format': output_format}, buffered=False)
+            first_byte = None
+            total = 0
+            for chunk in response.response:
+                if first_byte is None:
+                    first_byte = time.perf_counter() - begin
+                total += len(chunk)
+            response.close()
+            return total, first_byte
+
+        (total, first_byte), elapsed, peak = measure(stream)
+        print(f"{'流式 ' + output_format:<16}{elapsed:>11.2f}{first_byte * 1000:>12.1f}{args.tasks / elapsed:>12.0f}"
+              f"{total / 1024 / 1024:>9.1f}{peak:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
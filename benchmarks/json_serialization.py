@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+JSON 序列化基準測試
+
+構造包含大量步驟和大 HTML 結果的任務負載（與 Task.to_dict() 結構相同），
+比較標準庫 json 與 FastJSONProvider（orjson）的序列化耗時，以及
+gzip 壓縮前後的響應大小。
+
+用法：
+    python benchmarks/json_serialization.py --steps 40 --step-size 2048 --result-size 200000
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.json_provider import FastJSONProvider, orjson
+from src.compression import GZIP_LEVEL
+
+
+def build_task(task_id: int, steps: int, step_size: int, result_size: int) -> dict:
+    html = ('<div class="row"><p>Lynus 生成的網頁內容 generated content</p></div>\n' * (result_size // 64 + 1))[:result_size]
+    return {
+        'id': task_id,
+        'user_id': 1,
+        'title': f'構建網頁 #{task_id}',
+        'description': '為Q3收入報告構建一個展示網頁' * 4,
+        'task_type': 'webpage',
+        'status': 'completed',
+        'progress': 100,
+        'result_data': json.dumps({'type': 'webpage', 'html': html}, ensure_ascii=False),
+        'result_truncated': False,
+        'created_at': '2024-08-01T12:00:00',
+        'updated_at': '2024-08-01T12:05:00',
+        'steps': [
+            {
+                'id': task_id * 1000 + i,
+                'task_id': task_id,
+                'step_number': i + 1,
+                'step_type': ('thought', 'action', 'observation')[i % 3],
+                'content': ('分析任務需求並制定計劃。' * (step_size // 12 + 1))[:step_size],
+                'content_truncated': False,
+                'timestamp': '2024-08-01T12:00:00',
+            }
+            for i in range(steps)
+        ],
+    }
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lynus JSON 序列化基準測試')
+    parser.add_argument('--tasks', type=int, default=20, help='每個響應包含的任務數')
+    parser.add_argument('--steps', type=int, default=40, help='每個任務的步驟數')
+    parser.add_argument('--step-size', type=int, default=2048, help='每個步驟的字符數')
+    parser.add_argument('--result-size', type=int, default=200000, help='result_data HTML 的字符數')
+    parser.add_argument('--repeat', type=int, default=20, help='重複次數')
+    args = parser.parse_args()
+
+    payload = {'tasks': [build_task(i, args.steps, args.step_size, args.result_size) for i in range(args.tasks)]}
+
+    app = Flask(__name__)
+    stdlib_provider = app.json
+    fast_provider = FastJSONProvider(app)
+
+    with app.app_context():
+        stdlib_body = stdlib_provider.response(payload).get_data()
+        fast_body = fast_provider.response(payload).get_data()
+
+        results = [
+            ('stdlib json', timed(lambda: stdlib_provider.response(payload), args.repeat), stdlib_body),
+            ('orjson' if orjson else 'fallback', timed(lambda: fast_provider.response(payload), args.repeat), fast_body),
+        ]
+
+    print(f"負載: {args.tasks} 個任務 × {args.steps} 個步驟，result_data {args.result_size} 字符")
+    if orjson is None:
+        print("未安裝 orjson，FastJSONProvider 使用標準庫回退")
+    print(f"{'序列化器':<14}{'耗時(ms)':>12}{'原始大小':>14}{'gzip大小':>14}{'gzip耗時(ms)':>16}")
+    for name, elapsed, body in results:
+        gzip_ms = timed(lambda: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), max(1, args.repeat // 4))
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        print(f"{name:<14}{elapsed:>12.2f}{len(body):>14,}{len(compressed):>14,}{gzip_ms:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
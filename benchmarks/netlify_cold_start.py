@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Netlify 函數冷啟動測試
+
+每次冷啟動在新的 Python 進程中導入 netlify/functions/main.py（模擬新容器），
+用模擬的 Netlify/API Gateway 事件調用 handler，分別記錄：
+- import: 導入函數模塊的耗時
+- cold: 第一次調用（構建應用 + 建表）的耗時
+- warm: 之後每次調用的耗時
+
+用法：
+    python benchmarks/netlify_cold_start.py --cold-starts 5 --warm 50
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子進程中執行的腳本
+CHILD = r'''
+import os, sys, json, time
+sys.path.insert(0, {root!r})
+sys.path.insert(0, os.path.join({root!r}, 'netlify', 'functions'))
+
+def event(method, path, body=None, cookie=None):
+    headers = {{'host': 'localhost', 'content-type': 'application/json'}}
+    if cookie:
+        headers['cookie'] = cookie
+    return {{
+        'httpMethod': method,
+        'path': path,
+        'headers': headers,
+        'multiValueHeaders': {{}},
+        'queryStringParameters': None,
+        'body': json.dumps(body) if body is not None else None,
+        'isBase64Encoded': False,
+        'requestContext': {{}},
+    }}
+
+start = time.perf_counter()
+import main as function
+import_ms = (time.perf_counter() - start) * 1000
+
+start = time.perf_counter()
+response = function.handler(event('POST', '/api/auth/register', {{'email': 'bench@example.com', 'password': 'secret123'}}), None)
+cold_ms = (time.perf_counter() - start) * 1000
+set_cookie = (response.get('headers') or {{}}).get('Set-Cookie')
+cookie = set_cookie.split(';')[0] if set_cookie else None
+
+warm = []
+warm_status = set()
+for i in range({warm}):
+    path = ('/api/health', '/api/tasks/list', '/api/tasks/stats')[i % 3]
+    start = time.perf_counter()
+    warm_status.add(function.handler(event('GET', path, cookie=cookie), None)['statusCode'])
+    warm.append((time.perf_counter() - start) * 1000)
+
+modules = sorted(m for m in ('src.agent_engine', 'requests') if m in sys.modules)
+print(json.dumps({{'import': import_ms, 'cold': cold_ms, 'warm': warm, 'status': response['statusCode'], 'warm_status': sorted(warm_status), 'loaded': modules}}))
+'''
+
+
+def run_cold_start(warm: int) -> dict:
+    tmpdir = tempfile.mkdtemp(prefix='lynus-netlify-')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'app.db')}")
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD.format(root=ROOT, warm=warm)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Netlify 函數冷/熱調用延遲')
+    parser.add_argument('--cold-starts', type=int, default=5, help='模擬的冷啟動次數')
+    parser.add_argument('--warm', type=int, default=50, help='每次冷啟動後的熱調用次數')
+    args = parser.parse_args()
+
+    imports, colds, warms = [], [], []
+    for _ in range(args.cold_starts):
+        result = run_cold_start(args.warm)
+        imports.append(result['import'])
+        colds.append(result['cold'])
+        warms.extend(result['warm'])
+
+    print(f"冷啟動 {args.cold_starts} 次，每次熱調用 {args.warm} 次")
+    print(f"首次調用狀態碼: {result['status']}，熱調用狀態碼: {result['warm_status']}")
+    print(f"冷啟動後已加載的重模塊: {result['loaded'] or '無'}")
+    print(f"{'階段':<10}{'中位數(ms)':>14}{'最大(ms)':>12}")
+    print(f"{'import':<10}{statistics.median(imports):>14.1f}{max(imports):>12.1f}")
+    print(f"{'cold':<10}{statistics.median(colds):>14.1f}{max(colds):>12.1f}")
+    if warms:
+        warms.sort()
+        p95 = warms[int(len(warms) * 0.95) - 1] if len(warms) >= 20 else max(warms)
+        print(f"{'warm':<10}{statistics.median(warms):>14.2f}{p95:>12.2f}  (p95)")
+
+
+if __name__ == "__main__":
+    main()
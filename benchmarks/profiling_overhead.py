@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+性能分析開銷基準測試
+
+比較 GET /api/tasks/list 在未啟用分析、管理員帶 X-Lynus-Profile 頭（cProfile +
+請求線程採樣）時的平均延遲，以及 Agent 線程採樣器以不同頻率運行時對 CPU
+密集型工作線程吞吐量的影響。
+
+用法：
+    python benchmarks/profiling_overhead.py --requests 200 --tasks 100
+"""
+
+import os
+import sys
+import time
+import timeit
+import argparse
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+bench_dir = tempfile.mkdtemp(prefix='lynus-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(bench_dir, 'bench.db')}"
+os.environ['LYNUS_PROFILE_DIR'] = os.path.join(bench_dir, 'profiles')
+os.environ['LYNUS_ADMIN_USERS'] = 'bench'
+
+from src.app_factory import create_app
+from src.models.user import db
+from src import migrations, profiling
+
+
+def timed_requests(client, count, headers=None):
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get('/api/tasks/list', query_string={'per_page': 100}, headers=headers or {})
+    return (time.perf_counter() - start) / count * 1000
+
+
+def agent_work(task_id, stop, counter):
+    profiling.tag_thread(task_id)
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+        counter[0] += 1
+
+
+def agent_throughput(seconds, workers, rate=None):
+    stop = threading.Event()
+    counters = [[0] for _ in range(workers)]
+    threads = [
+        threading.Thread(target=agent_work, args=(i + 1, stop, counters[i]), name=f'lynus-agent_{i}')
+        for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    if rate:
+        profiling.start_sampler(1 / rate, seconds + 5)
+    time.sleep(seconds)
+    samples = profiling.stop_sampler()['samples'] if rate else 0
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(c[0] for c in counters) / seconds, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lynus 性能分析開銷基準測試')
+    parser.add_argument('--requests', type=int, default=200, help='每種方式的請求數')
+    parser.add_argument('--tasks', type=int, default=100, help='任務數')
+    parser.add_argument('--seconds', type=float, default=3, help='每個採樣頻率的運行時間')
+    parser.add_argument('--workers', type=int, default=4, help='模擬的 Agent 線程數')
+    args = parser.parse_args()
+
+    app = create_app(serverless=True)
+    with app.app_context():
+        migrations.upgrade(db.engine)
+
+    client = app.test_client()
+    client.post('/api/auth/register', json={'username': 'bench', 'email': 'bench@example.com', 'password': 'secret123'})
+    client.post('/api/auth/login', json={'username': 'bench', 'password': 'secret123'})
+    client.post('/api/tasks/batch', json={'tasks': [
+        {'title': f'Task {i}', 'description': f'Profiling benchmark task {i}'} for i in range(args.tasks)
+    ]})
+
+    timed_requests(client, 10)
+    baseline = timed_requests(client, args.requests)
+    profiled = timed_requests(client, args.requests, {profiling.PROFILE_HEADER: '1'})
+    print(f"{'請求':<20}{'平均延遲(ms)':>14}")
+    print(f"{'未分析':<20}{baseline:>14.2f}")
+    print(f"{'X-Lynus-Profile':<20}{profiled:>14.2f}")
+
+    # 未帶請求頭時鉤子只檢查一次請求頭
+    with app.test_request_context('/api/tasks/list'):
+        hook = timeit.timeit(profiling._before_request, number=100000) / 100000 * 1e6
+    print(f"關閉時每個請求的鉤子開銷：{hook:.2f}µs")
+
+    print(f"\n{'Agent 採樣頻率':<20}{'迭代/s':>14}{'相對':>10}{'採樣數':>10}")
+    base, _ = agent_throughput(args.seconds, args.workers)
+    print(f"{'關閉':<20}{base:>14.0f}{1:>10.3f}{0:>10}")
+    for rate in (10, 100, 1000):
+        throughput, samples = agent_throughput(args.seconds, args.workers, rate)
+        print(f"{str(rate) + ' Hz':<20}{throughput:>14.0f}{throughput / base:>10.3f}{samples:>10}")
+
+
+if __name__ == '__main__':
+    main()
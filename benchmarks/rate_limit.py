@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+API 限流基準測試
+
+多個進程（模擬 gunicorn 工作進程）同時對同一組客戶端做限流檢查，比較進程內
+計數與共享 SQLite 計數的吞吐量，並驗證共享計數下所有進程放行的總請求數不
+超過限額（進程內計數時每個進程各自放行一份限額）。
+
+用法：
+    python benchmarks/rate_limit.py --workers 4 --requests 5000 --limit 1000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rate_limit import RateLimiter, MemoryStore, SQLiteStore, parse_limits
+
+
+def worker(store_name, path, limit, clients, requests, start_at, queue):
+    store = MemoryStore() if store_name == 'memory' else SQLiteStore(path, timeout=5)
+    limiter = RateLimiter({}, store)
+    limits = {'ip': parse_limits(f'{limit}/hour'), 'user': parse_limits(f'{limit * 10}/day')}
+    # 所有進程同時開始
+    while time.time() < start_at:
+        time.sleep(0.001)
+
+    allowed = 0
+    began = time.perf_counter()
+    for i in range(requests):
+        client = f'10.0.0.{i % clients}'
+        decision = limiter.check('bench', limits, {'ip': client, 'user': client})
+        if decision is None or decision.allowed:
+            allowed += 1
+    elapsed = time.perf_counter() - began
+    queue.put((allowed, elapsed, limiter.snapshot()['local_rejects']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lynus API 限流基準測試')
+    parser.add_argument('--workers', type=int, default=4, help='進程數')
+    parser.add_argument('--requests', type=int, default=5000, help='每個進程的請求數')
+    parser.add_argument('--clients', type=int, default=10, help='客戶端（IP）數')
+    parser.add_argument('--limit', type=int, default=1000, help='每個客戶端每小時的限額')
+    args = parser.parse_args()
+
+    print(f"{args.workers} 個進程 × {args.requests} 次檢查，{args.clients} 個客戶端，每個客戶端 {args.limit}/小時")
+    print(f"{'存儲':<8}{'檢查/s':>12}{'放行':>10}{'上限':>10}{'本地拒絕':>10}")
+    ctx = multiprocessing.get_context('spawn')
+    for store_name in ('memory', 'sqlite'):
+        path = os.path.join(tempfile.mkdtemp(prefix='lynus-bench-'), 'ratelimit.db')
+        queue = ctx.Queue()
+        start_at = time.time() + 1.0
+        processes = [
+            ctx.Process(target=worker, args=(store_name, path, args.limit, args.clients, args.requests, start_at, queue))
+            for _ in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        allowed = sum(r[0] for r in results)
+        elapsed = max(r[1] for r in results)
+        local_rejects = sum(r[2] for r in results)
+        rate = args.workers * args.requests / elapsed
+        print(f"{store_name:<8}{rate:>12.0f}{allowed:>10}{args.limit * args.clients:>10}{local_rejects:>10}")
+
+
+if __name__ == '__main__':
+    main()
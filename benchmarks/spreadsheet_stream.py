@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+流式電子表格處理基準測試
+
+生成指定大小的 CSV 文件（默認1GB），存入產物存儲後依次執行 summary、filter、
+group_by 和 pivot，報告耗時、吞吐量和進程峰值內存（RSS）。峰值內存應與文件大小無關。
+
+用法：
+    python benchmarks/spreadsheet_stream.py --size-mb 1024
+    python benchmarks/spreadsheet_stream.py --size-mb 100 --chunk-rows 50000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import resource
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('LYNUS_ARTIFACT_DIR', tempfile.mkdtemp(prefix='lynus-bench-artifacts-'))
+
+from src import artifact_store, spreadsheet_engine
+
+REGIONS = ['north', 'south', 'east', 'west', 'central']
+PRODUCTS = [f'product-{i:03d}' for i in range(200)]
+
+
+def peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 的單位是 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def generate_csv(path: str, size_mb: int) -> int:
+    """寫入約 size_mb 大小的銷售數據 CSV，返回行數"""
+    target = size_mb * 1024 * 1024
+    rng = random.Random(42)
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        f.write('order_id,region,product,month,quantity,amount,note\n')
+        while f.tell() < target:
+            lines = []
+            for _ in range(10000):
+                rows += 1
+                lines.append(
+                    f"{rows},{rng.choice(REGIONS)},{rng.choice(PRODUCTS)},2024-{rng.randint(1, 12):02d},"
+                    f"{rng.randint(1, 20)},{rng.uniform(1, 500):.2f},order note {rows % 97}\n"
+                )
+            f.write(''.join(lines))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lynus 流式電子表格處理基準測試')
+    parser.add_argument('--size-mb', type=int, default=1024, help='生成的 CSV 大小（MB）')
+    parser.add_argument('--chunk-rows', type=int, default=spreadsheet_engine.CHUNK_ROWS, help='每塊行數')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='lynus-bench-sheet-')
+    csv_path = os.path.join(workdir, 'sales.csv')
+
+    start = time.perf_counter()
+    rows = generate_csv(csv_path, args.size_mb)
+    size = os.path.getsize(csv_path)
+    print(f"生成 {rows} 行 / {size / 1024 / 1024:.0f} MB，耗時 {time.perf_counter() - start:.1f}s")
+
+    with open(csv_path, 'rb') as f:
+        meta = artifact_store.put_stream(f, 'text/csv')
+    os.unlink(csv_path)
+    print(f"基線峰值內存：{peak_rss_mb():.0f} MB")
+
+    specs = [
+        {'operation': 'summary'},
+        {'operation': 'filter', 'filters': [{'column': 'amount', 'op': '>', 'value': 450},
+                                            {'column': 'region', 'op': '==', 'value': 'north'}]},
+        {'operation': 'group_by', 'group_by': ['region', 'product'],
+         'aggregations': {'amount': ['sum', 'mean'], 'quantity': ['sum', 'max']}},
+        {'operation': 'pivot', 'index': 'product', 'columns': 'month', 'values': 'amount', 'agg': 'sum'},
+    ]
+
+    print(f"{'操作':<10}{'耗時(s)':>10}{'MB/s':>10}{'行/秒':>14}{'輸出行數':>10}{'峰值內存(MB)':>14}")
+    for spec in specs:
+        start = time.perf_counter()
+        result = spreadsheet_engine.process(meta['hash'], spec, chunk_rows=args.chunk_rows)
+        elapsed = time.perf_counter() - start
+        print(f"{spec['operation']:<10}{elapsed:>10.2f}{size / 1024 / 1024 / elapsed:>10.1f}"
+              f"{result['rows_read'] / elapsed:>14.0f}{result['rows_written']:>10}{peak_rss_mb():>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
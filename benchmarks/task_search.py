@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+任務全文搜索基準測試
+
+創建 N 個任務（每個任務帶若干步驟），比較 GET /api/tasks/search（FTS 索引）與
+在 title/description/步驟內容上逐行 LIKE 掃描找到相同任務的耗時，並測量索引
+觸發器對批量插入的影響。
+
+用法：
+    python benchmarks/task_search.py --tasks 20000 --steps 3
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='lynus-bench-'), 'bench.db')}"
+
+from src.app_factory import create_app
+from src.models.user import db, Task, TaskStep
+from src import migrations
+
+TOPICS = ['revenue', 'marketing', 'roadmap', 'hiring', 'infrastructure', 'pricing', 'onboarding', 'security']
+KINDS = ['slides', 'webpage', 'spreadsheet', 'visualization', 'general']
+QUARTERS = ['Q1', 'Q2', 'Q3', 'Q4']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lynus 任務全文搜索基準測試')
+    parser.add_argument('--tasks', type=int, default=20000, help='任務數')
+    parser.add_argument('--steps', type=int, default=3, help='每個任務的步驟數')
+    parser.add_argument('--repeat', type=int, default=20, help='每個查詢重複次數')
+    args = parser.parse_args()
+
+    app = create_app(serverless=True)
+    with app.app_context():
+        migrations.upgrade(db.engine)
+
+    client = app.test_client()
+    client.post('/api/auth/register', json={'email': 'bench@example.com', 'password': 'secret123'})
+
+    rng = random.Random(42)
+    with app.app_context():
+        user_id = db.session.execute(db.text("SELECT id FROM user LIMIT 1")).scalar()
+        start = time.perf_counter()
+        for offset in range(0, args.tasks, 1000):
+            tasks = []
+            for i in range(offset, min(offset + 1000, args.tasks)):
+                topic, quarter = rng.choice(TOPICS), rng.choice(QUARTERS)
+                tasks.append(Task(
+                    user_id=user_id, task_type=rng.choice(KINDS), status='completed',
+                    title=f'{quarter} {topic} report #{i}',
+                    description=f'Prepare the {quarter} {topic} summary with charts and key figures for team {i % 50}'
+                ))
+            db.session.add_all(tasks)
+            db.session.flush()
+            db.session.add_all(
+                TaskStep(task_id=task.id, step_number=n + 1, step_type='thought',
+                         content=f'Step {n + 1}: gather {rng.choice(TOPICS)} data and review {rng.choice(TOPICS)} notes')
+                for task in tasks for n in range(args.steps)
+            )
+            db.session.commit()
+        insert_time = time.perf_counter() - start
+
+    print(f"插入 {args.tasks} 個任務和 {args.tasks * args.steps} 個步驟（含索引觸發器）：{insert_time:.2f}s")
+
+    queries = ['Q3 revenue', 'infrastructure', 'team 7', '#12345']
+    print(f"{'查詢':<18}{'命中':>8}{'FTS(ms)':>10}{'LIKE(ms)':>10}")
+    for q in queries:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            response = client.get('/api/tasks/search', query_string={'q': q, 'per_page': 20})
+        fts = (time.perf_counter() - start) / args.repeat * 1000
+        total = response.get_json()['pagination']['total']
+
+        # 對照：不使用索引，在任務和步驟上逐行 LIKE 掃描並計數
+        conditions = ' AND '.join(
+            f"(t.title LIKE :p{i} OR t.description LIKE :p{i} OR EXISTS "
+            f"(SELECT 1 FROM task_step s WHERE s.task_id = t.id AND s.content LIKE :p{i}))"
+            for i in range(len(q.split()))
+        )
+        params = {f'p{i}': f'%{term}%' for i, term in enumerate(q.split())}
+        with app.app_context():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                db.session.execute(db.text(
+                    f"SELECT t.id FROM task t WHERE t.user_id = {user_id} AND {conditions} ORDER BY t.id DESC LIMIT 20"
+                ), params).all()
+                db.session.execute(db.text(f"SELECT COUNT(*) FROM task t WHERE {conditions}"), params).scalar()
+            like = (time.perf_counter() - start) / args.repeat * 1000
+        print(f"{q:<18}{total:>8}{fts:>10.1f}{like:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
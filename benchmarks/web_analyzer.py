@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+網頁分析基準測試
+
+在本地啟動一個模擬延遲的 HTTP 服務（每個響應延遲 --latency 毫秒，支持 ETag），
+生成一個站點（首頁鏈接 --pages 個子頁面和一個樣式表），比較：
+    - 逐個抓取（LYNUS_FETCH_WORKERS=1 的效果）與併發抓取的耗時
+    - 冷緩存與 ETag 重新驗證（304）時傳輸的字節數
+
+用法：
+    python benchmarks/web_analyzer.py --pages 20 --latency 100
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('LYNUS_ARTIFACT_DIR', tempfile.mkdtemp(prefix='lynus-bench-artifacts-'))
+os.environ['LYNUS_FETCH_ALLOW_PRIVATE'] = '1'
+
+from src import web_analyzer
+
+
+def make_site(pages: int) -> dict:
+    paragraph = '<p>' + 'Lorem ipsum dolor sit amet. ' * 200 + '</p>'
+    links = ''.join(f'<li><a href="/page/{i}">Page {i}</a></li>' for i in range(pages))
+    site = {
+        '/': f'<html><head><title>Bench</title><link rel="stylesheet" href="/site.css"></head>'
+             f'<body><header><nav><ul>{links}</ul></nav></header><main><h1>Bench</h1>{paragraph}</main></body></html>',
+        '/site.css': 'body{color:#222;font-family:Inter,sans-serif} @media (max-width:600px){nav{display:none}}',
+    }
+    for i in range(pages):
+        site[f'/page/{i}'] = f'<html><body><h2>Page {i}</h2>{paragraph}<a href="/">home</a></body></html>'
+    return {path: body.encode() for path, body in site.items()}
+
+
+def serve(site: dict, latency: float):
+    stats = Counter()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = site.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            etag = f'"{hash(body)}"'
+            stats['requests'] += 1
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            stats['bytes'] += len(body)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/css' if self.path.endswith('.css') else 'text/html; charset=utf-8')
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lynus 網頁分析基準測試')
+    parser.add_argument('--pages', type=int, default=20, help='子頁面數')
+    parser.add_argument('--latency', type=int, default=100, help='每個響應的延遲（毫秒）')
+    args = parser.parse_args()
+
+    server, stats = serve(make_site(args.pages), args.latency / 1000)
+    url = f'http://127.0.0.1:{server.server_port}/'
+    # 分析的頁面數受 LYNUS_FETCH_MAX_PAGES 限制
+    max_pages = min(args.pages + 1, web_analyzer.MAX_PAGES)
+
+    # 逐個抓取：直接對每個頁面調用 fetch，不使用緩存
+    start = time.perf_counter()
+    for path in ([''] + [f'page/{i}' for i in range(args.pages)])[:max_pages]:
+        web_analyzer._fetch_page(url + path)
+    sequential = time.perf_counter() - start
+    # 清空緩存，讓併發抓取也從冷緩存開始
+    for root, _, files in os.walk(web_analyzer.CACHE_DIR):
+        for name in files:
+            os.unlink(os.path.join(root, name))
+
+    rows = []
+    for label in ('併發（冷緩存）', '併發（ETag 304）'):
+        stats.clear()
+        start = time.perf_counter()
+        report = web_analyzer.analyze(url, depth=1, include_resources=True, max_pages=max_pages)
+        elapsed = time.perf_counter() - start
+        rows.append((label, elapsed, len(report['pages']), stats['requests'], stats['bytes'], report['cache']))
+
+    print(f"{max_pages} 個頁面，每個響應延遲 {args.latency}ms，{web_analyzer.WORKERS} 個抓取線程")
+    print(f"{'方式':<18}{'耗時(s)':>10}{'頁面':>6}{'請求':>6}{'響應字節':>12}  緩存")
+    print(f"{'逐個抓取':<18}{sequential:>10.2f}{max_pages:>6}{'':>6}{'':>12}")
+    for label, elapsed, pages, requests, size, cache in rows:
+        print(f"{label:<18}{elapsed:>10.2f}{pages:>6}{requests:>6}{size:>12}  {cache}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+存儲壓縮腳本
+將已有的大步驟內容和任務結果移到壓縮存儲，並報告節省的空間
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.app_factory import create_app
+from src import blob_store
+
+# 不做啟動時的版本檢查，也不啟動後台線程
+app = create_app(check_schema=False)
+
+
+def format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def compact_storage():
+    """壓縮已有內容並清理孤立的壓縮內容"""
+    with app.app_context():
+        try:
+            print("正在壓縮已有的大內容...")
+            moved = blob_store.migrate_existing()
+            print(f"- 步驟: {moved['steps']} 行")
+            print(f"- 任務結果: {moved['tasks']} 行")
+
+            removed = blob_store.delete_orphans()
+            print(f"清理孤立的壓縮內容: {removed} 條")
+
+            report = blob_store.storage_report()
+            print("\n存儲報告：")
+            print(f"- 壓縮內容: {report['blobs']} 條")
+            print(f"- 已壓縮步驟: {report['offloaded_steps']}")
+            print(f"- 已壓縮任務結果: {report['offloaded_tasks']}")
+            print(f"- 原始大小: {format_bytes(report['raw_bytes'])}")
+            print(f"- 壓縮後大小: {format_bytes(report['stored_bytes'])}")
+            print(f"- 節省: {format_bytes(report['saved_bytes'])}"
+                  + (f" (壓縮比 {report['ratio']})" if report['ratio'] is not None else ""))
+
+        except Exception as e:
+            print(f"❌ 存儲壓縮失敗: {str(e)}")
+            return False
+
+    return True
+
+
+if __name__ == "__main__":
+    print("開始壓縮Lynus存儲...")
+    if not compact_storage():
+        sys.exit(1)
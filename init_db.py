@@ -1,15 +1,19 @@
 #!/usr/bin/env python3
 """
 數據庫初始化腳本
-創建所有必要的數據庫表
+刪除所有數據並重建數據庫表（保留數據的升級請使用 migrate.py）
 """
 
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from src.main import app
+from src.app_factory import create_app
 from src.models.user import db
+from src import migrations
+
+# 不做啟動時的版本檢查，也不啟動後台線程
+app = create_app(check_schema=False)
 
 def init_database():
     """初始化數據庫"""
@@ -18,16 +22,21 @@ def init_database():
             # 刪除所有現有表（如果存在）
             print("正在刪除現有表...")
             db.drop_all()
+            migrations.reset(db.engine)
             
-            # 創建所有表
+            # 按版本遷移創建所有表
             print("正在創建數據庫表...")
-            db.create_all()
+            migrations.upgrade(db.engine)
             
             print("✅ 數據庫初始化成功！")
             print("創建的表：")
             print("- user: 用戶表")
             print("- task: 任務表")
             print("- task_step: 任務步驟表")
+            print("- content_blob: 大內容壓縮存儲表")
+            print("- task_archive: 任務步驟歸檔表")
+            print("- task_checkpoint: 任務檢查點表")
+            print("- task_fts / task_step_fts: 全文搜索索引（SQLite）")
             
         except Exception as e:
             print(f"❌ 數據庫初始化失敗: {str(e)}")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+數據庫遷移腳本
+將數據庫升級到最新版本（不刪除數據）
+"""
+
+import os
+import sys
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.app_factory import create_app
+from src.models.user import db
+from src import migrations
+
+# 不做啟動時的版本檢查，也不啟動後台線程
+app = create_app(check_schema=False)
+
+
+def migrate(target=None, status_only=False):
+    """執行遷移"""
+    with app.app_context():
+        try:
+            version = migrations.current_version(db.engine)
+            print(f"當前版本: {version}，最新版本: {migrations.LATEST_VERSION}")
+
+            if status_only:
+                for migration in migrations.MIGRATIONS:
+                    mark = "✓" if migration.version <= version else " "
+                    print(f"  [{mark}] {migration.version}: {migration.description}")
+                return True
+
+            applied = migrations.upgrade(db.engine, target)
+            for migration in applied:
+                print(f"- 已應用 {migration.version}: {migration.description}")
+            if not applied:
+                print("數據庫已是最新版本")
+
+        except Exception as e:
+            print(f"❌ 數據庫遷移失敗: {str(e)}")
+            return False
+
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='升級Lynus數據庫結構')
+    parser.add_argument('--target', type=int, help='升級到指定版本（默認最新）')
+    parser.add_argument('--status', action='store_true', help='只顯示遷移狀態')
+    args = parser.parse_args()
+
+    if not migrate(args.target, args.status):
+        sys.exit(1)
@@ -1,30 +1,35 @@
 import os
 import sys
+import time
+import logging
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask
-from flask_cors import CORS
-from src.models.user import db
-from src.routes.user import user_bp
-from serverless_wsgi import handle # Import the handler
+from serverless_wsgi import handle_request # Import the handler
 
-app = Flask(__name__)
+# Use /tmp for serverless environment unless a real database is configured
+os.environ.setdefault('DATABASE_URL', 'sqlite:////tmp/app.db')
 
-CORS(app, supports_credentials=True)
+# 每個容器只構建一次應用並執行一次建表，之後的調用直接複用
+_app = None
 
-# All your app.config and blueprint registration remains the same
-app.config['SECRET_KEY'] = 'lynus-ai-agent-secret-key-2024'
-app.register_blueprint(user_bp, url_prefix='/api/users')
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:////tmp/app.db" # Use /tmp for serverless environment
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+def get_app():
+    global _app
+    if _app is None:
+        from src.app_factory import create_app
+        from src.models.user import db
+        from src import migrations
+
+        start = time.perf_counter()
+        app = create_app(serverless=True)
+        with app.app_context():
+            migrations.upgrade(db.engine)
+        _app = app
+        logging.info(f"Cold start: app built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return _app
+
 
 # This is the function Netlify will call
 def handler(event, context):
-    with app.app_context():
-        # It's better to create tables on-demand or via a separate script in serverless
-        db.create_all() 
-    return handle(app, event, context)
\ No newline at end of file
+    return handle_request(get_app(), event, context)
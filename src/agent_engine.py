@@ -1,58 +1,241 @@
+import os
+import html
 import json
 import time
 import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Dict, List, Any, Optional
-from src.models.user import db, Task, TaskStep
+from src.models.user import db, Task, TaskArchive, TaskStep
+from src.json_provider import dumps
+from src import artifact_store, cancellation, checkpoint, circuit_breaker, evaluator, model_router, prompts
+from src.cancellation import CancelToken, TaskCancelled
+from src.circuit_breaker import CircuitOpenError
+from src.model_router import ModelCallError, RETRYABLE_STATUS
 from datetime import datetime
 
+# LLM 請求在此線程池中執行，Agent 線程等待時可以響應取消
+_llm_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('LYNUS_LLM_CONCURRENCY', 16)),
+    thread_name_prefix='lynus-llm'
+)
+# 等待 LLM 響應時檢查取消的間隔（秒）
+CANCEL_CHECK_INTERVAL = 0.25
+# 簡報頁數上限，頁數來自模型輸出
+MAX_SLIDES = 50
+
 class LynusAgent:
     """Lynus AI Agent - 模仿Manus AI的Agent系統"""
     
+    # 文檔格式 -> (擴展名, MIME類型)
+    DOCUMENT_FORMATS = {
+        "markdown": ("md", "text/markdown"),
+        "html": ("html", "text/html"),
+        "text": ("txt", "text/plain"),
+        "json": ("json", "application/json"),
+    }
+    
+    CODE_EXTENSIONS = {
+        "python": "py",
+        "javascript": "js",
+        "typescript": "ts",
+        "html": "html",
+        "css": "css",
+        "java": "java",
+        "go": "go",
+        "rust": "rs",
+        "sql": "sql",
+        "bash": "sh",
+    }
+    
     def __init__(self, openrouter_api_key: str):
         self.api_key = openrouter_api_key
         self.api_base = "https://openrouter.ai/api/v1"
-        self.model = "openai/gpt-oss-20b:free"
+        self.router = model_router.router
+        self.task_type: Optional[str] = None
+        self.user_id: Optional[int] = None
+        self.task_id: Optional[int] = None
         self.max_iterations = 10
+        self.cancel_token: Optional[CancelToken] = None
+        self.llm_calls = 0
+        self.llm_call_aborted = False
         
-    def _call_llm(self, messages: List[Dict], temperature: float = 0.7) -> str:
-        """調用GPT-OSS模型"""
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://lynus.ai",
-                "X-Title": "Lynus AI Agent"
-            }
+    def _check_cancelled(self) -> None:
+        """在階段之間檢查任務是否已被取消"""
+        if self.cancel_token:
+            self.cancel_token.raise_if_cancelled()
+    
+    def _abort_requests(self, pending: Dict[Any, requests.Session]) -> None:
+        """放棄未完成的請求並關閉連接（盡力而為，工作線程會在連接關閉後結束）"""
+        for future, session in pending.items():
+            future.cancel()
+            session.close()
+    
+    def _wait_any(self, pending: Dict[Any, requests.Session], timeout: Optional[float] = None) -> set:
+        """等待任一請求完成，超時返回空集合；任務被取消時中止所有請求"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            interval = CANCEL_CHECK_INTERVAL if self.cancel_token else None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return set()
+                interval = remaining if interval is None else min(interval, remaining)
             
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": 2000
-            }
+            done, _ = wait(list(pending), timeout=interval, return_when=FIRST_COMPLETED)
+            if done:
+                return done
             
-            response = requests.post(
-                f"{self.api_base}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
+            if self.cancel_token and self.cancel_token.is_cancelled():
+                self._abort_requests(pending)
+                self.llm_call_aborted = True
+                raise TaskCancelled(f"Task {self.cancel_token.task_id} was cancelled")
+    
+    def _submit(self, model: str, messages: List[Dict], temperature: float):
+        """在LLM線程池中發出請求，返回 (future, session)"""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://lynus.ai",
+            "X-Title": "Lynus AI Agent"
+        }
+        
+        payload = {
+            "model": model,
+            "messages": prompts.for_model(messages, model),
+            "temperature": temperature,
+            "max_tokens": 2000,
+            # 讓 OpenRouter 返回包含緩存命中的 token 用量
+            "usage": {"include": True}
+        }
+        
+        session = requests.Session()
+        future = _llm_executor.submit(
+            session.post,
+            f"{self.api_base}/chat/completions",
+            headers=headers,
+            json=payload,
+            timeout=30
+        )
+        return future, session
+    
+    def _response_content(self, model: str, future) -> str:
+        """讀取已完成請求的結果；失敗時拋出 ModelCallError 並標明是否可以回退"""
+        try:
+            response = future.result()
+        except (requests.Timeout, requests.ConnectionError) as e:
+            raise ModelCallError(model, f"request failed: {str(e)}", retryable=True)
+        except Exception as e:
+            raise ModelCallError(model, f"request failed: {str(e)}", retryable=False)
+        
+        if response.status_code != 200:
+            retryable = response.status_code in RETRYABLE_STATUS or response.status_code >= 500
+            raise ModelCallError(
+                model, f"API call failed: {response.status_code} - {response.text}",
+                retryable=retryable, status_code=response.status_code
             )
+        
+        try:
+            result = response.json()
+            content = result["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise ModelCallError(model, f"invalid response: {str(e)}", retryable=False)
+        
+        self.router.stats.record_usage(model, result.get("usage"))
+        return content
+    
+    def _call_model(self, model: str, messages: List[Dict], temperature: float,
+                    backup_model: Optional[str] = None) -> str:
+        """
+        調用單個模型。啟用對沖時，主請求超過該模型延遲分位數仍未返回則發出
+        備用請求（backup_model），取先成功的響應並中止另一個請求。
+        """
+        hedger = self.router.hedger
+        future, session = self._submit(model, messages, temperature)
+        pending = {future: session}
+        models = {future: model}
+        started = {future: time.perf_counter()}
+        backup = None
+        
+        try:
+            delay = hedger.delay(model)
+            if delay is not None and not self._wait_any(pending, timeout=delay) and hedger.acquire():
+                backup_model = backup_model or model
+                backup, backup_session = self._submit(backup_model, messages, temperature)
+                pending[backup] = backup_session
+                models[backup] = backup_model
+                started[backup] = time.perf_counter()
             
-            if response.status_code == 200:
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
-            else:
-                raise Exception(f"API call failed: {response.status_code} - {response.text}")
-                
-        except Exception as e:
-            raise Exception(f"LLM call failed: {str(e)}")
+            error = None
+            while pending:
+                for done in self._wait_any(pending):
+                    pending.pop(done).close()
+                    try:
+                        content = self._response_content(models[done], done)
+                    except ModelCallError as e:
+                        # 另一個請求仍在進行時繼續等待它
+                        error = error or e
+                        continue
+                    
+                    hedger.observe(models[done], time.perf_counter() - started[done])
+                    if backup is not None:
+                        hedger.record_winner(done is backup)
+                    return content
+            raise error
+        finally:
+            self._abort_requests(pending)
+    
+    def _call_llm(self, messages: List[Dict], temperature: float = 0.7, phase: str = "thought") -> str:
+        """調用LLM；按階段和任務類型選擇模型，429/5xx/超時時回退到鏈中的下一個模型"""
+        self._check_cancelled()
+        self.llm_calls += 1
+        
+        breaker = circuit_breaker.breaker
+        chain = self.router.chain(phase, self.task_type)
+        errors = []
+        for index, model in enumerate(chain):
+            # 熔斷器打開時直接拋出 CircuitOpenError
+            breaker.before_call()
+            start = time.perf_counter()
+            try:
+                content = self._call_model(
+                    model, messages, temperature,
+                    backup_model=self.router.hedger.backup_model(chain, index)
+                )
+            except ModelCallError as e:
+                if circuit_breaker.is_failure(e.status_code, e.retryable):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                fallback = e.retryable and index < len(chain) - 1
+                self.router.stats.record(model, time.perf_counter() - start, success=False, fallback=fallback)
+                errors.append(str(e))
+                if not fallback:
+                    break
+                continue
+            except BaseException:
+                # 取消或意外異常：既不計為成功也不計為故障，但必須釋放半開試探，
+                # 否則熔斷器會一直拒絕調用
+                breaker.release()
+                raise
+            
+            breaker.record_success()
+            self.router.stats.record(model, time.perf_counter() - start, success=True)
+            return content
+        
+        raise Exception(f"LLM call failed: {'; '.join(errors)}")
     
     def _add_task_step(self, task_id: int, step_type: str, content: str) -> None:
         """添加任務步驟到數據庫"""
         try:
             # 獲取下一個步驟編號
             last_step = TaskStep.query.filter_by(task_id=task_id).order_by(TaskStep.step_number.desc()).first()
-            step_number = (last_step.step_number + 1) if last_step else 1
+            if last_step:
+                step_number = last_step.step_number + 1
+            else:
+                # 步驟已全部歸檔的任務（如恢復執行）接著歸檔中的編號
+                archive = TaskArchive.query.filter_by(task_id=task_id).first()
+                archived = archive.get_steps() if archive else []
+                step_number = max((step['step_number'] for step in archived), default=0) + 1
             
             step = TaskStep(
                 task_id=task_id,
@@ -67,89 +250,55 @@ class LynusAgent:
         except Exception as e:
             print(f"Failed to add task step: {str(e)}")
     
-    def _update_task_progress(self, task_id: int, progress: int, status: str = None) -> None:
-        """更新任務進度"""
+    def _record_artifact(self, action_result: Dict[str, Any]) -> None:
+        """把行動生成的產物記錄為任務所屬用戶所有，之後才能下載"""
+        result = action_result.get("result")
+        if self.user_id is not None and isinstance(result, dict) and result.get("artifact"):
+            artifact_store.add_owner(result["artifact"], self.user_id, self.task_id)
+    
+    def _owns_input(self, parameters: Dict[str, Any]) -> bool:
+        """行動引用的輸入文件必須屬於任務所屬用戶"""
+        digest = parameters.get("file") or parameters.get("artifact")
+        return not digest or self.user_id is None or artifact_store.is_owner(digest, self.user_id)
+    
+    def _save_checkpoint(self, task_id: int, iteration: int, phase: str, state: Dict[str, Any]) -> None:
+        """保存TAO循環檢查點；失敗時不影響任務執行"""
         try:
-            task = Task.query.get(task_id)
-            if task:
-                task.progress = progress
-                if status:
-                    task.status = status
-                task.updated_at = datetime.utcnow()
-                db.session.commit()
+            checkpoint.save(task_id, iteration, phase, state)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to save checkpoint: {str(e)}")
+    
+    def _update_task_progress(self, task_id: int, progress: int, status: str = None) -> Optional[bool]:
+        """更新任務進度；已取消的任務不再改寫。返回是否更新了任務，寫入失敗時返回 None"""
+        values = {"progress": progress, "updated_at": datetime.utcnow()}
+        if status:
+            values["status"] = status
+        try:
+            # 條件更新：取消請求可能在任意時刻寫入，不能被進度或最終狀態覆蓋
+            result = db.session.execute(
+                db.update(Task)
+                .where(Task.id == task_id, Task.status != "cancelled")
+                .values(**values)
+            )
+            db.session.commit()
+            return result.rowcount > 0
         except Exception as e:
+            db.session.rollback()
             print(f"Failed to update task progress: {str(e)}")
+            return None
     
     def _thought_phase(self, task_description: str, task_type: str, context: str = "") -> str:
         """思考階段 - 分析任務需求"""
-        messages = [
-            {
-                "role": "system",
-                "content": """你是Lynus AI Agent，一個模仿Manus AI的智能助手。你需要分析用戶的任務需求，制定執行計劃。
-
-你的能力包括：
-- 圖像生成和編輯
-- 簡報製作
-- 網頁設計和開發
-- 電子表格處理
-- 數據可視化
-- 文檔生成
-- 代碼編寫
-- 網頁分析和模仿
-
-請分析任務需求，思考如何完成這個任務，並制定詳細的執行計劃。"""
-            },
-            {
-                "role": "user",
-                "content": f"""任務類型: {task_type}
-任務描述: {task_description}
-上下文: {context}
-
-請分析這個任務，思考需要採取什麼行動來完成它。請詳細說明你的思考過程和計劃。"""
-            }
-        ]
+        messages = prompts.thought_messages(task_type, task_description, context)
         
-        return self._call_llm(messages)
+        return self._call_llm(messages, phase="thought")
     
     def _action_phase(self, task_description: str, task_type: str, thought: str) -> Dict[str, Any]:
         """行動階段 - 選擇和執行工具"""
-        messages = [
-            {
-                "role": "system",
-                "content": """你是Lynus AI Agent。基於你的思考，現在需要選擇具體的行動。
-
-可用的行動類型：
-1. generate_image - 生成圖像
-2. create_slides - 創建簡報
-3. build_webpage - 構建網頁
-4. process_spreadsheet - 處理電子表格
-5. create_visualization - 創建數據可視化
-6. write_document - 編寫文檔
-7. write_code - 編寫代碼
-8. analyze_webpage - 分析網頁
-
-請選擇一個行動，並提供執行該行動所需的參數。
-
-回應格式（JSON）：
-{
-    "action": "行動類型",
-    "parameters": {
-        "key": "value"
-    },
-    "reasoning": "選擇這個行動的原因"
-}"""
-            },
-            {
-                "role": "user",
-                "content": f"""任務描述: {task_description}
-任務類型: {task_type}
-我的思考: {thought}
-
-基於以上信息，請選擇下一步行動。"""
-            }
-        ]
+        messages = prompts.action_messages(task_type, task_description, thought)
         
-        response = self._call_llm(messages)
+        response = self._call_llm(messages, phase="action")
         
         try:
             # 嘗試解析JSON響應
@@ -191,6 +340,8 @@ class LynusAgent:
                     "error": f"Unknown action: {action}",
                     "result": None
                 }
+        except TaskCancelled:
+            raise
         except Exception as e:
             return {
                 "success": False,
@@ -218,7 +369,35 @@ class LynusAgent:
     def _create_slides(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """創建簡報"""
         topic = parameters.get("topic", "")
-        slides_count = parameters.get("slides_count", 5)
+        try:
+            slides_count = max(1, min(int(parameters.get("slides_count", 5)), MAX_SLIDES))
+        except (TypeError, ValueError, OverflowError):
+            slides_count = 5
+        
+        # 參數來自模型輸出，插入 HTML 前全部轉義
+        title = html.escape(str(topic))
+        sections = "\n".join(
+            f"""    <section class="slide">
+        <h2>{title}</h2>
+        <p>第 {i + 1} / {slides_count} 頁</p>
+    </section>"""
+            for i in range(slides_count)
+        )
+        slides_html = f"""<!DOCTYPE html>
+<html lang="zh-TW">
+<head>
+    <meta charset="UTF-8">
+    <title>{title}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 0; }}
+        .slide {{ height: 100vh; display: flex; flex-direction: column; justify-content: center; align-items: center; border-bottom: 1px solid #ddd; }}
+    </style>
+</head>
+<body>
+{sections}
+</body>
+</html>"""
+        artifact = artifact_store.put_text(slides_html, "text/html")
         
         return {
             "success": True,
@@ -226,7 +405,7 @@ class LynusAgent:
                 "type": "slides",
                 "topic": topic,
                 "slides_count": slides_count,
-                "url": "https://example.com/presentation.pptx",
+                **artifact_store.make_ref(artifact, "slides.html"),
                 "message": f"已創建{slides_count}頁關於'{topic}'的簡報"
             }
         }
@@ -251,53 +430,76 @@ class LynusAgent:
 <body>
     <div class="container">
         <h1>Welcome to Your Website</h1>
-        <p>{description}</p>
+        <p>{html.escape(str(description))}</p>
         <p>This website was generated by Lynus AI Agent.</p>
     </div>
 </body>
 </html>"""
         
+        artifact = artifact_store.put_text(html_content, "text/html")
+        
         return {
             "success": True,
             "result": {
                 "type": "webpage",
                 "description": description,
                 "style": style,
-                "html": html_content,
-                "url": "https://example.com/generated-site",
+                **artifact_store.make_ref(artifact, "index.html"),
                 "message": f"已構建網頁：{description}"
             }
         }
     
     def _process_spreadsheet(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
-        """處理電子表格"""
-        operation = parameters.get("operation", "create")
-        data_type = parameters.get("data_type", "general")
+        """處理電子表格 - 流式處理上傳的 CSV/XLSX 文件"""
+        # 延遲導入，不處理電子表格時不加載 NumPy
+        from src import spreadsheet_engine
+        
+        digest = parameters.get("file") or parameters.get("artifact") or ""
+        operation = parameters.get("operation", "summary")
+        if not artifact_store.is_valid_hash(digest) or not self._owns_input(parameters):
+            return {
+                "success": False,
+                "error": "process_spreadsheet requires 'file': the artifact hash of an uploaded CSV/XLSX file",
+                "result": None
+            }
+        
+        spec = dict(parameters, operation=operation)
+        try:
+            # 每塊處理前檢查任務是否已被取消
+            summary = spreadsheet_engine.process(digest, spec, on_chunk=lambda rows: self._check_cancelled())
+        except spreadsheet_engine.SpreadsheetError as e:
+            return {"success": False, "error": str(e), "result": None}
         
         return {
             "success": True,
             "result": {
                 "type": "spreadsheet",
-                "operation": operation,
-                "data_type": data_type,
-                "url": "https://example.com/spreadsheet.xlsx",
-                "message": f"已處理電子表格：{operation} - {data_type}"
+                **summary,
+                "message": f"已處理電子表格：{operation}，讀取{summary['rows_read']}行，輸出{summary['rows_written']}行"
             }
         }
     
     def _create_visualization(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
-        """創建數據可視化"""
-        chart_type = parameters.get("chart_type", "bar")
-        data_source = parameters.get("data_source", "sample")
+        """創建數據可視化 - 降採樣後在進程池中渲染為 SVG"""
+        # 延遲導入，不畫圖時不加載 NumPy
+        from src import chart_renderer
+        
+        if not self._owns_input(parameters):
+            return {"success": False, "error": "Input file not found", "result": None}
+        
+        try:
+            # 等待渲染期間定期檢查任務是否已被取消
+            summary = chart_renderer.render(parameters, on_wait=self._check_cancelled)
+        except chart_renderer.ChartError as e:
+            return {"success": False, "error": str(e), "result": None}
         
+        cached = "（緩存）" if summary["cached"] else ""
         return {
             "success": True,
             "result": {
                 "type": "visualization",
-                "chart_type": chart_type,
-                "data_source": data_source,
-                "url": "https://example.com/chart.png",
-                "message": f"已創建{chart_type}圖表，數據來源：{data_source}"
+                **summary,
+                "message": f"已創建{summary['chart_type']}圖表{cached}，{summary['points_in']}個數據點降採樣為{summary['points_rendered']}個"
             }
         }
     
@@ -306,12 +508,16 @@ class LynusAgent:
         content = parameters.get("content", "")
         format_type = parameters.get("format", "markdown")
         
+        extension, mimetype = self.DOCUMENT_FORMATS.get(format_type, ("txt", "text/plain"))
+        artifact = artifact_store.put_text(str(content), mimetype)
+        
         return {
             "success": True,
             "result": {
                 "type": "document",
-                "content": content,
+                "preview": str(content)[:200],
                 "format": format_type,
+                **artifact_store.make_ref(artifact, f"document.{extension}"),
                 "message": f"已生成{format_type}格式文檔"
             }
         }
@@ -333,118 +539,238 @@ if __name__ == "__main__":
     main()
 """
         
+        extension = self.CODE_EXTENSIONS.get(language, "txt")
+        artifact = artifact_store.put_text(code_content, "text/plain")
+        
         return {
             "success": True,
             "result": {
                 "type": "code",
                 "language": language,
                 "purpose": purpose,
-                "code": code_content,
+                **artifact_store.make_ref(artifact, f"main.{extension}"),
                 "message": f"已生成{language}代碼：{purpose}"
             }
         }
     
     def _analyze_webpage(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
-        """分析網頁"""
+        """分析網頁 - 併發抓取頁面並提取結構、樣式和文本摘要"""
+        # 延遲導入，不分析網頁時不創建抓取線程池
+        from src import web_analyzer
+        
         url = parameters.get("url", "")
+        try:
+            report = web_analyzer.analyze(
+                url,
+                depth=parameters.get("depth", 0),
+                include_resources=bool(parameters.get("include_resources", False)),
+                max_pages=parameters.get("max_pages", web_analyzer.MAX_PAGES),
+                # 每個抓取完成後檢查任務是否已被取消
+                on_progress=self._check_cancelled
+            )
+        except (web_analyzer.FetchError, ValueError) as e:
+            return {"success": False, "error": str(e), "result": None}
+        
+        # 完整報告存為產物，結果中只保留起始頁的摘要
+        artifact = artifact_store.put_text(dumps(report), "application/json")
+        page = report["pages"][0]
+        styles = report["styles"]
+        analysis = (
+            f"標題：{page['title'] or '（無）'}；標題層級：{len(page['headings'])}個；"
+            f"鏈接：站內{page['links']['internal']}個，站外{page['links']['external']}個；"
+            f"圖片{page['images']['total']}張（缺少 alt {page['images']['without_alt']}張）；"
+            f"主要顏色：{', '.join(styles['colors'][:5]) or '（無）'}；字體：{', '.join(styles['fonts'][:3]) or '（無）'}"
+        )
         
         return {
             "success": True,
             "result": {
                 "type": "webpage_analysis",
-                "url": url,
-                "analysis": f"已分析網頁：{url}",
-                "message": f"網頁分析完成：{url}"
+                "page_url": report["url"],
+                "title": page["title"],
+                "description": page["description"],
+                "headings": page["headings"][:10],
+                "landmarks": page["landmarks"],
+                "text_summary": page["text"]["summary"],
+                "styles": styles,
+                "pages_fetched": len(report["pages"]),
+                "errors": len(report["errors"]),
+                "cache": report["cache"],
+                "elapsed_seconds": report["elapsed_seconds"],
+                "analysis": analysis,
+                **artifact_store.make_ref(artifact, "analysis.json"),
+                "message": f"網頁分析完成：{report['url']}，共抓取{len(report['pages'])}個頁面"
             }
         }
     
-    def _observation_phase(self, action_result: Dict[str, Any]) -> str:
+    def _observation_phase(self, action_result: Dict[str, Any], task_description: str = "", task_type: str = "general") -> str:
         """觀察階段 - 分析執行結果"""
-        messages = [
-            {
-                "role": "system",
-                "content": "你是Lynus AI Agent。請觀察和分析剛才執行的行動結果，判斷是否成功，是否需要進一步的行動。"
-            },
-            {
-                "role": "user",
-                "content": f"""執行結果：
-{json.dumps(action_result, ensure_ascii=False, indent=2)}
-
-請分析這個結果：
-1. 行動是否成功執行？
-2. 結果是否符合預期？
-3. 是否需要進一步的行動？
-4. 如果需要，下一步應該做什麼？"""
-            }
-        ]
+        messages = prompts.observation_messages(task_type, task_description, action_result)
         
-        return self._call_llm(messages)
+        return self._call_llm(messages, phase="observation")
     
     def execute_task(self, task_id: int, openrouter_api_key: str) -> Dict[str, Any]:
         """執行任務的主要方法 - TAO循環"""
+        self.cancel_token = cancellation.register(task_id)
+        try:
+            return self._run_task(task_id, openrouter_api_key)
+        finally:
+            cancellation.unregister(task_id)
+    
+    def _handle_cancelled(self, task_id: int, before_start: bool = False) -> Dict[str, Any]:
+        """記錄取消並寫入步驟；每次迭代最多3次LLM調用，未執行的記為節省"""
+        saved = self.max_iterations * 3 - self.llm_calls
+        cancellation.record(saved, before_start=before_start, aborted_in_flight=self.llm_call_aborted)
+        try:
+            checkpoint.clear(task_id)
+        except Exception as e:
+            print(f"Failed to clear checkpoint: {str(e)}")
+        self._add_task_step(task_id, "observation", f"任務已取消，節省約{saved}次LLM調用")
+        
+        return {
+            "success": False,
+            "error": "Task cancelled",
+            "message": "Task was cancelled"
+        }
+    
+    def _run_task(self, task_id: int, openrouter_api_key: str) -> Dict[str, Any]:
         try:
             # 獲取任務信息
             task = Task.query.get(task_id)
             if not task:
                 return {"success": False, "error": "Task not found"}
             
-            # 更新任務狀態為運行中
-            self._update_task_progress(task_id, 0, "running")
-            
-            # 設置API密鑰
-            self.api_key = openrouter_api_key
+            # 排隊期間已被取消的任務不再執行
+            if task.status == "cancelled":
+                return self._handle_cancelled(task_id, before_start=True)
             
+            # 讀取檢查點：進程中途退出的任務從最後完成的階段繼續
+            saved = checkpoint.load(task_id)
+            start_iteration = 0
             context = ""
             final_result = None
             
-            for iteration in range(self.max_iterations):
+            if saved:
+                context = saved.get("context", "")
+                final_result = saved.get("final_result")
+                start_iteration = saved["iteration"]
+                if saved["phase"] == "observation":
+                    start_iteration += 1
+                    saved = None
+                self._update_task_progress(task_id, task.progress or 0, "running")
+                self._add_task_step(task_id, "thought", f"從第{start_iteration + 1}次迭代恢復執行...")
+            else:
+                # 更新任務狀態為運行中
+                self._update_task_progress(task_id, 0, "running")
+            
+            # 設置API密鑰和路由用的任務類型
+            self.api_key = openrouter_api_key
+            self.task_type = task.task_type
+            self.user_id = task.user_id
+            self.task_id = task_id
+            
+            for iteration in range(start_iteration, self.max_iterations):
+                # 本次迭代在檢查點中已完成的階段結果
+                done = saved if saved and saved["iteration"] == iteration else {}
+                saved = None
+                
                 try:
                     # 1. Thought Phase (思考)
-                    self._add_task_step(task_id, "thought", f"開始第{iteration + 1}次迭代...")
-                    
-                    thought = self._thought_phase(task.description, task.task_type, context)
-                    self._add_task_step(task_id, "thought", thought)
+                    self._check_cancelled()
+                    if "thought" in done:
+                        thought = done["thought"]
+                    else:
+                        self._add_task_step(task_id, "thought", f"開始第{iteration + 1}次迭代...")
+                        
+                        thought = self._thought_phase(task.description, task.task_type, context)
+                        self._add_task_step(task_id, "thought", thought)
+                        self._save_checkpoint(task_id, iteration, "thought", {
+                            "context": context, "final_result": final_result, "thought": thought
+                        })
                     
                     # 更新進度
                     progress = min(20 + (iteration * 60 // self.max_iterations), 80)
                     self._update_task_progress(task_id, progress)
                     
                     # 2. Action Phase (行動)
-                    action_data = self._action_phase(task.description, task.task_type, thought)
+                    if "action_data" in done:
+                        action_data = done["action_data"]
+                    else:
+                        action_data = self._action_phase(task.description, task.task_type, thought)
                     action_content = f"選擇行動：{action_data.get('action', 'unknown')}\n原因：{action_data.get('reasoning', '')}"
-                    self._add_task_step(task_id, "action", action_content)
+                    if "action_data" not in done:
+                        self._add_task_step(task_id, "action", action_content)
+                        self._save_checkpoint(task_id, iteration, "action", {
+                            "context": context, "final_result": final_result,
+                            "thought": thought, "action_data": action_data
+                        })
                     
                     # 執行行動
-                    action_result = self._execute_action(action_data)
+                    self._check_cancelled()
+                    if "action_result" in done:
+                        action_result = done["action_result"]
+                    else:
+                        action_result = self._execute_action(action_data)
+                        self._record_artifact(action_result)
+                        self._save_checkpoint(task_id, iteration, "executed", {
+                            "context": context, "final_result": final_result,
+                            "thought": thought, "action_data": action_data, "action_result": action_result
+                        })
                     
                     # 3. Observation Phase (觀察)
-                    observation = self._observation_phase(action_result)
+                    # 確定性工具的結果在本地評估，含糊的結果才調用LLM
+                    evaluation = evaluator.evaluate(action_result, task.task_type)
+                    if evaluation is not None:
+                        observation = evaluation.to_text()
+                    else:
+                        observation = self._observation_phase(action_result, task.description, task.task_type)
                     self._add_task_step(task_id, "observation", observation)
                     
                     # 檢查是否完成
+                    finished = False
                     if action_result.get("success", False):
                         final_result = action_result.get("result", {})
                         
-                        # 如果觀察結果表明任務已完成，則退出循環
-                        if any(keyword in observation.lower() for keyword in ["完成", "成功", "finished", "done", "completed"]):
-                            break
+                        if evaluation is not None:
+                            finished = evaluation.complete
+                        else:
+                            # 如果觀察結果表明任務已完成，則退出循環
+                            finished = any(keyword in observation.lower() for keyword in ["完成", "成功", "finished", "done", "completed"])
                     
                     # 更新上下文
                     context += f"\n迭代{iteration + 1}:\n思考: {thought}\n行動: {action_content}\n觀察: {observation}\n"
                     
+                    if finished:
+                        break
+                    
+                    self._save_checkpoint(task_id, iteration, "observation", {
+                        "context": context, "final_result": final_result
+                    })
+                    
                     # 短暫延遲
                     time.sleep(1)
                     
+                except (TaskCancelled, CircuitOpenError):
+                    raise
                 except Exception as e:
                     error_msg = f"迭代{iteration + 1}執行失敗: {str(e)}"
                     self._add_task_step(task_id, "observation", error_msg)
                     continue
             
+            # 最後一個階段之後也可能被取消，不能覆蓋為完成
+            self._check_cancelled()
+            
+            checkpoint.clear(task_id)
+            
             # 完成任務
             if final_result:
-                # 保存結果
-                task.result_data = json.dumps(final_result, ensure_ascii=False)
-                self._update_task_progress(task_id, 100, "completed")
+                # 先以條件更新轉為完成，檢查之後才被取消的任務不保存結果
+                if self._update_task_progress(task_id, 100, "completed") is False:
+                    return self._handle_cancelled(task_id)
+                
+                # 保存結果（經 ORM 寫入，大結果由 blob_store 壓縮存儲）
+                task.result_data = dumps(final_result)
+                db.session.commit()
                 
                 completion_msg = f"任務完成！結果類型：{final_result.get('type', 'unknown')}"
                 self._add_task_step(task_id, "observation", completion_msg)
@@ -464,6 +790,18 @@ if __name__ == "__main__":
                     "message": "No valid result produced"
                 }
                 
+        except TaskCancelled:
+            return self._handle_cancelled(task_id)
+        except CircuitOpenError as e:
+            # LLM服務不可用時立即停止，保留檢查點以便稍後恢復
+            self._update_task_progress(task_id, task.progress or 0, "failed")
+            self._add_task_step(task_id, "observation", f"LLM服務暫時不可用，任務已停止，可稍後恢復執行：{str(e)}")
+            
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "LLM provider unavailable"
+            }
         except Exception as e:
             # 任務執行出錯
             self._update_task_progress(task_id, 0, "failed")
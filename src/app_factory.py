@@ -0,0 +1,108 @@
+"""
+Flask 應用工廠
+
+gunicorn（src/main.py）和 Netlify 函數（netlify/functions/main.py）共用
+同一套配置和藍圖註冊，避免兩個入口各自維護一份。後台線程由
+start_background() 單獨啟動，只有長期運行的服務進程（src/main.py、
+src/asgi.py）調用它，命令行腳本創建應用時不會啟動。
+"""
+
+import os
+import logging
+from typing import Any, Dict, Optional
+
+from flask import Flask, request
+from flask_cors import CORS
+
+from src.models.user import db
+from src.db_engine import configure_database
+from src import blob_store  # 註冊大內容壓縮的 flush 鉤子
+from src import migrations, retention, checkpoint
+from src.static_assets import StaticManifest
+from src.json_provider import init_json
+from src.compression import init_compression
+from src.rate_limit import init_rate_limit
+from src.profiling import init_profiling
+from src.routes.user import user_bp
+from src.routes.auth import auth_bp
+from src.routes.tasks import tasks_bp
+from src.routes.agent import agent_bp
+from src.routes.artifacts import artifacts_bp
+
+
+def create_app(config: Optional[Dict[str, Any]] = None, serverless: bool = False,
+               check_schema: bool = True) -> Flask:
+    """
+    創建應用；serverless=True 時不檢查數據庫版本也不提供靜態文件。
+    命令行腳本（migrate.py 等）傳入 check_schema=False，在舊版本數據庫上也能運行。
+    """
+    app = Flask(__name__)
+
+    CORS(app, supports_credentials=True)
+    init_json(app)
+    init_compression(app)
+    init_rate_limit(app)
+    init_profiling(app)
+
+    app.config['SECRET_KEY'] = 'lynus-ai-agent-secret-key-2024'
+    app.config['SESSION_COOKIE_SAMESITE'] = 'None'
+    app.config['SESSION_COOKIE_SECURE'] = False
+
+    app.register_blueprint(user_bp, url_prefix='/api/users')
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(tasks_bp, url_prefix='/api/tasks')
+    app.register_blueprint(agent_bp, url_prefix='/api/agent')
+    app.register_blueprint(artifacts_bp, url_prefix='/api/artifacts')
+
+    configure_database(app)
+    if config:
+        app.config.update(config)
+    db.init_app(app)
+
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        logging.info("Health check endpoint called")
+        return {
+            'status': 'healthy',
+            'service': 'Lynus AI Backend',
+            'version': '1.0.0'
+        }, 200
+
+    if serverless:
+        return app
+
+    # 只檢查數據庫版本號；版本落後時拒絕啟動，避免在舊表結構上處理請求
+    if check_schema:
+        with app.app_context():
+            try:
+                schema_version = migrations.check_schema(db.engine)
+                logging.info(f"Database schema version {schema_version}")
+            except migrations.SchemaOutdatedError as e:
+                logging.error(str(e))
+                raise
+
+    # 啟動時建立靜態資源清單，請求時不再訪問文件系統
+    static_manifest = StaticManifest(os.path.join(os.path.dirname(__file__), 'static'))
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        asset = static_manifest.get(path) if path else None
+        if asset is None:
+            asset = static_manifest.get('index.html')
+
+        if asset is not None:
+            return static_manifest.respond(asset, request)
+
+        return {
+            'message': 'Lynus AI Backend is running. No static index.html found.',
+            'api_docs': '/api/health'
+        }, 200
+
+    return app
+
+
+def start_background(app: Flask) -> None:
+    """啟動服務進程的後台工作：步驟歸檔線程，以及定期重新排隊中斷任務的線程"""
+    retention.start_worker(app)
+    checkpoint.start_sweeper(app)
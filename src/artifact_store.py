@@ -0,0 +1,213 @@
+"""
+產物存儲
+
+工具生成的文件（網頁、代碼、文檔等）按 SHA-256 內容尋址保存在本地目錄
+（LYNUS_ARTIFACT_DIR，默認 src/database/artifacts），相同內容只存一份。
+Task.result_data 只保存 make_ref() 生成的小引用，文件通過
+/api/artifacts/<hash> 下載。
+
+目錄結構：<root>/<hash[:2]>/<hash> 為文件內容，<hash>.json 為元數據，
+<hash>.owners/ 下記錄擁有者，下載時據此檢查權限：<user_id> 表示用戶上傳，
+<user_id>-<task_id> 表示由該用戶的任務生成。<root>/tasks/<task_id> 列出任務
+生成的產物，任務刪除時移除對應的擁有者，沒有擁有者的文件隨之刪除。
+"""
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+from urllib.parse import quote
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Tuple, Union
+
+ARTIFACT_DIR = os.getenv(
+    'LYNUS_ARTIFACT_DIR',
+    os.path.join(os.path.dirname(__file__), 'database', 'artifacts')
+)
+
+HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+CHUNK_SIZE = 1024 * 1024
+
+
+def is_valid_hash(digest: str) -> bool:
+    return bool(HASH_RE.match(digest or ''))
+
+
+def _path(digest: str) -> str:
+    return os.path.join(ARTIFACT_DIR, digest[:2], digest)
+
+
+def _write_meta(digest: str, meta: Dict[str, Any]) -> None:
+    meta_path = _path(digest) + '.json'
+    if os.path.exists(meta_path):
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(meta_path))
+    with os.fdopen(fd, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def put_stream(chunks: Union[BinaryIO, Iterable[bytes]], mimetype: str = 'application/octet-stream',
+               max_size: Optional[int] = None) -> Dict[str, Any]:
+    """邊寫入臨時文件邊計算哈希，完成後原子重命名；返回元數據"""
+    if hasattr(chunks, 'read'):
+        fileobj = chunks
+        chunks = iter(lambda: fileobj.read(CHUNK_SIZE), b'')
+
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=ARTIFACT_DIR, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise ValueError(f"Artifact exceeds {max_size} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+
+        hexdigest = digest.hexdigest()
+        path = _path(hexdigest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    meta = {'hash': hexdigest, 'size': size, 'mimetype': mimetype}
+    _write_meta(hexdigest, meta)
+    return meta
+
+
+def put_bytes(data: bytes, mimetype: str = 'application/octet-stream') -> Dict[str, Any]:
+    """保存字節內容，返回元數據"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _path(digest)
+    if not os.path.exists(path):
+        return put_stream([data], mimetype)
+
+    meta = {'hash': digest, 'size': len(data), 'mimetype': mimetype}
+    _write_meta(digest, meta)
+    return meta
+
+
+def put_text(text: str, mimetype: str = 'text/plain') -> Dict[str, Any]:
+    return put_bytes(text.encode('utf-8'), mimetype)
+
+
+def get(digest: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """返回 (文件路徑, 元數據)，不存在時返回 None"""
+    if not is_valid_hash(digest):
+        return None
+    path = _path(digest)
+    if not os.path.exists(path):
+        return None
+
+    meta = {'hash': digest, 'size': os.path.getsize(path), 'mimetype': 'application/octet-stream'}
+    try:
+        with open(path + '.json') as f:
+            meta.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return path, meta
+
+
+def _owners_dir(digest: str) -> str:
+    return _path(digest) + '.owners'
+
+
+def _task_index(task_id: int) -> str:
+    return os.path.join(ARTIFACT_DIR, 'tasks', str(int(task_id)))
+
+
+def add_owner(digest: str, user_id: int, task_id: Optional[int] = None) -> None:
+    """記錄用戶（或用戶的任務）擁有該產物；相同內容可屬於多個擁有者"""
+    if not is_valid_hash(digest):
+        return
+    owners = _owners_dir(digest)
+    os.makedirs(owners, exist_ok=True)
+    name = str(int(user_id)) if task_id is None else f"{int(user_id)}-{int(task_id)}"
+    open(os.path.join(owners, name), 'a').close()
+
+    if task_id is not None:
+        os.makedirs(os.path.dirname(_task_index(task_id)), exist_ok=True)
+        with open(_task_index(task_id), 'a') as f:
+            f.write(digest + '\n')
+
+
+def is_owner(digest: str, user_id: int) -> bool:
+    if not is_valid_hash(digest):
+        return False
+    owners = _owners_dir(digest)
+    user = str(int(user_id))
+    if os.path.exists(os.path.join(owners, user)):
+        return True
+    try:
+        return any(name.startswith(user + '-') for name in os.listdir(owners))
+    except OSError:
+        return False
+
+
+def release_task(task_id: int) -> int:
+    """移除任務對其產物的擁有權，刪除不再有擁有者的文件；返回刪除的文件數"""
+    try:
+        with open(_task_index(task_id)) as f:
+            digests = {line.strip() for line in f if is_valid_hash(line.strip())}
+    except OSError:
+        return 0
+
+    suffix = f"-{int(task_id)}"
+    removed = 0
+    for digest in digests:
+        owners = _owners_dir(digest)
+        try:
+            for name in os.listdir(owners):
+                if name.endswith(suffix):
+                    os.unlink(os.path.join(owners, name))
+            if os.listdir(owners):
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(owners, ignore_errors=True)
+        _remove(digest)
+        removed += 1
+
+    os.unlink(_task_index(task_id))
+    return removed
+
+
+def delete_unowned(digest: str) -> bool:
+    """刪除沒有擁有者的產物（如 HTTP 緩存的響應體）；有擁有者時保留，返回是否刪除"""
+    if not is_valid_hash(digest) or os.path.exists(_owners_dir(digest)):
+        return False
+    return _remove(digest)
+
+
+def _remove(digest: str) -> bool:
+    existed = os.path.exists(_path(digest))
+    for path in (_path(digest), _path(digest) + '.json'):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    return existed
+
+
+def make_ref(meta: Dict[str, Any], filename: Optional[str] = None) -> Dict[str, Any]:
+    """生成存入 result_data 的小引用"""
+    ref = {
+        'artifact': meta['hash'],
+        'url': f"/api/artifacts/{meta['hash']}",
+        'size': meta['size'],
+        'mimetype': meta['mimetype'],
+    }
+    if filename:
+        ref['filename'] = filename
+        ref['url'] += f"?filename={quote(filename)}"
+    return ref
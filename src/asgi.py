@@ -0,0 +1,189 @@
+"""
+ASGI 入口
+
+    uvicorn src.asgi:app --host 0.0.0.0 --port 5000 --workers 2
+
+任務進度的長輪詢和 SSE 由異步處理函數提供，等待中的連接只佔用協程；其餘
+所有接口（認證、任務、Agent、產物、靜態資源）由掛載在根路徑的 Flask 應用
+處理，與 gunicorn 部署共用模型、業務邏輯和會話 Cookie。Flask 請求在線程池
+中執行，安裝了 a2wsgi 時使用它，否則使用 FastAPI 自帶的 WSGIMiddleware。
+異步接口與 Flask 接口使用相同的 CORS 設置和限流規則。
+"""
+
+import sys
+import math
+import logging
+import warnings
+from functools import wraps
+from typing import Any, Dict, Optional
+
+from anyio import to_thread
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from itsdangerous import BadSignature
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        from fastapi.middleware.wsgi import WSGIMiddleware
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+from src.app_factory import create_app, start_background
+from src.json_provider import dumps
+from src import rate_limit, task_watch
+
+flask_app = create_app()
+start_background(flask_app)
+
+_session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+
+
+def _in_app_context(fn, *args):
+    with flask_app.app_context():
+        return fn(*args)
+
+
+async def run_sync(fn, *args):
+    """在線程池中執行同步的數據庫操作"""
+    return await to_thread.run_sync(_in_app_context, fn, *args)
+
+
+watcher = task_watch.TaskWatcher(run_sync)
+
+
+def current_user_id(request: Request) -> Optional[int]:
+    """從 Flask 的會話 Cookie 讀取登錄用戶"""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not cookie or _session_serializer is None:
+        return None
+    try:
+        data = _session_serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None
+    return data.get('user_id')
+
+
+def json_response(data: Dict[str, Any], status_code: int = 200) -> Response:
+    return Response(dumps(data), status_code=status_code, media_type='application/json')
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"id: {data['cursor']}\nevent: {event}\ndata: {dumps(data)}\n\n"
+
+
+def rate_limited(endpoint: str):
+    """限流裝飾器：按 Flask 端點名（藍圖 tasks）套用 LYNUS_RATE_LIMITS 中的規則"""
+    def decorator(f):
+        @wraps(f)
+        async def decorated_function(*args, **kwargs):
+            if not rate_limit.ENABLED:
+                return await f(*args, **kwargs)
+            rule, limits = rate_limit.limiter.rules_for(endpoint, 'tasks')
+            if not limits:
+                return await f(*args, **kwargs)
+
+            request: Request = kwargs['request']
+            user_id = current_user_id(request)
+            identities = {
+                'ip': rate_limit.pick_client_ip(request.headers.get('x-forwarded-for'),
+                                                request.client.host if request.client else None),
+                'user': str(user_id) if user_id else None,
+            }
+            # 共享存儲可能需要等鎖，不阻塞事件循環
+            decision = await to_thread.run_sync(rate_limit.limiter.check, rule, limits, identities)
+            if decision is None:
+                return await f(*args, **kwargs)
+
+            if decision.allowed:
+                response = await f(*args, **kwargs)
+            else:
+                response = json_response({
+                    'error': 'Rate limit exceeded',
+                    'retry_after': math.ceil(decision.retry_after)
+                }, 429)
+            response.headers.update(rate_limit.response_headers(decision))
+            return response
+        return decorated_function
+    return decorator
+
+
+app = FastAPI(title='Lynus AI Backend', docs_url=None, redoc_url=None, openapi_url=None)
+# 與 Flask 應用的 CORS(app, supports_credentials=True) 一致：允許任意來源並回顯 Origin
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=['*'],
+    allow_credentials=True,
+    allow_methods=['*'],
+    allow_headers=['*'],
+)
+
+
+@app.get('/api/tasks/{task_id}/wait')
+@rate_limited('tasks.wait_task')
+async def wait_task(task_id: int, request: Request, since: Optional[str] = None, timeout: float = 25):
+    """長輪詢：狀態與 since 不同時立即返回，否則等到變化或超時"""
+    user_id = current_user_id(request)
+    if not user_id:
+        return json_response({'error': 'Authentication required'}, 401)
+    try:
+        timeout = task_watch.clamp_timeout(timeout)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    channel = await watcher.subscribe(task_id, user_id)
+    if channel is None:
+        return json_response({'error': 'Task not found'}, 404)
+
+    try:
+        changed = channel.state['cursor'] != since
+        if not changed and not task_watch.is_final(channel.state):
+            changed = await channel.changed(timeout)
+        if channel.state.get('deleted'):
+            return json_response({'error': 'Task not found'}, 404)
+        return json_response({'task': channel.state, 'changed': changed})
+    finally:
+        watcher.unsubscribe(channel)
+
+
+@app.get('/api/tasks/{task_id}/events')
+@rate_limited('tasks.task_events')
+async def task_events(task_id: int, request: Request):
+    """SSE：先發送當前狀態，之後每次變化發送 progress 事件（含新步驟），任務結束時發送 done"""
+    user_id = current_user_id(request)
+    if not user_id:
+        return json_response({'error': 'Authentication required'}, 401)
+
+    channel = await watcher.subscribe(task_id, user_id)
+    if channel is None:
+        return json_response({'error': 'Task not found'}, 404)
+
+    async def stream():
+        try:
+            seen = channel.version
+            state = dict(channel.state, steps=[])
+            yield _sse('progress', state)
+            while not task_watch.is_final(state):
+                # yield 期間可能已有新事件，只在沒有時才等待
+                if channel.version == seen and not await channel.changed(task_watch.HEARTBEAT):
+                    yield ': keepalive\n\n'
+                    continue
+                for version, payload in channel.since(seen):
+                    seen, state = version, payload
+                    yield _sse('progress', payload)
+            yield _sse('done', state)
+        finally:
+            watcher.unsubscribe(channel)
+
+    return StreamingResponse(stream(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # 關閉反向代理緩衝，事件立即送達
+        'X-Accel-Buffering': 'no',
+    })
+
+
+# 其餘路徑交給 Flask 應用
+app.mount('/', WSGIMiddleware(flask_app))
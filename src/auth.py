@@ -0,0 +1,16 @@
+"""
+認證輔助函數
+
+管理員由 LYNUS_ADMIN_USERS（逗號分隔的用戶名或郵箱，不區分大小寫）指定，
+未設置時沒有管理員。用於導出用戶、性能分析等只對管理員開放的接口。
+"""
+
+import os
+
+ADMIN_USERS = {name.strip().lower() for name in os.getenv('LYNUS_ADMIN_USERS', '').split(',') if name.strip()}
+
+
+def is_admin(user) -> bool:
+    if user is None or not ADMIN_USERS:
+        return False
+    return (user.username or '').lower() in ADMIN_USERS or (user.email or '').lower() in ADMIN_USERS
@@ -0,0 +1,228 @@
+"""
+大內容壓縮存儲
+
+TaskStep.content 和 Task.result_data 超過閾值時，在 flush 前自動壓縮並
+寫入 content_blob 表（按SHA-256內容尋址去重），原列只保留預覽：
+- TaskStep.content 保留前 LYNUS_BLOB_PREVIEW_CHARS 個字符
+- Task.result_data 置空（JSON 截斷後無意義）
+
+列表和統計查詢因此只掃描小行，完整內容在 to_dict(full=True) 時才解壓。
+寫入方無需任何改動。
+"""
+
+import os
+import zlib
+import hashlib
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, attributes
+
+from src.models.user import db, Task, TaskStep, ContentBlob
+
+try:
+    import zstandard
+except ImportError:  # 可選依賴
+    zstandard = None
+
+# 超過此字節數的內容才壓縮存儲
+BLOB_THRESHOLD = int(os.getenv('LYNUS_BLOB_THRESHOLD', 4096))
+# TaskStep.content 保留的預覽長度
+PREVIEW_CHARS = int(os.getenv('LYNUS_BLOB_PREVIEW_CHARS', 500))
+# 壓縮算法：zstd（需安裝 zstandard）或 zlib
+CODEC = os.getenv('LYNUS_BLOB_CODEC', 'zstd' if zstandard else 'zlib')
+
+
+def compress(raw: bytes, codec: str = None) -> Tuple[str, bytes]:
+    """壓縮字節串，返回 (codec, 壓縮數據)"""
+    codec = codec or CODEC
+    if codec == 'zstd' and zstandard:
+        return 'zstd', zstandard.ZstdCompressor(level=10).compress(raw)
+    return 'zlib', zlib.compress(raw, 6)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == 'zstd':
+        if not zstandard:
+            raise RuntimeError("zstandard is required to read zstd-compressed content")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def is_large(value: Optional[str]) -> bool:
+    # 字符數 * 4 是 UTF-8 字節數上限，先用字符數快速排除小內容
+    if not value or len(value) * 4 <= BLOB_THRESHOLD:
+        return False
+    return len(value.encode('utf-8')) > BLOB_THRESHOLD
+
+
+def store_text(session, value: str) -> str:
+    """壓縮並寫入內容，返回摘要；相同內容只存一份"""
+    raw = value.encode('utf-8')
+    digest = hashlib.sha256(raw).hexdigest()
+    codec, data = compress(raw)
+    values = {
+        'digest': digest,
+        'codec': codec,
+        'raw_size': len(raw),
+        'stored_size': len(data),
+        'data': data,
+    }
+
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        session.execute(insert(ContentBlob).values(**values).on_conflict_do_nothing())
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        session.execute(insert(ContentBlob).values(**values).on_conflict_do_nothing())
+    else:
+        with session.no_autoflush:
+            if session.get(ContentBlob, digest) is None:
+                session.add(ContentBlob(**values))
+
+    return digest
+
+
+@lru_cache(maxsize=256)
+def load_text(digest: str) -> Optional[str]:
+    """讀取並解壓內容（內容尋址不可變，可安全緩存）"""
+    row = db.session.execute(
+        db.select(ContentBlob.codec, ContentBlob.data).where(ContentBlob.digest == digest)
+    ).first()
+    if row is None:
+        return None
+    return decompress(row.codec, row.data).decode('utf-8')
+
+
+def offload_step(session, step: TaskStep) -> bool:
+    """將步驟的大內容移到壓縮存儲，返回是否移動"""
+    if not is_large(step.content):
+        return False
+    step.content_ref = store_text(session, step.content)
+    step.content = step.content[:PREVIEW_CHARS]
+    return True
+
+
+def offload_task_result(session, task: Task) -> bool:
+    """將任務的大結果移到壓縮存儲，返回是否移動"""
+    if not is_large(task.result_data):
+        return False
+    task.result_ref = store_text(session, task.result_data)
+    task.result_data = None
+    return True
+
+
+def _content_changed(obj, column: str, ref_column: str) -> bool:
+    """已有對象的內容被修改，且壓縮引用未被調用方手動處理"""
+    return (attributes.get_history(obj, column).has_changes()
+            and not attributes.get_history(obj, ref_column).has_changes())
+
+
+def _offload(session, obj, column: str, ref_column: str, offload) -> None:
+    if obj in session.new:
+        # 新對象：調用方已設置引用時保持不變，否則只移動超過閾值的內容
+        if getattr(obj, ref_column) is None:
+            offload(session, obj)
+    elif _content_changed(obj, column, ref_column):
+        if not offload(session, obj):
+            # 內容被改小，不再引用舊的壓縮內容
+            setattr(obj, ref_column, None)
+
+
+@event.listens_for(Session, 'before_flush')
+def _offload_large_payloads(session, flush_context, instances):
+    """flush 前自動壓縮新寫入的大內容"""
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, TaskStep):
+            _offload(session, obj, 'content', 'content_ref', offload_step)
+        elif isinstance(obj, Task):
+            _offload(session, obj, 'result_data', 'result_ref', offload_task_result)
+
+
+def migrate_existing(batch_size: int = 500) -> Dict[str, int]:
+    """將已有的大內容分批移到壓縮存儲，返回移動的行數"""
+    moved = {'steps': 0, 'tasks': 0}
+    # 只有字符數可能超過閾值的行才需要檢查
+    min_chars = BLOB_THRESHOLD // 4
+
+    for model, column, offload, key in (
+        (TaskStep, TaskStep.content, offload_step, 'steps'),
+        (Task, Task.result_data, offload_task_result, 'tasks'),
+    ):
+        last_id = 0
+        ref_column = TaskStep.content_ref if model is TaskStep else Task.result_ref
+        while True:
+            rows = model.query.filter(
+                model.id > last_id,
+                ref_column.is_(None),
+                func.length(column) > min_chars
+            ).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            with db.session.no_autoflush:
+                for row in rows:
+                    if offload(db.session, row):
+                        moved[key] += 1
+            db.session.commit()
+            last_id = rows[-1].id
+
+    return moved
+
+
+def delete_orphans() -> int:
+    """刪除不再被任何步驟或任務引用的壓縮內容"""
+    referenced = db.select(TaskStep.content_ref).where(TaskStep.content_ref.isnot(None)).union(
+        db.select(Task.result_ref).where(Task.result_ref.isnot(None))
+    )
+    result = db.session.execute(
+        db.delete(ContentBlob).where(ContentBlob.digest.not_in(referenced)),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def delete_unreferenced(digests) -> int:
+    """刪除給定摘要中不再被引用的壓縮內容（刪除任務後調用，不掃描整張表）"""
+    digests = list({digest for digest in digests if digest})
+    removed = 0
+    for start in range(0, len(digests), 500):
+        chunk = digests[start:start + 500]
+        referenced = db.select(TaskStep.content_ref).where(TaskStep.content_ref.in_(chunk)).union(
+            db.select(Task.result_ref).where(Task.result_ref.in_(chunk))
+        )
+        result = db.session.execute(
+            db.delete(ContentBlob).where(ContentBlob.digest.in_(chunk), ContentBlob.digest.not_in(referenced)),
+            execution_options={'synchronize_session': False}
+        )
+        removed += result.rowcount
+    db.session.commit()
+    return removed
+
+
+def storage_report() -> Dict[str, Any]:
+    """統計壓縮存儲節省的空間"""
+    blobs, raw_size, stored_size = db.session.execute(
+        db.select(
+            func.count(ContentBlob.digest),
+            func.coalesce(func.sum(ContentBlob.raw_size), 0),
+            func.coalesce(func.sum(ContentBlob.stored_size), 0),
+        )
+    ).one()
+    steps = TaskStep.query.filter(TaskStep.content_ref.isnot(None)).count()
+    tasks = Task.query.filter(Task.result_ref.isnot(None)).count()
+
+    return {
+        'blobs': blobs,
+        'offloaded_steps': steps,
+        'offloaded_tasks': tasks,
+        'raw_bytes': raw_size,
+        'stored_bytes': stored_size,
+        'saved_bytes': raw_size - stored_size,
+        'ratio': round(stored_size / raw_size, 3) if raw_size else None,
+    }
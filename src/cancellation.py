@@ -0,0 +1,108 @@
+"""
+任務取消
+
+每個執行中的任務註冊一個 CancelToken。取消請求在同一進程內直接觸發令牌；
+其他工作進程中的任務由令牌定期讀取數據庫中的任務狀態發現取消
+（LYNUS_CANCEL_POLL_INTERVAL，默認2秒）。Agent 在各階段之間和等待
+LLM 響應時檢查令牌，取消後拋出 TaskCancelled。
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import select
+
+from src.models.user import db, Task
+
+POLL_INTERVAL = float(os.getenv('LYNUS_CANCEL_POLL_INTERVAL', 2))
+# 每次迭代最多3次LLM調用（思考、行動、觀察），共10次迭代
+MAX_LLM_CALLS_PER_TASK = 30
+
+
+class TaskCancelled(Exception):
+    """任務已被取消"""
+
+
+def read_status(task_id: int) -> Optional[str]:
+    # 使用獨立連接讀取，不受 Agent 會話中緩存對象的影響
+    with db.engine.connect() as conn:
+        return conn.execute(select(Task.status).where(Task.id == task_id)).scalar()
+
+
+class CancelToken:
+    def __init__(self, task_id: int, poll_interval: float = POLL_INTERVAL):
+        self.task_id = task_id
+        self.poll_interval = poll_interval
+        self._event = threading.Event()
+        self._last_check = time.monotonic()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    def is_cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+
+        now = time.monotonic()
+        if now - self._last_check >= self.poll_interval:
+            self._last_check = now
+            try:
+                if read_status(self.task_id) == 'cancelled':
+                    self._event.set()
+            except Exception:
+                pass
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self.is_cancelled():
+            raise TaskCancelled(f"Task {self.task_id} was cancelled")
+
+
+_lock = threading.Lock()
+_tokens: Dict[int, CancelToken] = {}
+_stats = {
+    'cancelled_tasks': 0,
+    'cancelled_before_start': 0,
+    'llm_calls_aborted': 0,
+    'llm_calls_saved': 0,
+}
+
+
+def register(task_id: int) -> CancelToken:
+    token = CancelToken(task_id)
+    with _lock:
+        _tokens[task_id] = token
+    return token
+
+
+def unregister(task_id: int) -> None:
+    with _lock:
+        _tokens.pop(task_id, None)
+
+
+def cancel(task_id: int) -> bool:
+    """觸發本進程中執行該任務的令牌，返回任務是否在本進程中執行"""
+    with _lock:
+        token = _tokens.get(task_id)
+    if token is None:
+        return False
+    token.cancel()
+    return True
+
+
+def record(llm_calls_saved: int, before_start: bool = False, aborted_in_flight: bool = False) -> None:
+    """記錄一次取消；llm_calls_saved 為按最大迭代次數估算的未執行 LLM 調用數"""
+    with _lock:
+        _stats['cancelled_tasks'] += 1
+        _stats['llm_calls_saved'] += max(llm_calls_saved, 0)
+        if before_start:
+            _stats['cancelled_before_start'] += 1
+        if aborted_in_flight:
+            _stats['llm_calls_aborted'] += 1
+
+
+def get_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats, running=len(_tokens))
@@ -0,0 +1,545 @@
+"""
+服務端圖表渲染
+
+create_visualization 行動的數據可以來自上傳的 CSV/XLSX 文件（產物哈希），也可以
+直接在參數中給出。渲染前先降採樣：折線圖和面積圖用 LTTB（或 min-max 分桶）
+把序列壓縮到 LYNUS_CHART_MAX_POINTS（默認2000）個點，散點圖按像素網格每格保留
+一個點，柱狀圖和餅圖按類別匯總；百萬級的數據點也只輸出幾千個 SVG 元素。
+
+讀取數據、降採樣和渲染在進程池（LYNUS_CHART_WORKERS，默認2）中執行，不佔用 Web
+工作進程的 GIL。渲染結果存入產物存儲，並以「數據哈希 + 圖表規格」為鍵緩存在
+<LYNUS_ARTIFACT_DIR>/charts/ 下，相同的圖表只渲染一次，各工作進程共享。
+"""
+
+import os
+import json
+import math
+import time
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from html import escape
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src import artifact_store
+
+CHART_TYPES = ('line', 'area', 'scatter', 'bar', 'pie')
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+MAX_POINTS = int(os.getenv('LYNUS_CHART_MAX_POINTS', 2000))
+MAX_CATEGORIES = int(os.getenv('LYNUS_CHART_MAX_CATEGORIES', 30))
+WORKERS = int(os.getenv('LYNUS_CHART_WORKERS', 2))
+CACHE_DIR = os.path.join(artifact_store.ARTIFACT_DIR, 'charts')
+
+# 修改渲染輸出時遞增，使舊的緩存失效
+RENDER_VERSION = 1
+
+WIDTH = 800
+HEIGHT = 450
+# 參數允許的範圍，避免超大畫布或點數拖垮渲染進程
+POINTS_RANGE = (3, 20000)
+SIZE_RANGE = (100, 4000)
+MARGIN = {'left': 70, 'right': 20, 'top': 40, 'bottom': 50}
+PALETTE = ['#4e79a7', '#f28e2b', '#e15759', '#76b7b2', '#59a14f',
+           '#edc948', '#b07aa1', '#ff9da7', '#9c755f', '#bab0ac']
+
+# 等待進程池結果時檢查取消的間隔（秒）
+POLL_INTERVAL = 0.5
+
+
+class ChartError(ValueError):
+    """圖表參數或數據無效"""
+
+
+# ---------- 降採樣 ----------
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets：返回保留點的下標，保留序列的視覺形狀"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 下一個桶的平均點作為三角形的第三個頂點
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py))
+        previous = start + int(np.argmax(areas))
+        keep[i + 1] = previous
+    return keep
+
+
+def minmax(y: np.ndarray, threshold: int) -> np.ndarray:
+    """每個桶保留最小值和最大值（按原順序），保留尖峰"""
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    # 首尾兩點另外保留
+    buckets = (threshold - 2) // 2
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)[:-1]
+    mins = np.minimum.reduceat(y, edges)
+    maxs = np.maximum.reduceat(y, edges)
+    bucket_of = np.repeat(np.arange(buckets), np.diff(np.append(edges, n)))
+    # 每個桶內第一個等於最小值/最大值的位置
+    is_min = y == mins[bucket_of]
+    is_max = y == maxs[bucket_of]
+    first_min = np.flatnonzero(is_min)[np.unique(bucket_of[is_min], return_index=True)[1]]
+    first_max = np.flatnonzero(is_max)[np.unique(bucket_of[is_max], return_index=True)[1]]
+    return np.unique(np.concatenate([first_min, first_max, [0, n - 1]]))
+
+
+def grid_thin(x: np.ndarray, y: np.ndarray, cells_x: int, cells_y: int) -> np.ndarray:
+    """散點圖：每個像素網格只保留一個點"""
+    if len(x) <= cells_x * cells_y // 4:
+        return np.arange(len(x))
+    gx = _scale_to_cells(x, cells_x)
+    gy = _scale_to_cells(y, cells_y)
+    _, keep = np.unique(gx * cells_y + gy, return_index=True)
+    return np.sort(keep)
+
+
+def _scale_to_cells(values: np.ndarray, cells: int) -> np.ndarray:
+    low, high = values.min(), values.max()
+    span = high - low or 1.0
+    return np.minimum(((values - low) / span * cells).astype(np.int64), cells - 1)
+
+
+def _top_categories(labels: np.ndarray, values: np.ndarray, limit: int) -> Tuple[List[str], np.ndarray]:
+    """按類別求和，超過 limit 個類別時其餘合併為「其他」"""
+    unique, inverse = np.unique(labels, return_inverse=True)
+    totals = np.bincount(inverse, weights=values, minlength=len(unique))
+    if len(unique) <= limit:
+        return unique.tolist(), totals
+    order = np.argsort(-np.abs(totals), kind='stable')
+    top = np.sort(order[:limit - 1])
+    rest = totals.sum() - totals[top].sum()
+    return unique[top].tolist() + ['其他'], np.append(totals[top], rest)
+
+
+# ---------- 規格與數據 ----------
+
+def _int_param(parameters: Dict[str, Any], name: str, default: int, bounds: Tuple[int, int]) -> int:
+    value = parameters.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        number = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ChartError(f"{name} must be an integer")
+    low, high = bounds
+    if not low <= number <= high:
+        raise ChartError(f"{name} must be between {low} and {high}")
+    return number
+
+
+def normalize_spec(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """提取影響渲染結果的參數，作為緩存鍵的一部分"""
+    chart_type = parameters.get('chart_type', 'bar')
+    if chart_type not in CHART_TYPES:
+        raise ChartError(f"Unsupported chart_type: {chart_type} (supported: {', '.join(CHART_TYPES)})")
+    downsample = parameters.get('downsample', 'lttb')
+    if downsample not in DOWNSAMPLE_METHODS:
+        raise ChartError(f"Unsupported downsample method: {downsample}")
+
+    y = parameters.get('y') or []
+    if isinstance(y, str):
+        y = [y]
+    return {
+        'chart_type': chart_type,
+        'x': parameters.get('x'),
+        'y': list(y),
+        'title': str(parameters.get('title', '')),
+        'downsample': downsample,
+        'max_points': _int_param(parameters, 'max_points', MAX_POINTS, POINTS_RANGE),
+        'width': _int_param(parameters, 'width', WIDTH, SIZE_RANGE),
+        'height': _int_param(parameters, 'height', HEIGHT, SIZE_RANGE),
+        'sheet': parameters.get('sheet'),
+    }
+
+
+def _inline_columns(data: Any, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """參數中的數據：{"列名": [...]} 或數值列表"""
+    if isinstance(data, list):
+        data = {'value': data}
+        spec['y'] = spec['y'] or ['value']
+    if not isinstance(data, dict) or not data:
+        raise ChartError("data must be a list of numbers or an object of column -> values")
+    return {str(key): list(values) for key, values in data.items()}
+
+
+def _data_key(parameters: Dict[str, Any]) -> Tuple[str, Any]:
+    """返回（數據哈希, 數據來源）；上傳文件直接使用其內容哈希"""
+    digest = parameters.get('file') or parameters.get('artifact')
+    if digest:
+        if not artifact_store.is_valid_hash(digest):
+            raise ChartError(f"Invalid artifact hash: {digest}")
+        return digest, {'file': digest}
+    data = parameters.get('data')
+    if data is None:
+        raise ChartError("create_visualization requires 'file' (uploaded CSV/XLSX artifact hash) or 'data'")
+    encoded = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest(), {'data': data}
+
+
+def _load(source: Dict[str, Any], spec: Dict[str, Any]) -> Tuple[Optional[np.ndarray], List[np.ndarray], int]:
+    """返回 x（數值或類別標籤，None 表示按行號）、各 y 序列和原始點數"""
+    categorical = spec['chart_type'] in ('bar', 'pie')
+    x_name = spec['x']
+
+    if 'file' in source:
+        from src import spreadsheet_engine
+        if not spec['y']:
+            raise ChartError("y column is required when plotting an uploaded file")
+        text = [x_name] if x_name and categorical else []
+        numeric = list(spec['y']) + ([x_name] if x_name and not categorical else [])
+        try:
+            columns = spreadsheet_engine.read_columns(source['file'], numeric, text,
+                                                      spec={'sheet': spec['sheet']})
+        except spreadsheet_engine.SpreadsheetError as e:
+            raise ChartError(str(e))
+    else:
+        raw = _inline_columns(source['data'], spec)
+        if not spec['y']:
+            spec['y'] = [name for name in raw if name != x_name][:1]
+        missing = [name for name in spec['y'] + ([x_name] if x_name else []) if name not in raw]
+        if missing:
+            raise ChartError(f"Unknown columns: {', '.join(missing)}")
+        from src.spreadsheet_engine import to_numeric
+        columns = {name: to_numeric(np.asarray(raw[name], dtype=object)) for name in spec['y']}
+        if x_name:
+            values = np.asarray(raw[x_name], dtype=object)
+            columns[x_name] = values.astype(str) if categorical else to_numeric(values)
+
+    ys = [columns[name] for name in spec['y']]
+    x = columns[x_name] if x_name else None
+    return x, ys, len(ys[0]) if ys else 0
+
+
+def _downsample(x: Optional[np.ndarray], ys: List[np.ndarray], spec: Dict[str, Any]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """返回每個序列降採樣後的 (x, y)"""
+    series = []
+    plot_w, plot_h = _plot_size(spec)
+    for y in ys:
+        xs = x if x is not None else np.arange(len(y), dtype=np.float64)
+        valid = ~(np.isnan(xs) | np.isnan(y))
+        xs, y = xs[valid], y[valid]
+        if len(xs) > 1 and np.any(np.diff(xs) < 0):
+            order = np.argsort(xs, kind='stable')
+            xs, y = xs[order], y[order]
+
+        if spec['chart_type'] == 'scatter':
+            keep = grid_thin(xs, y, max(plot_w // 2, 1), max(plot_h // 2, 1))
+        elif spec['downsample'] == 'minmax':
+            keep = minmax(y, spec['max_points'])
+        else:
+            keep = lttb(xs, y, spec['max_points'])
+        series.append((xs[keep], y[keep]))
+    return series
+
+
+# ---------- SVG ----------
+
+def _plot_size(spec: Dict[str, Any]) -> Tuple[int, int]:
+    return (spec['width'] - MARGIN['left'] - MARGIN['right'],
+            spec['height'] - MARGIN['top'] - MARGIN['bottom'])
+
+
+def _nice_ticks(low: float, high: float, count: int = 5) -> List[float]:
+    if not math.isfinite(low) or not math.isfinite(high):
+        return [0.0]
+    if high == low:
+        high = low + 1
+    step = (high - low) / count
+    magnitude = 10 ** math.floor(math.log10(step))
+    step = min((m * magnitude for m in (1, 2, 2.5, 5, 10) if m * magnitude >= step), default=step)
+    start = math.floor(low / step) * step
+    ticks = []
+    value = start
+    while value <= high + step * 1e-9:
+        ticks.append(round(value, 10))
+        value += step
+    return ticks
+
+
+def _label(value: float) -> str:
+    if abs(value) >= 1e6 or (value and abs(value) < 1e-3):
+        return f"{value:.2g}"
+    return f"{value:g}"
+
+
+def _svg_open(spec: Dict[str, Any]) -> List[str]:
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{spec["width"]}" height="{spec["height"]}" '
+        f'viewBox="0 0 {spec["width"]} {spec["height"]}" font-family="sans-serif" font-size="12">',
+        f'<rect width="100%" height="100%" fill="#fff"/>',
+    ]
+    if spec['title']:
+        parts.append(f'<text x="{spec["width"] / 2}" y="24" text-anchor="middle" font-size="16">'
+                     f'{escape(spec["title"])}</text>')
+    return parts
+
+
+def _legend(spec: Dict[str, Any], names: List[str]) -> List[str]:
+    if len(names) < 2:
+        return []
+    parts = []
+    x = MARGIN['left']
+    y = spec['height'] - 12
+    for i, name in enumerate(names):
+        color = PALETTE[i % len(PALETTE)]
+        parts.append(f'<rect x="{x}" y="{y - 9}" width="10" height="10" fill="{color}"/>')
+        parts.append(f'<text x="{x + 14}" y="{y}">{escape(str(name))}</text>')
+        x += 24 + 7 * len(str(name))
+    return parts
+
+
+def _render_xy(spec: Dict[str, Any], series: List[Tuple[np.ndarray, np.ndarray]]) -> str:
+    plot_w, plot_h = _plot_size(spec)
+    left, top = MARGIN['left'], MARGIN['top']
+    non_empty = [(xs, ys) for xs, ys in series if len(xs)]
+    if not non_empty:
+        raise ChartError("No numeric data points to plot")
+
+    x_low = min(float(xs.min()) for xs, _ in non_empty)
+    x_high = max(float(xs.max()) for xs, _ in non_empty)
+    y_low = min(float(ys.min()) for _, ys in non_empty)
+    y_high = max(float(ys.max()) for _, ys in non_empty)
+    if spec['chart_type'] == 'area':
+        y_low, y_high = min(y_low, 0.0), max(y_high, 0.0)
+    x_ticks = _nice_ticks(x_low, x_high)
+    y_ticks = _nice_ticks(y_low, y_high)
+    x_low, x_high = min(x_ticks[0], x_low), max(x_ticks[-1], x_high)
+    y_low, y_high = min(y_ticks[0], y_low), max(y_ticks[-1], y_high)
+    x_span = (x_high - x_low) or 1.0
+    y_span = (y_high - y_low) or 1.0
+
+    def px(values):
+        return left + (values - x_low) / x_span * plot_w
+
+    def py(values):
+        return top + plot_h - (values - y_low) / y_span * plot_h
+
+    parts = _svg_open(spec)
+    for tick in y_ticks:
+        y = py(tick)
+        parts.append(f'<line x1="{left}" x2="{left + plot_w}" y1="{y:.1f}" y2="{y:.1f}" stroke="#eee"/>')
+        parts.append(f'<text x="{left - 6}" y="{y + 4:.1f}" text-anchor="end">{_label(tick)}</text>')
+    for tick in x_ticks:
+        x = px(tick)
+        parts.append(f'<text x="{x:.1f}" y="{top + plot_h + 18}" text-anchor="middle">{_label(tick)}</text>')
+    parts.append(f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" fill="none" stroke="#999"/>')
+
+    for i, (xs, ys) in enumerate(series):
+        if not len(xs):
+            continue
+        color = PALETTE[i % len(PALETTE)]
+        sx, sy = px(xs), py(ys)
+        if spec['chart_type'] == 'scatter':
+            parts.extend(f'<circle cx="{a:.1f}" cy="{b:.1f}" r="2" fill="{color}" fill-opacity="0.7"/>'
+                         for a, b in zip(sx.tolist(), sy.tolist()))
+            continue
+        points = ' '.join(f'{a:.1f},{b:.1f}' for a, b in zip(sx.tolist(), sy.tolist()))
+        if spec['chart_type'] == 'area':
+            base = py(0.0)
+            parts.append(f'<polygon points="{sx[0]:.1f},{base:.1f} {points} {sx[-1]:.1f},{base:.1f}" '
+                         f'fill="{color}" fill-opacity="0.3" stroke="none"/>')
+        parts.append(f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="1.5"/>')
+
+    parts.extend(_legend(spec, spec['y']))
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def _render_bar(spec: Dict[str, Any], labels: List[str], values: np.ndarray) -> str:
+    plot_w, plot_h = _plot_size(spec)
+    left, top = MARGIN['left'], MARGIN['top']
+    y_ticks = _nice_ticks(min(float(values.min()), 0.0), max(float(values.max()), 0.0))
+    y_low, y_high = y_ticks[0], y_ticks[-1]
+    y_span = (y_high - y_low) or 1.0
+
+    def py(value):
+        return top + plot_h - (value - y_low) / y_span * plot_h
+
+    parts = _svg_open(spec)
+    for tick in y_ticks:
+        y = py(tick)
+        parts.append(f'<line x1="{left}" x2="{left + plot_w}" y1="{y:.1f}" y2="{y:.1f}" stroke="#eee"/>')
+        parts.append(f'<text x="{left - 6}" y="{y + 4:.1f}" text-anchor="end">{_label(tick)}</text>')
+
+    slot = plot_w / len(labels)
+    base = py(0.0)
+    for i, (label, value) in enumerate(zip(labels, values.tolist())):
+        x = left + i * slot + slot * 0.1
+        y = py(value)
+        parts.append(f'<rect x="{x:.1f}" y="{min(y, base):.1f}" width="{slot * 0.8:.1f}" '
+                     f'height="{abs(base - y):.1f}" fill="{PALETTE[0]}"><title>{escape(label)}: {_label(value)}</title></rect>')
+        parts.append(f'<text x="{x + slot * 0.4:.1f}" y="{top + plot_h + 18}" text-anchor="middle">'
+                     f'{escape(label[:12])}</text>')
+    parts.append(f'<line x1="{left}" x2="{left + plot_w}" y1="{base:.1f}" y2="{base:.1f}" stroke="#999"/>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def _render_pie(spec: Dict[str, Any], labels: List[str], values: np.ndarray) -> str:
+    values = np.clip(values, 0, None)
+    total = float(values.sum())
+    if total <= 0:
+        raise ChartError("Pie chart requires positive values")
+    plot_w, plot_h = _plot_size(spec)
+    radius = min(plot_w, plot_h) / 2
+    cx, cy = MARGIN['left'] + radius, MARGIN['top'] + plot_h / 2
+
+    parts = _svg_open(spec)
+    angle = -math.pi / 2
+    for i, (label, value) in enumerate(zip(labels, values.tolist())):
+        color = PALETTE[i % len(PALETTE)]
+        sweep = value / total * 2 * math.pi
+        if sweep >= 2 * math.pi - 1e-9:
+            parts.append(f'<circle cx="{cx:.1f}" cy="{cy:.1f}" r="{radius:.1f}" fill="{color}"/>')
+        elif sweep > 0:
+            x1, y1 = cx + radius * math.cos(angle), cy + radius * math.sin(angle)
+            x2, y2 = cx + radius * math.cos(angle + sweep), cy + radius * math.sin(angle + sweep)
+            large = 1 if sweep > math.pi else 0
+            parts.append(f'<path d="M{cx:.1f},{cy:.1f} L{x1:.1f},{y1:.1f} A{radius:.1f},{radius:.1f} 0 {large} 1 '
+                         f'{x2:.1f},{y2:.1f} Z" fill="{color}"><title>{escape(label)}: {_label(value)}</title></path>')
+        angle += sweep
+        legend_y = MARGIN['top'] + 16 * i + 10
+        legend_x = cx + radius + 30
+        parts.append(f'<rect x="{legend_x:.1f}" y="{legend_y - 9}" width="10" height="10" fill="{color}"/>')
+        parts.append(f'<text x="{legend_x + 14:.1f}" y="{legend_y}">{escape(label)} ({value / total:.1%})</text>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def _render(source: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    """在進程池中執行：讀取數據、降採樣並生成 SVG"""
+    start = time.perf_counter()
+    x, ys, points_in = _load(source, spec)
+    if not points_in:
+        raise ChartError("No data to plot")
+
+    if spec['chart_type'] in ('bar', 'pie'):
+        values = np.nan_to_num(ys[0])
+        labels = x.astype(str) if x is not None else np.arange(len(values)).astype(str)
+        labels, totals = _top_categories(labels, values, MAX_CATEGORIES)
+        if spec['chart_type'] == 'bar':
+            svg = _render_bar(spec, labels, totals)
+        else:
+            svg = _render_pie(spec, labels, totals)
+        points_rendered = len(labels)
+    else:
+        series = _downsample(x, ys, spec)
+        svg = _render_xy(spec, series)
+        points_rendered = sum(len(xs) for xs, _ in series)
+
+    return {
+        'svg': svg,
+        'points_in': points_in,
+        'points_rendered': points_rendered,
+        'render_seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+# ---------- 進程池與緩存 ----------
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'rendered': 0, 'cache_hits': 0, 'points_in': 0, 'points_rendered': 0}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn：Web 進程是多線程的，fork 可能複製持有中的鎖
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key[:2], key + '.json')
+
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_cache_path(key)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # 產物被清理後緩存失效
+    if not artifact_store.get(entry.get('artifact', '')):
+        return None
+    return entry
+
+
+def _cache_put(key: str, entry: Dict[str, Any]) -> None:
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+
+def _count(**values: int) -> None:
+    with _stats_lock:
+        for key, value in values.items():
+            _stats[key] += value
+
+
+def render(parameters: Dict[str, Any], on_wait: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    渲染圖表並返回結果摘要（含產物引用）。
+    on_wait 在等待進程池結果期間定期調用（可拋出異常中止，如任務取消）。
+    """
+    spec = normalize_spec(parameters)
+    data_hash, source = _data_key(parameters)
+    key = hashlib.sha256(json.dumps(
+        {'data': data_hash, 'spec': spec, 'version': RENDER_VERSION}, sort_keys=True
+    ).encode('utf-8')).hexdigest()
+    filename = f"{spec['chart_type']}.svg"
+
+    cached = _cache_get(key)
+    if cached:
+        _count(cache_hits=1)
+        meta = {'hash': cached['artifact'], 'size': cached['size'], 'mimetype': 'image/svg+xml'}
+        return dict(cached['summary'], cached=True, **artifact_store.make_ref(meta, filename))
+
+    future = _get_pool().submit(_render, source, spec)
+    while True:
+        try:
+            output = future.result(timeout=POLL_INTERVAL)
+            break
+        except FutureTimeout:
+            if on_wait:
+                try:
+                    on_wait()
+                except BaseException:
+                    future.cancel()
+                    raise
+
+    meta = artifact_store.put_text(output.pop('svg'), 'image/svg+xml')
+    summary = dict(output, chart_type=spec['chart_type'], data_hash=data_hash)
+    _cache_put(key, {'artifact': meta['hash'], 'size': meta['size'], 'summary': summary})
+    _count(rendered=1, points_in=output['points_in'], points_rendered=output['points_rendered'])
+    return dict(summary, cached=False, **artifact_store.make_ref(meta, filename))
+
+
+def get_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats, workers=WORKERS)
@@ -0,0 +1,162 @@
+"""
+TAO 循環檢查點
+
+Agent 每完成一個階段（思考、選擇行動、執行行動、觀察）就把迭代序號、
+該迭代已完成階段的結果、累積上下文和最終結果寫入 task_checkpoint 表。
+進程在任務中途退出時任務停留在 running 狀態，已排隊未開始的任務停留在
+pending 狀態且只存在於退出進程的內存隊列中。
+
+每個服務進程的後台線程每 LYNUS_RESUME_INTERVAL 秒（默認30）掃描一次：先刷新
+本進程隊列中任務的 updated_at 作為心跳，再把超過 LYNUS_RESUME_STALE_SECONDS
+（默認120秒）沒有進展的 running 任務和已排隊的 pending 任務重新排隊，
+Agent 從最後完成的階段繼續，已付費的 LLM 調用不再重複。
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, or_
+
+from src.models.user import db, Task, TaskCheckpoint
+from src.json_provider import dumps
+
+# 階段順序；恢復時跳過已完成的階段
+PHASES = ['thought', 'action', 'executed', 'observation']
+
+STALE_SECONDS = int(os.getenv('LYNUS_RESUME_STALE_SECONDS', 120))
+# 掃描間隔，需小於 STALE_SECONDS，否則正常排隊的任務也會被認領；0 表示只在啟動時掃描一次
+RESUME_INTERVAL = int(os.getenv('LYNUS_RESUME_INTERVAL', 30))
+
+
+def load(task_id: int) -> Optional[Dict[str, Any]]:
+    """讀取檢查點，返回包含 iteration、phase 和各階段結果的字典"""
+    checkpoint = db.session.get(TaskCheckpoint, task_id)
+    if checkpoint is None:
+        return None
+
+    state = checkpoint.get_state()
+    state['iteration'] = checkpoint.iteration
+    state['phase'] = checkpoint.phase
+    return state
+
+
+def save(task_id: int, iteration: int, phase: str, state: Dict[str, Any]) -> None:
+    """覆蓋寫入檢查點，並更新任務的 updated_at（用於判斷任務是否仍在執行）"""
+    now = datetime.utcnow()
+    checkpoint = db.session.get(TaskCheckpoint, task_id)
+    if checkpoint is None:
+        checkpoint = TaskCheckpoint(task_id=task_id)
+        db.session.add(checkpoint)
+
+    checkpoint.iteration = iteration
+    checkpoint.phase = phase
+    checkpoint.state = dumps(state)
+    checkpoint.updated_at = now
+    db.session.execute(db.update(Task).where(Task.id == task_id).values(updated_at=now))
+    db.session.commit()
+
+
+def clear(task_id: int) -> None:
+    db.session.execute(db.delete(TaskCheckpoint).where(TaskCheckpoint.task_id == task_id))
+    db.session.commit()
+
+
+def heartbeat(task_ids: Iterable[int], interval: int = RESUME_INTERVAL) -> None:
+    """
+    刷新本進程隊列中任務的 updated_at，排隊等待或單個階段執行較久的任務
+    不會被其他進程當作中斷任務認領。只刷新超過 interval 秒沒有更新的任務。
+    """
+    task_ids = list(task_ids)
+    if not task_ids:
+        return
+
+    now = datetime.utcnow()
+    db.session.execute(
+        db.update(Task)
+        .where(Task.id.in_(task_ids), Task.status.in_(['pending', 'running']),
+               Task.updated_at < now - timedelta(seconds=interval))
+        .values(updated_at=now)
+    )
+    db.session.commit()
+
+
+def claim_interrupted(stale_seconds: int = STALE_SECONDS, exclude: Iterable[int] = ()) -> List[int]:
+    """
+    找出長時間沒有進展的 running 任務和已排隊的 pending 任務，改為 pending 並認領。
+    條件更新同時刷新 updated_at，保證多個工作進程同時掃描時每個任務只被一個進程認領。
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    interrupted = and_(
+        or_(Task.status == 'running', and_(Task.status == 'pending', Task.queued_at.isnot(None))),
+        Task.updated_at < cutoff
+    )
+    exclude = set(exclude)
+    candidates = db.session.execute(db.select(Task.id).where(interrupted)).scalars().all()
+
+    claimed = []
+    for task_id in candidates:
+        if task_id in exclude:
+            continue
+        now = datetime.utcnow()
+        result = db.session.execute(
+            db.update(Task)
+            .where(Task.id == task_id, interrupted)
+            .values(status='pending', queued_at=now, updated_at=now)
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            claimed.append(task_id)
+    return claimed
+
+
+def resume_interrupted(app, openrouter_api_key: Optional[str] = None) -> List[int]:
+    """掃描一次：刷新本進程任務的心跳，重新排隊被中斷的任務（需要服務端配置的 API 密鑰），返回排隊的任務ID"""
+    from src import task_queue
+
+    openrouter_api_key = openrouter_api_key or os.getenv('OPENROUTER_API_KEY')
+    if not openrouter_api_key:
+        return []
+
+    with app.app_context():
+        try:
+            local_ids = task_queue.local_task_ids()
+            heartbeat(local_ids)
+            task_ids = claim_interrupted(exclude=local_ids)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Failed to resume interrupted tasks: {str(e)}")
+            return []
+
+        for task_id in task_ids:
+            task_queue.enqueue(task_id, openrouter_api_key)
+
+    if task_ids:
+        logging.info(f"Resumed {len(task_ids)} interrupted tasks")
+    return task_ids
+
+
+def _sweeper(app, openrouter_api_key: str, interval: int) -> None:
+    while True:
+        time.sleep(interval)
+        resume_interrupted(app, openrouter_api_key)
+
+
+def start_sweeper(app, interval: int = RESUME_INTERVAL) -> Optional[threading.Thread]:
+    """啟動時掃描一次，然後在後台線程中定期掃描；未配置服務端 API 密鑰時不啟動"""
+    openrouter_api_key = os.getenv('OPENROUTER_API_KEY')
+    if not openrouter_api_key:
+        return None
+
+    resume_interrupted(app, openrouter_api_key)
+    if interval <= 0:
+        return None
+
+    thread = threading.Thread(target=_sweeper, args=(app, openrouter_api_key, interval), name='lynus-resume')
+    thread.daemon = True
+    thread.start()
+    logging.info(f"Resume sweeper started: every {interval}s, tasks idle for {STALE_SECONDS}s")
+    return thread
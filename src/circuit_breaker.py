@@ -0,0 +1,115 @@
+"""
+LLM 服務熔斷器
+
+進程內所有任務共用一個熔斷器。連續 LYNUS_BREAKER_THRESHOLD（默認5）次 LLM
+調用失敗（超時、連接錯誤、429/5xx、401/403）後熔斷器打開，之後的調用直接拋出
+CircuitOpenError，不再等待注定失敗的請求。打開 LYNUS_BREAKER_COOLDOWN
+（默認30秒）後進入半開狀態，只放行一個試探調用：成功則關閉，失敗則重新打開。
+"""
+
+import os
+import time
+import threading
+from typing import Any, Dict, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# 計為服務故障的狀態碼（其餘 4xx 是請求本身的問題）
+FAILURE_STATUS = {401, 402, 403, 408, 429}
+
+
+class CircuitOpenError(Exception):
+    """熔斷器打開，LLM 調用被直接拒絕"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM provider circuit is open, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def is_failure(status_code: Optional[int], retryable: bool) -> bool:
+    """判斷一次失敗的調用是否應計入熔斷"""
+    if retryable:
+        return True
+    return status_code is not None and (status_code in FAILURE_STATUS or status_code >= 500)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._stats = {'opened': 0, 'rejected': 0, 'trials': 0}
+
+    @classmethod
+    def from_env(cls) -> 'CircuitBreaker':
+        return cls(
+            threshold=int(os.getenv('LYNUS_BREAKER_THRESHOLD', 5)),
+            cooldown=float(os.getenv('LYNUS_BREAKER_COOLDOWN', 30)),
+        )
+
+    def _retry_after(self) -> float:
+        return max(self._opened_at + self.cooldown - time.monotonic(), 0)
+
+    def before_call(self) -> None:
+        """調用前檢查；熔斷器打開或半開試探進行中時拋出 CircuitOpenError"""
+        with self._lock:
+            if self._state == OPEN:
+                if self._retry_after() > 0:
+                    self._stats['rejected'] += 1
+                    raise CircuitOpenError(self._retry_after())
+                self._state = HALF_OPEN
+                self._trial_in_flight = False
+
+            if self._state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self._stats['rejected'] += 1
+                    raise CircuitOpenError(self.cooldown)
+                self._trial_in_flight = True
+                self._stats['trials'] += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.threshold:
+                if self._state != OPEN:
+                    self._stats['opened'] += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def release(self) -> None:
+        """調用既未成功也未計為故障（如任務被取消）時釋放半開試探"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._retry_after() <= 0:
+                return HALF_OPEN
+            return self._state
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return dict(
+                self._stats,
+                state=state,
+                consecutive_failures=self._failures,
+                retry_after=round(self._retry_after(), 1) if state == OPEN else 0,
+            )
+
+
+breaker = CircuitBreaker.from_env()
@@ -0,0 +1,47 @@
+"""
+響應壓縮
+
+客戶端接受 gzip 時，壓縮超過 LYNUS_GZIP_MIN_SIZE（默認1024字節）的
+JSON 和文本響應。已經帶 Content-Encoding 的響應（如預壓縮的靜態資源）
+和流式響應不處理。
+"""
+
+import os
+import gzip
+
+from flask import request
+
+GZIP_MIN_SIZE = int(os.getenv('LYNUS_GZIP_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('LYNUS_GZIP_LEVEL', 5))
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def _should_compress(response) -> bool:
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code >= 300 or response.status_code == 204:
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    if not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES):
+        return False
+    return response.content_length is not None and response.content_length >= GZIP_MIN_SIZE
+
+
+def compress_response(response):
+    if not _should_compress(response) or not request.accept_encodings['gzip']:
+        return response
+
+    response.set_data(gzip.compress(response.get_data(), compresslevel=GZIP_LEVEL, mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    # 壓縮後的表示不能沿用原來的強 ETag
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app) -> None:
+    app.after_request(compress_response)
@@ -0,0 +1,94 @@
+"""
+數據庫引擎配置
+
+從環境變量讀取連接字符串和連接池參數：
+- SQLite：每個連接建立時設置 WAL、busy_timeout、synchronous=NORMAL，
+  讓多個Agent線程同時寫入步驟時不再出現 "database is locked"；
+  同時開啟外鍵約束，使 ON DELETE CASCADE 生效
+- PostgreSQL/MySQL：設置連接池大小、pre-ping 和連接回收時間
+"""
+
+import os
+import logging
+from typing import Dict, Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+# 默認數據庫位置（未設置 DATABASE_URL 時使用）
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(__file__), 'app.db')
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_database_uri() -> str:
+    """獲取數據庫連接字符串，優先使用 DATABASE_URL"""
+    uri = os.getenv('DATABASE_URL', '').strip()
+    if not uri:
+        return f"sqlite:///{DEFAULT_SQLITE_PATH}"
+
+    # Heroku 等平台仍提供舊的 postgres:// 前綴，SQLAlchemy 1.4+ 不再接受
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def get_sqlite_pragmas() -> Dict[str, Any]:
+    """SQLite 每個連接需要設置的 PRAGMA"""
+    return {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        # ON DELETE CASCADE 需要開啟外鍵約束
+        'foreign_keys': 'ON',
+    }
+
+
+def get_engine_options(uri: str) -> Dict[str, Any]:
+    """根據數據庫類型生成 SQLAlchemy 引擎參數"""
+    url = make_url(uri)
+
+    if url.get_backend_name() == 'sqlite':
+        # busy_timeout 由 PRAGMA 設置，這裡的 timeout 是 sqlite3 驅動層的等待時間
+        return {
+            'connect_args': {
+                'timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000,
+                'check_same_thread': False,
+            },
+        }
+
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """SQLite 連接建立時應用 PRAGMA（其他數據庫忽略）"""
+    if type(dbapi_connection).__module__.split('.')[0] not in ('sqlite3', 'pysqlite2'):
+        return
+
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in get_sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def configure_database(app) -> None:
+    """將數據庫配置寫入 Flask app.config"""
+    uri = get_database_uri()
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options(uri)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    logging.info(f"Database configured: {make_url(uri).render_as_string(hide_password=True)}")
@@ -0,0 +1,164 @@
+"""
+本地觀察評估
+
+確定性工具（文檔、代碼、網頁、簡報、電子表格、圖表、網頁分析）的結果是否成功、是否完整可以直接從
+success 標記和結果結構判斷，不需要再花一次 LLM 調用。evaluate() 對這些結果
+生成結構化的觀察（成功與否、完整性檢查、下一步建議），並直接給出任務是否完成；
+結果含糊（佔位工具、結果類型與任務類型不一致等）時返回 None，由 LLM 觀察。
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 任務類型 -> 能完成該任務的結果類型；general 任務接受任何結果
+EXPECTED_RESULT_TYPES = {
+    'image': {'image'},
+    'slides': {'slides'},
+    'webpage': {'webpage'},
+    'spreadsheet': {'spreadsheet'},
+    'visualization': {'visualization'},
+}
+
+
+@dataclass
+class Evaluation:
+    success: bool
+    complete: bool
+    checks: List[Tuple[str, bool]] = field(default_factory=list)
+    next_step: str = ''
+
+    def to_text(self) -> str:
+        lines = ['行動執行成功。' if self.success else '行動執行失敗。']
+        for name, passed in self.checks:
+            lines.append(f"- {name}：{'通過' if passed else '未通過'}")
+        lines.append('結果符合預期，任務已完成。' if self.complete else '任務尚未完成。')
+        if self.next_step:
+            lines.append(f"下一步：{self.next_step}")
+        return '\n'.join(lines)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'success': self.success,
+            'complete': self.complete,
+            'checks': [{'name': name, 'passed': passed} for name, passed in self.checks],
+            'next_step': self.next_step,
+        }
+
+
+def _has_artifact(result: Dict[str, Any]) -> bool:
+    return bool(result.get('artifact')) and (result.get('size') or 0) > 0
+
+
+def _check_document(result: Dict[str, Any]) -> List[Tuple[str, bool]]:
+    return [
+        ('已保存文檔文件', _has_artifact(result)),
+        ('文檔內容非空', bool(str(result.get('preview', '')).strip())),
+    ]
+
+
+def _check_code(result: Dict[str, Any]) -> List[Tuple[str, bool]]:
+    return [
+        ('已保存代碼文件', _has_artifact(result)),
+        ('已說明代碼用途', bool(str(result.get('purpose', '')).strip())),
+    ]
+
+
+def _check_webpage(result: Dict[str, Any]) -> List[Tuple[str, bool]]:
+    return [
+        ('已保存網頁文件', _has_artifact(result)),
+        ('網頁內容描述非空', bool(str(result.get('description', '')).strip())),
+    ]
+
+
+def _check_slides(result: Dict[str, Any]) -> List[Tuple[str, bool]]:
+    try:
+        slides_count = int(result.get('slides_count') or 0)
+    except (TypeError, ValueError):
+        slides_count = 0
+    return [
+        ('已保存簡報文件', _has_artifact(result)),
+        ('簡報主題非空', bool(str(result.get('topic', '')).strip())),
+        ('至少一頁', slides_count > 0),
+    ]
+
+
+def _check_spreadsheet(result: Dict[str, Any]) -> List[Tuple[str, bool]]:
+    return [
+        ('已保存結果文件', _has_artifact(result)),
+        ('已讀取數據行', (result.get('rows_read') or 0) > 0),
+    ]
+
+
+def _check_visualization(result: Dict[str, Any]) -> List[Tuple[str, bool]]:
+    return [
+        ('已保存圖表文件', _has_artifact(result)),
+        ('已繪製數據點', (result.get('points_rendered') or 0) > 0),
+    ]
+
+
+def _check_webpage_analysis(result: Dict[str, Any]) -> List[Tuple[str, bool]]:
+    return [
+        ('已保存分析報告', _has_artifact(result)),
+        ('已抓取頁面', (result.get('pages_fetched') or 0) > 0),
+        ('頁面包含內容', bool(str(result.get('title', '')).strip() or str(result.get('text_summary', '')).strip())),
+    ]
+
+
+# 結果類型 -> 完整性檢查；未列出的類型（佔位工具）交給 LLM 判斷
+CHECKS: Dict[str, Callable[[Dict[str, Any]], List[Tuple[str, bool]]]] = {
+    'document': _check_document,
+    'code': _check_code,
+    'webpage': _check_webpage,
+    'slides': _check_slides,
+    'spreadsheet': _check_spreadsheet,
+    'visualization': _check_visualization,
+    'webpage_analysis': _check_webpage_analysis,
+}
+
+_lock = threading.Lock()
+_stats = {'local': 0, 'escalated': 0}
+
+
+def _count(key: str) -> None:
+    with _lock:
+        _stats[key] += 1
+
+
+def evaluate(action_result: Dict[str, Any], task_type: str = 'general') -> Optional[Evaluation]:
+    """本地評估行動結果；結果含糊需要 LLM 判斷時返回 None"""
+    if not action_result.get('success', False):
+        # 工具報錯是確定的失敗，直接建議換一個行動
+        evaluation = Evaluation(
+            success=False,
+            complete=False,
+            checks=[('工具執行', False)],
+            next_step=f"修正參數或選擇其他行動（錯誤：{action_result.get('error', 'unknown')}）"
+        )
+        _count('local')
+        return evaluation
+
+    result = action_result.get('result') or {}
+    result_type = result.get('type')
+    check = CHECKS.get(result_type)
+    expected = EXPECTED_RESULT_TYPES.get(task_type)
+    if check is None or (expected is not None and result_type not in expected):
+        _count('escalated')
+        return None
+
+    checks = check(result)
+    complete = all(passed for _, passed in checks)
+    evaluation = Evaluation(
+        success=True,
+        complete=complete,
+        checks=checks,
+        next_step='' if complete else '補充未通過檢查的內容後重新執行該行動'
+    )
+    _count('local')
+    return evaluation
+
+
+def get_stats() -> Dict[str, int]:
+    """local 為本地評估次數（即節省的 LLM 調用數），escalated 為交給 LLM 的次數"""
+    with _lock:
+        return dict(_stats, llm_calls_avoided=_stats['local'])
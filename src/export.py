@@ -0,0 +1,203 @@
+"""
+流式數據導出
+
+任務、步驟和用戶以 NDJSON 或 CSV 格式導出。查詢使用 yield_per（PostgreSQL 上為
+服務端游標）按 LYNUS_EXPORT_BATCH_SIZE（默認1000）行一批讀取，每批編碼後立即
+交給響應發送，只選擇需要的列而不構建 ORM 對象；導出數百萬行時內存佔用不變，
+客戶端在第一批讀出後就開始收到數據。
+
+壓縮存儲的大內容默認導出預覽（與列表接口一致），full=True 時在同一查詢中
+關聯 content_blob 解壓完整內容；已歸檔任務的步驟從歸檔記錄中逐個任務解壓。
+"""
+
+import io
+import os
+import csv
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from flask import Response, stream_with_context
+
+from src.models.user import db, User, Task, TaskStep, ContentBlob, TaskArchive
+from src.json_provider import dumps
+
+BATCH_SIZE = int(os.getenv('LYNUS_EXPORT_BATCH_SIZE', 1000))
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+TASK_FIELDS = ['id', 'user_id', 'title', 'description', 'task_type', 'status', 'progress',
+               'result_data', 'result_truncated', 'created_at', 'updated_at']
+STEP_FIELDS = ['id', 'task_id', 'step_number', 'step_type', 'content', 'content_truncated',
+               'timestamp', 'archived']
+USER_FIELDS = ['id', 'username', 'email', 'created_at', 'is_active']
+
+
+def _value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _batches(statement, batch_size: int) -> Iterator[Sequence[Any]]:
+    """按批讀取查詢結果；yield_per 使 PostgreSQL 等驅動使用服務端游標"""
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def _decompress(codec: Optional[str], data: Optional[bytes]) -> Optional[str]:
+    from src.blob_store import decompress
+    return decompress(codec, data).decode('utf-8') if data is not None else None
+
+
+def task_batches(user_id: int, status: Optional[str] = None, task_type: Optional[str] = None,
+                 full: bool = False, batch_size: int = BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    columns = [Task.id, Task.user_id, Task.title, Task.description, Task.task_type, Task.status,
+               Task.progress, Task.result_data, Task.result_ref, Task.created_at, Task.updated_at]
+    statement = db.select(*columns)
+    if full:
+        statement = db.select(*columns, ContentBlob.codec, ContentBlob.data) \
+            .outerjoin(ContentBlob, ContentBlob.digest == Task.result_ref)
+    statement = statement.where(Task.user_id == user_id)
+    if status:
+        statement = statement.where(Task.status == status)
+    if task_type:
+        statement = statement.where(Task.task_type == task_type)
+
+    for rows in _batches(statement.order_by(Task.id), batch_size):
+        batch = []
+        for row in rows:
+            result_data = row.result_data
+            if full and row.result_ref:
+                result_data = _decompress(row.codec, row.data)
+            batch.append({
+                'id': row.id,
+                'user_id': row.user_id,
+                'title': row.title,
+                'description': row.description,
+                'task_type': row.task_type,
+                'status': row.status,
+                'progress': row.progress,
+                'result_data': result_data,
+                'result_truncated': bool(row.result_ref) and not full,
+                'created_at': _value(row.created_at),
+                'updated_at': _value(row.updated_at),
+            })
+        yield batch
+
+
+def step_batches(user_id: int, task_id: Optional[int] = None, full: bool = False,
+                 include_archived: bool = True, batch_size: int = BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    columns = [TaskStep.id, TaskStep.task_id, TaskStep.step_number, TaskStep.step_type,
+               TaskStep.content, TaskStep.content_ref, TaskStep.timestamp]
+    statement = db.select(*columns)
+    if full:
+        statement = db.select(*columns, ContentBlob.codec, ContentBlob.data) \
+            .outerjoin(ContentBlob, ContentBlob.digest == TaskStep.content_ref)
+    statement = statement.join(Task, Task.id == TaskStep.task_id).where(Task.user_id == user_id)
+    if task_id is not None:
+        statement = statement.where(TaskStep.task_id == task_id)
+
+    for rows in _batches(statement.order_by(TaskStep.task_id, TaskStep.step_number, TaskStep.id), batch_size):
+        batch = []
+        for row in rows:
+            content = row.content
+            if full and row.content_ref:
+                content = _decompress(row.codec, row.data)
+            batch.append({
+                'id': row.id,
+                'task_id': row.task_id,
+                'step_number': row.step_number,
+                'step_type': row.step_type,
+                'content': content,
+                'content_truncated': bool(row.content_ref) and not full,
+                'timestamp': _value(row.timestamp),
+                'archived': False,
+            })
+        yield batch
+
+    if not include_archived:
+        return
+
+    # 歸檔記錄每個任務一條，按批讀取後逐個解壓
+    statement = db.select(TaskArchive.task_id, TaskArchive.codec, TaskArchive.data) \
+        .join(Task, Task.id == TaskArchive.task_id).where(Task.user_id == user_id)
+    if task_id is not None:
+        statement = statement.where(TaskArchive.task_id == task_id)
+    for rows in _batches(statement.order_by(TaskArchive.task_id), max(batch_size // 50, 1)):
+        for row in rows:
+            steps = json.loads(_decompress(row.codec, row.data))
+            yield [dict(step, task_id=row.task_id, archived=True) for step in steps]
+
+
+def user_batches(batch_size: int = BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    statement = db.select(User.id, User.username, User.email, User.created_at, User.is_active).order_by(User.id)
+    for rows in _batches(statement, batch_size):
+        yield [
+            {
+                'id': row.id,
+                'username': row.username,
+                'email': row.email,
+                'created_at': _value(row.created_at),
+                'is_active': row.is_active,
+            }
+            for row in rows
+        ]
+
+
+def encode_ndjson(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[str]:
+    for batch in batches:
+        if batch:
+            yield ''.join(dumps(item) + '\n' for item in batch)
+
+
+def encode_csv(batches: Iterable[List[Dict[str, Any]]], fields: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # 沒有數據時也輸出表頭
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode_json_array(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[str]:
+    """逐批輸出 JSON 數組，格式與一次性 jsonify 列表相同"""
+    yield '['
+    first = True
+    for batch in batches:
+        if not batch:
+            continue
+        yield ('' if first else ',') + ','.join(dumps(item) for item in batch)
+        first = False
+    yield ']'
+
+
+def encode(batches: Iterable[List[Dict[str, Any]]], output_format: str, fields: List[str]) -> Iterator[str]:
+    if output_format == 'csv':
+        return encode_csv(batches, fields)
+    return encode_ndjson(batches)
+
+
+def stream_response(batches: Iterable[List[Dict[str, Any]]], output_format: str, fields: List[str],
+                    resource: str) -> Response:
+    """生成器在請求上下文中執行（數據庫會話在導出完成前保持可用）"""
+    name = f"{resource}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{output_format}"
+    return Response(
+        stream_with_context(encode(batches, output_format, fields)),
+        mimetype=FORMATS[output_format],
+        headers={
+            'Content-Disposition': f'attachment; filename="{name}"',
+            # 關閉反向代理緩衝，數據邊生成邊發送
+            'X-Accel-Buffering': 'no',
+        }
+    )
@@ -0,0 +1,69 @@
+"""
+JSON 序列化
+
+安裝 orjson 時使用 orjson 序列化 API 響應（比標準庫快數倍），
+否則回退到 Flask 默認的標準庫實現。輸出格式與默認實現保持一致：
+日期仍按 Flask 的 HTTP 日期格式輸出，鍵順序遵循 sort_keys 配置。
+"""
+
+import json
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # 可選依賴
+    orjson = None
+
+
+def dumps(obj: Any) -> str:
+    """序列化為 JSON 字符串（保留非 ASCII 字符），用於存入數據庫的結果"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """基於 orjson 的 Flask JSON provider"""
+
+    def _orjson_option(self, indent: bool = False) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _dumps_bytes(self, obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, default=self.default, option=self._orjson_option(indent))
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # 有額外參數（如 cls、indent）時交給標準庫處理
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._dumps_bytes(obj).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        try:
+            body = self._dumps_bytes(obj, indent)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def init_json(app) -> None:
+    """為應用安裝 JSON provider"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,330 @@
+"""
+數據庫版本化遷移
+
+schema_version 表記錄已應用的遷移版本。應用啟動時只讀取一次最大版本號
+與代碼中的 LATEST_VERSION 比較（不做表結構反射），遷移由
+`python migrate.py` 顯式執行；空數據庫或設置 LYNUS_AUTO_MIGRATE=1 時啟動時
+自動執行，其餘版本落後的情況應用拒絕啟動。
+
+每個遷移在單獨的事務中執行，且必須可重複執行（舊數據庫可能已經由
+create_all 建好部分表），新增遷移只需在 MIGRATIONS 末尾追加。
+"""
+
+import os
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, ForeignKey, Index, Integer, LargeBinary, MetaData, String, Table, Text,
+    func, inspect, select, text
+)
+from sqlalchemy.engine import Connection, Engine
+
+from src import search
+
+# 版本表不放入 db.metadata，避免被 create_all/drop_all 管理
+version_metadata = MetaData()
+schema_version = Table(
+    'schema_version', version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+class SchemaOutdatedError(RuntimeError):
+    """數據庫版本落後於代碼"""
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return column in {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    if not _has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _create_indexes(conn: Connection, table: Table) -> None:
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+# 每個遷移使用自己凍結的表定義，不引用 src.models 中的模型：模型以後改變時，
+# 舊版本遷移建出的表結構保持不變，新增的列和約束只在對應的遷移中出現。
+# 只被外鍵引用的表用僅含主鍵的佔位定義，不會被創建。
+
+def _task_ref(metadata: MetaData) -> Table:
+    return Table('task', metadata, Column('id', Integer, primary_key=True))
+
+
+def _content_blob_ref(metadata: MetaData) -> Table:
+    return Table('content_blob', metadata, Column('digest', String(64), primary_key=True))
+
+
+def _baseline(conn: Connection) -> None:
+    metadata = MetaData()
+    Table(
+        'user', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('username', String(80), unique=True, nullable=False),
+        Column('email', String(120), unique=True, nullable=False),
+        Column('password_hash', String(255), nullable=False),
+        Column('created_at', DateTime),
+        Column('is_active', Boolean),
+    )
+    Table(
+        'task', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+        Column('title', String(200), nullable=False),
+        Column('description', Text, nullable=False),
+        Column('task_type', String(50), nullable=False),
+        Column('status', String(20)),
+        Column('progress', Integer),
+        Column('result_data', Text),
+        Column('created_at', DateTime),
+        Column('updated_at', DateTime),
+    )
+    Table(
+        'task_step', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('task_id', Integer, ForeignKey('task.id'), nullable=False),
+        Column('step_number', Integer, nullable=False),
+        Column('step_type', String(50), nullable=False),
+        Column('content', Text, nullable=False),
+        Column('timestamp', DateTime),
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _content_blobs(conn: Connection) -> None:
+    metadata = MetaData()
+    Table(
+        'content_blob', metadata,
+        Column('digest', String(64), primary_key=True),
+        Column('codec', String(10), nullable=False),
+        Column('raw_size', Integer, nullable=False),
+        Column('stored_size', Integer, nullable=False),
+        Column('data', LargeBinary, nullable=False),
+        Column('created_at', DateTime),
+    ).create(conn, checkfirst=True)
+    _add_column(conn, 'task_step', 'content_ref', 'VARCHAR(64) REFERENCES content_blob (digest)')
+    _add_column(conn, 'task', 'result_ref', 'VARCHAR(64) REFERENCES content_blob (digest)')
+
+
+def _task_archive(conn: Connection) -> None:
+    metadata = MetaData()
+    _task_ref(metadata)
+    Table(
+        'task_archive', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('task_id', Integer, ForeignKey('task.id'), unique=True, nullable=False),
+        Column('step_count', Integer, nullable=False),
+        Column('codec', String(10), nullable=False),
+        Column('raw_size', Integer, nullable=False),
+        Column('stored_size', Integer, nullable=False),
+        Column('data', LargeBinary, nullable=False),
+        Column('archived_at', DateTime),
+    ).create(conn, checkfirst=True)
+
+
+def _task_indexes(conn: Connection) -> None:
+    metadata = MetaData()
+    task = Table(
+        'task', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('user_id', Integer),
+        Column('status', String(20)),
+        Column('created_at', DateTime),
+    )
+    task_step = Table(
+        'task_step', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('task_id', Integer),
+        Column('step_number', Integer),
+    )
+    Index('ix_task_user_created', task.c.user_id, task.c.created_at)
+    Index('ix_task_user_status', task.c.user_id, task.c.status)
+    Index('ix_task_step_task_number', task_step.c.task_id, task_step.c.step_number)
+    _create_indexes(conn, task)
+    _create_indexes(conn, task_step)
+
+
+def _has_cascade(conn: Connection, table: str, column: str) -> bool:
+    for fk in inspect(conn).get_foreign_keys(table):
+        if fk['constrained_columns'] == [column]:
+            return (fk.get('options') or {}).get('ondelete', '').upper() == 'CASCADE'
+    return False
+
+
+def _rebuild_sqlite_table(conn: Connection, table: Table) -> None:
+    """SQLite 不能修改外鍵，按給定的表定義重建 task 的子表並複製數據"""
+    name = table.name
+    old_name = f"{name}_old"
+    old_columns = {c['name'] for c in inspect(conn).get_columns(name)}
+    columns = ', '.join(c.name for c in table.columns if c.name in old_columns)
+
+    for index in inspect(conn).get_indexes(name):
+        conn.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+    conn.execute(text(f"ALTER TABLE {name} RENAME TO {old_name}"))
+    table.create(conn)
+    # 舊數據中可能有指向已刪除任務的孤立行，開啟外鍵約束後無法複製
+    conn.execute(text(
+        f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {old_name} "
+        f"WHERE task_id IN (SELECT id FROM task)"
+    ))
+    conn.execute(text(f"DROP TABLE {old_name}"))
+
+
+def _cascade_task_children(conn: Connection) -> None:
+    # 版本5時 task_step 和 task_archive 的完整定義，SQLite 按此重建
+    metadata = MetaData()
+    _task_ref(metadata)
+    _content_blob_ref(metadata)
+    task_step = Table(
+        'task_step', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('task_id', Integer, ForeignKey('task.id', ondelete='CASCADE'), nullable=False),
+        Column('step_number', Integer, nullable=False),
+        Column('step_type', String(50), nullable=False),
+        Column('content', Text, nullable=False),
+        Column('content_ref', String(64), ForeignKey('content_blob.digest')),
+        Column('timestamp', DateTime),
+        Index('ix_task_step_task_number', 'task_id', 'step_number'),
+    )
+    task_archive = Table(
+        'task_archive', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('task_id', Integer, ForeignKey('task.id', ondelete='CASCADE'), unique=True, nullable=False),
+        Column('step_count', Integer, nullable=False),
+        Column('codec', String(10), nullable=False),
+        Column('raw_size', Integer, nullable=False),
+        Column('stored_size', Integer, nullable=False),
+        Column('data', LargeBinary, nullable=False),
+        Column('archived_at', DateTime),
+    )
+
+    for table in (task_step, task_archive):
+        if _has_cascade(conn, table.name, 'task_id'):
+            continue
+
+        if conn.dialect.name == 'sqlite':
+            _rebuild_sqlite_table(conn, table)
+            continue
+
+        for fk in inspect(conn).get_foreign_keys(table.name):
+            if fk['constrained_columns'] == ['task_id'] and fk.get('name'):
+                conn.execute(text(f"ALTER TABLE {table.name} DROP CONSTRAINT {fk['name']}"))
+        conn.execute(text(
+            f"ALTER TABLE {table.name} ADD CONSTRAINT {table.name}_task_id_fkey "
+            f"FOREIGN KEY (task_id) REFERENCES task (id) ON DELETE CASCADE"
+        ))
+
+
+def _task_checkpoint(conn: Connection) -> None:
+    metadata = MetaData()
+    _task_ref(metadata)
+    Table(
+        'task_checkpoint', metadata,
+        Column('task_id', Integer, ForeignKey('task.id', ondelete='CASCADE'), primary_key=True),
+        Column('iteration', Integer, nullable=False),
+        Column('phase', String(20), nullable=False),
+        Column('state', Text, nullable=False),
+        Column('updated_at', DateTime),
+    ).create(conn, checkfirst=True)
+
+
+def _full_text_search(conn: Connection) -> None:
+    search.install(conn)
+
+
+def _task_queued_at(conn: Connection) -> None:
+    _add_column(conn, 'task', 'queued_at', 'DATETIME')
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'baseline user, task and task_step tables', _baseline),
+    Migration(2, 'compressed content blobs', _content_blobs),
+    Migration(3, 'task step archive', _task_archive),
+    Migration(4, 'task list and step lookup indexes', _task_indexes),
+    Migration(5, 'cascade task deletes to steps and archives', _cascade_task_children),
+    Migration(6, 'TAO loop checkpoints', _task_checkpoint),
+    Migration(7, 'full-text search over tasks and steps', _full_text_search),
+    Migration(8, 'task execution queue marker', _task_queued_at),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(engine: Engine) -> int:
+    """讀取已應用的最大版本號，沒有版本表時返回 0"""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table('schema_version'):
+            return 0
+        return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> List[Migration]:
+    """執行所有未應用的遷移，返回本次應用的遷移"""
+    target = LATEST_VERSION if target is None else target
+    schema_version.create(engine, checkfirst=True)
+
+    version = current_version(engine)
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= version or migration.version > target:
+            continue
+
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(schema_version.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow()
+            ))
+        logging.info(f"Applied migration {migration.version}: {migration.description}")
+        applied.append(migration)
+
+    return applied
+
+
+def reset(engine: Engine) -> None:
+    """刪除版本表和搜索索引表（配合 drop_all 重建數據庫）"""
+    with engine.begin() as conn:
+        search.drop(conn)
+    schema_version.drop(engine, checkfirst=True)
+
+
+def check_schema(engine: Engine) -> int:
+    """
+    啟動時的快速版本檢查。空數據庫（版本0）或設置了 LYNUS_AUTO_MIGRATE 時
+    自動升級，其餘版本落後的情況拋出 SchemaOutdatedError。
+    """
+    try:
+        version = current_version(engine)
+    except Exception as e:
+        raise SchemaOutdatedError(f"Cannot read schema version: {str(e)}")
+
+    if version < LATEST_VERSION:
+        if version == 0 or os.getenv('LYNUS_AUTO_MIGRATE', '').lower() in ('1', 'true', 'yes'):
+            try:
+                upgrade(engine)
+            except Exception:
+                # 多個工作進程同時啟動時，其他進程可能已完成升級
+                if current_version(engine) < LATEST_VERSION:
+                    raise
+            return LATEST_VERSION
+        raise SchemaOutdatedError(
+            f"Database schema is at version {version}, code expects {LATEST_VERSION}. Run `python migrate.py`."
+        )
+    return version
@@ -0,0 +1,220 @@
+"""
+LLM 模型路由
+
+按 TAO 階段（thought、action、observation）和任務類型選擇模型鏈，鏈中第一個
+模型遇到 429、5xx、超時或連接錯誤時依次回退到下一個模型。路由通過
+LYNUS_MODEL_ROUTES（JSON）配置，查找順序為 "階段:任務類型"、"階段"、"default"：
+
+    {"default": ["openai/gpt-oss-20b:free"],
+     "observation": ["small/fast-model", "openai/gpt-oss-20b:free"],
+     "action:webpage": ["strong/model", "openai/gpt-oss-20b:free"]}
+
+每個模型的調用次數、延遲、錯誤和回退次數記錄在內存中，由 /api/agent/status 返回。
+
+設置 LYNUS_HEDGE_ENABLED=1 後啟用請求對沖：主請求超過該模型最近延遲的
+LYNUS_HEDGE_PERCENTILE（默認95）分位數仍未返回時，發出一個備用請求
+（LYNUS_HEDGE_TARGET=same 為同一模型，next 為鏈中下一個模型），取先成功的響應。
+備用請求數不超過主請求數的 LYNUS_HEDGE_BUDGET（默認0.1）。
+"""
+
+import os
+import json
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MODEL = "openai/gpt-oss-20b:free"
+
+# 回退到下一個模型的 HTTP 狀態碼
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class ModelCallError(Exception):
+    """單個模型調用失敗；retryable 表示可以回退到鏈中的下一個模型"""
+
+    def __init__(self, model: str, message: str, retryable: bool, status_code: Optional[int] = None):
+        super().__init__(f"{model}: {message}")
+        self.model = model
+        self.retryable = retryable
+        self.status_code = status_code
+
+
+def load_routes() -> Dict[str, List[str]]:
+    routes = {'default': [DEFAULT_MODEL]}
+    raw = os.getenv('LYNUS_MODEL_ROUTES')
+    if not raw:
+        return routes
+
+    try:
+        configured = json.loads(raw)
+    except ValueError as e:
+        logging.error(f"Invalid LYNUS_MODEL_ROUTES, using default model: {str(e)}")
+        return routes
+
+    for key, chain in configured.items():
+        if isinstance(chain, str):
+            chain = [chain]
+        if isinstance(chain, list) and chain and all(isinstance(m, str) for m in chain):
+            routes[key] = chain
+        else:
+            logging.error(f"Ignoring invalid model route {key!r}")
+    return routes
+
+
+class ModelStats:
+    """每個模型的調用統計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _entry(self, model: str) -> Dict[str, float]:
+        if model not in self._stats:
+            self._stats[model] = {
+                'calls': 0, 'successes': 0, 'errors': 0, 'fallbacks': 0,
+                'total_latency_ms': 0.0, 'max_latency_ms': 0.0,
+                'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0,
+            }
+        return self._stats[model]
+
+    def record(self, model: str, latency: float, success: bool, fallback: bool = False) -> None:
+        latency_ms = latency * 1000
+        with self._lock:
+            entry = self._entry(model)
+            entry['calls'] += 1
+            entry['successes' if success else 'errors'] += 1
+            if fallback:
+                entry['fallbacks'] += 1
+            entry['total_latency_ms'] += latency_ms
+            entry['max_latency_ms'] = max(entry['max_latency_ms'], latency_ms)
+
+    def record_usage(self, model: str, usage: Optional[Dict[str, Any]]) -> None:
+        """記錄響應 usage 中的 token 數，cached_tokens 為命中提示詞緩存的部分"""
+        if not isinstance(usage, dict):
+            return
+        details = usage.get('prompt_tokens_details') or {}
+        with self._lock:
+            entry = self._entry(model)
+            entry['prompt_tokens'] += usage.get('prompt_tokens') or 0
+            entry['completion_tokens'] += usage.get('completion_tokens') or 0
+            entry['cached_tokens'] += details.get('cached_tokens') or 0
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            result = {}
+            for model, entry in self._stats.items():
+                result[model] = {
+                    'calls': int(entry['calls']),
+                    'successes': int(entry['successes']),
+                    'errors': int(entry['errors']),
+                    'fallbacks': int(entry['fallbacks']),
+                    'avg_latency_ms': round(entry['total_latency_ms'] / entry['calls'], 1) if entry['calls'] else 0,
+                    'max_latency_ms': round(entry['max_latency_ms'], 1),
+                    'prompt_tokens': int(entry['prompt_tokens']),
+                    'cached_tokens': int(entry['cached_tokens']),
+                    'completion_tokens': int(entry['completion_tokens']),
+                    'cache_hit_ratio': round(entry['cached_tokens'] / entry['prompt_tokens'], 3) if entry['prompt_tokens'] else 0,
+                }
+            return result
+
+
+class Hedger:
+    """記錄每個模型最近的成功延遲，決定何時發出備用請求"""
+
+    def __init__(self, enabled: bool = False, percentile: float = 95, budget: float = 0.1,
+                 target: str = 'same', min_delay: float = 0.5, initial_delay: float = 8.0,
+                 min_samples: int = 20, window: int = 200):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget
+        self.target = target
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, deque] = {}
+        self._stats = {
+            'requests': 0, 'hedges': 0, 'hedge_wins': 0, 'primary_wins': 0, 'budget_exhausted': 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> 'Hedger':
+        return cls(
+            enabled=os.getenv('LYNUS_HEDGE_ENABLED', '').lower() in ('1', 'true', 'yes'),
+            percentile=float(os.getenv('LYNUS_HEDGE_PERCENTILE', 95)),
+            budget=float(os.getenv('LYNUS_HEDGE_BUDGET', 0.1)),
+            target=os.getenv('LYNUS_HEDGE_TARGET', 'same'),
+            min_delay=float(os.getenv('LYNUS_HEDGE_MIN_DELAY', 0.5)),
+            initial_delay=float(os.getenv('LYNUS_HEDGE_INITIAL_DELAY', 8.0)),
+        )
+
+    def observe(self, model: str, latency: float) -> None:
+        """記錄一次成功響應的延遲（秒）"""
+        with self._lock:
+            if model not in self._latencies:
+                self._latencies[model] = deque(maxlen=self.window)
+            self._latencies[model].append(latency)
+
+    def delay(self, model: str) -> Optional[float]:
+        """返回發出備用請求前的等待時間，未啟用時返回 None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._stats['requests'] += 1
+            samples = sorted(self._latencies.get(model, ()))
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        index = min(int(len(samples) * self.percentile / 100), len(samples) - 1)
+        return max(samples[index], self.min_delay)
+
+    def backup_model(self, chain: List[str], index: int) -> str:
+        if self.target == 'next' and index + 1 < len(chain):
+            return chain[index + 1]
+        return chain[index]
+
+    def acquire(self) -> bool:
+        """在預算內佔用一次備用請求"""
+        with self._lock:
+            if self._stats['hedges'] + 1 > self.budget * self._stats['requests'] + 1:
+                self._stats['budget_exhausted'] += 1
+                return False
+            self._stats['hedges'] += 1
+            return True
+
+    def record_winner(self, hedge_won: bool) -> None:
+        with self._lock:
+            self._stats['hedge_wins' if hedge_won else 'primary_wins'] += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats, enabled=self.enabled)
+        decided = stats['hedge_wins'] + stats['primary_wins']
+        stats['hedge_win_rate'] = round(stats['hedge_wins'] / decided, 3) if decided else 0
+        return stats
+
+
+class ModelRouter:
+    def __init__(self, routes: Optional[Dict[str, List[str]]] = None):
+        self.routes = routes or load_routes()
+        self.stats = ModelStats()
+        self.hedger = Hedger.from_env()
+
+    def chain(self, phase: str, task_type: Optional[str] = None) -> List[str]:
+        """返回該階段和任務類型的模型回退鏈"""
+        for key in (f"{phase}:{task_type}", phase, 'default'):
+            if key in self.routes:
+                return self.routes[key]
+        return [DEFAULT_MODEL]
+
+    def all_models(self) -> List[str]:
+        models = []
+        for chain in self.routes.values():
+            for model in chain:
+                if model not in models:
+                    models.append(model)
+        return models
+
+
+router = ModelRouter()
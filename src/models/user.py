@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import json
 
 db = SQLAlchemy()
 
@@ -34,6 +35,11 @@ class User(db.Model):
         }
 
 class Task(db.Model):
+    __table_args__ = (
+        db.Index('ix_task_user_created', 'user_id', 'created_at'),
+        db.Index('ix_task_user_status', 'user_id', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -42,13 +48,28 @@ class Task(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, running, completed, failed
     progress = db.Column(db.Integer, default=0)  # 0-100
     result_data = db.Column(db.Text)  # JSON string of results
+    result_ref = db.Column(db.String(64), db.ForeignKey('content_blob.digest'))  # 大結果的壓縮存儲
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    queued_at = db.Column(db.DateTime)  # 提交到執行隊列的時間；只創建未執行的任務為空
     
     # 關聯到任務步驟
-    steps = db.relationship('TaskStep', backref='task', lazy=True, cascade='all, delete-orphan')
+    # 刪除任務時由數據庫 ON DELETE CASCADE 刪除步驟，不把步驟加載到會話
+    steps = db.relationship('TaskStep', backref='task', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    # 已歸檔的舊步驟
+    archive = db.relationship('TaskArchive', backref='task', lazy=True, uselist=False, cascade='all, delete-orphan', passive_deletes=True)
+    # 執行中任務的TAO循環檢查點
+    checkpoint = db.relationship('TaskCheckpoint', backref='task', lazy=True, uselist=False, cascade='all, delete-orphan', passive_deletes=True)
 
-    def to_dict(self):
+    def get_result_data(self):
+        """獲取完整結果（如已壓縮存儲則解壓）"""
+        if self.result_ref:
+            from src.blob_store import load_text
+            return load_text(self.result_ref)
+        return self.result_data
+
+    def to_dict(self, full=True):
+        """full=False 時不加載壓縮存儲的大內容，只返回預覽"""
         return {
             'id': self.id,
             'user_id': self.user_id,
@@ -57,26 +78,99 @@ class Task(db.Model):
             'task_type': self.task_type,
             'status': self.status,
             'progress': self.progress,
-            'result_data': self.result_data,
+            'result_data': self.get_result_data() if full else self.result_data,
+            'result_truncated': bool(self.result_ref) and not full,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'steps': [step.to_dict() for step in self.steps]
+            'steps': self.get_steps(full=full)
         }
 
+    def get_steps(self, full=True):
+        """步驟列表；full=True 時合併歸檔記錄中的步驟，按步驟號排序"""
+        steps = [step.to_dict(full=full) for step in self.steps]
+        if full and self.archive:
+            # 歸檔提交後、原步驟刪除前中斷時兩邊會有相同的步驟；SQLite 會重用
+            # 已刪除步驟的 id，所以按步驟號、類型和時間去重
+            def key(step):
+                return step['step_number'], step['step_type'], step['timestamp']
+            seen = {key(step) for step in steps}
+            for step in self.archive.get_steps():
+                if key(step) not in seen:
+                    seen.add(key(step))
+                    steps.append(step)
+            steps.sort(key=lambda step: step['step_number'])
+        return steps
+
 class TaskStep(db.Model):
+    __table_args__ = (
+        db.Index('ix_task_step_task_number', 'task_id', 'step_number'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), nullable=False)
     step_number = db.Column(db.Integer, nullable=False)
     step_type = db.Column(db.String(50), nullable=False)  # thought, action, observation
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(db.Text, nullable=False)  # 大內容只保存預覽
+    content_ref = db.Column(db.String(64), db.ForeignKey('content_blob.digest'))  # 完整內容的壓縮存儲
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    def to_dict(self):
+
+    def get_content(self):
+        """獲取完整內容（如已壓縮存儲則解壓）"""
+        if self.content_ref:
+            from src.blob_store import load_text
+            return load_text(self.content_ref)
+        return self.content
+
+    def to_dict(self, full=True):
+        """full=False 時不加載壓縮存儲的大內容，只返回預覽"""
         return {
             'id': self.id,
             'task_id': self.task_id,
             'step_number': self.step_number,
             'step_type': self.step_type,
-            'content': self.content,
+            'content': self.get_content() if full else self.content,
+            'content_truncated': bool(self.content_ref) and not full,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None
         }
+
+class ContentBlob(db.Model):
+    """壓縮存儲的大內容，按SHA-256內容尋址（相同內容只存一份）"""
+    __tablename__ = 'content_blob'
+
+    digest = db.Column(db.String(64), primary_key=True)  # 原文的 SHA-256
+    codec = db.Column(db.String(10), nullable=False)  # zlib, zstd
+    raw_size = db.Column(db.Integer, nullable=False)
+    stored_size = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TaskArchive(db.Model):
+    """已完成任務的步驟歸檔，整個任務的步驟壓縮為一條記錄"""
+    __tablename__ = 'task_archive'
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), unique=True, nullable=False)
+    step_count = db.Column(db.Integer, nullable=False)
+    codec = db.Column(db.String(10), nullable=False)
+    raw_size = db.Column(db.Integer, nullable=False)
+    stored_size = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)  # 壓縮的步驟 JSON 列表
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def get_steps(self):
+        """解壓歸檔的步驟"""
+        from src.blob_store import decompress
+        return json.loads(decompress(self.codec, self.data).decode('utf-8'))
+
+class TaskCheckpoint(db.Model):
+    """TAO循環的檢查點，每完成一個階段覆蓋寫入，進程重啟後從此恢復"""
+    __tablename__ = 'task_checkpoint'
+
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), primary_key=True)
+    iteration = db.Column(db.Integer, nullable=False)  # 從0開始
+    phase = db.Column(db.String(20), nullable=False)  # thought, action, executed, observation
+    state = db.Column(db.Text, nullable=False)  # JSON: context, thought, action_data, action_result, final_result
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_state(self):
+        return json.loads(self.state)
@@ -0,0 +1,362 @@
+"""
+按需性能分析
+
+只對管理員開放（LYNUS_ADMIN_USERS，見 src/auth.py），關閉時除了
+每個請求檢查一次請求頭外沒有額外開銷：
+- 單個請求：管理員的請求帶 X-Lynus-Profile: 1 時，用 cProfile 統計每個函數的
+  調用次數和耗時，同時按 LYNUS_PROFILE_INTERVAL_MS（默認1毫秒）採樣該請求
+  線程的調用棧。響應頭 X-Lynus-Profile-Id 返回分析結果的 ID。
+- Agent 線程：POST /api/agent/profiling/sampler 啟動採樣線程，按指定頻率讀取
+  所有執行中 Agent 線程（lynus-agent-*）的調用棧，到時間或手動停止後保存。
+  調用棧以所屬任務（task-<id>）為根節點。
+
+結果保存在 LYNUS_PROFILE_DIR（默認 LYNUS_ARTIFACT_DIR/profiles，保留最近
+LYNUS_PROFILE_KEEP 個）：<id>.folded 為 collapsed-stack 格式（可直接用
+flamegraph.pl 或 speedscope 打開），<id>.json 為每個函數的耗時匯總，請求分析
+另有 cProfile 的 <id>.prof。只分析處理請求的進程。
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import g, request, session
+
+from src.artifact_store import ARTIFACT_DIR
+from src.auth import ADMIN_USERS, is_admin
+
+PROFILE_HEADER = 'X-Lynus-Profile'
+PROFILE_DIR = os.getenv('LYNUS_PROFILE_DIR', os.path.join(ARTIFACT_DIR, 'profiles'))
+PROFILE_KEEP = int(os.getenv('LYNUS_PROFILE_KEEP', 50))
+REQUEST_INTERVAL = float(os.getenv('LYNUS_PROFILE_INTERVAL_MS', 1)) / 1000
+MAX_DURATION = float(os.getenv('LYNUS_PROFILE_MAX_SECONDS', 300))
+AGENT_THREAD_PREFIX = 'lynus-agent'
+# 匯總中保留的函數數
+TOP_FUNCTIONS = 50
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 線程 ident -> 正在執行的任務 ID（Agent 線程棧的根節點）
+_thread_tasks: Dict[int, int] = {}
+_lock = threading.Lock()
+_sampler: Optional['Sampler'] = None
+
+
+class ProfilerBusyError(RuntimeError):
+    """已有採樣在進行"""
+
+
+def tag_thread(task_id: Optional[int]) -> None:
+    """標記當前線程正在執行的任務（None 清除）"""
+    ident = threading.get_ident()
+    if task_id is None:
+        _thread_tasks.pop(ident, None)
+    else:
+        _thread_tasks[ident] = task_id
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(PROJECT_ROOT):
+        return os.path.relpath(filename, PROJECT_ROOT)
+    parts = filename.replace('\\', '/').split('/')
+    return '/'.join(parts[-2:])
+
+
+class Sampler:
+    """定期讀取目標線程的調用棧，按 collapsed-stack 格式計數"""
+
+    def __init__(self, interval: float, select: Callable[[Dict[int, str]], Dict[int, str]],
+                 duration: float = MAX_DURATION, kind: str = 'agent', target: str = '',
+                 on_done: Optional[Callable[['Sampler'], None]] = None):
+        self.interval = interval
+        # 參數為 {ident: 線程名}，返回需要採樣的 {ident: 根節點名}
+        self.select = select
+        self.duration = min(duration, MAX_DURATION)
+        self.kind = kind
+        self.target = target
+        # 到時間自動結束時在採樣線程中調用（stop() 停止時不調用）
+        self.on_done = on_done
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+            self._labels[code] = label
+        return label
+
+    def sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        targets = self.select(names)
+        if not targets:
+            return
+        frames = sys._current_frames()
+        for ident, root in targets.items():
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(root)
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _loop(self) -> None:
+        deadline = self.started_at + self.duration
+        while not self._stop.wait(self.interval):
+            if time.time() >= deadline:
+                break
+            try:
+                self.sample()
+            except Exception as e:
+                logging.warning(f"Profiler sample failed: {str(e)}")
+                break
+        self.stopped_at = time.time()
+        if self.on_done is not None and not self._stop.is_set():
+            try:
+                self.on_done(self)
+            except Exception as e:
+                logging.error(f"Failed to save profile: {str(e)}")
+
+    def start(self) -> 'Sampler':
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._loop, name='lynus-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def functions(self, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+        """每個函數的自身/累計採樣數和估算耗時（採樣數 × 間隔）"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [
+            {
+                'function': name,
+                'samples': samples,
+                'self_samples': own[name],
+                'total_ms': round(samples * self.interval * 1000, 3),
+                'self_ms': round(own[name] * self.interval * 1000, 3),
+            }
+            for name, samples in total.most_common(limit)
+        ]
+
+    def folded(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _profile_path(profile_id: str, ext: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{ext}")
+
+
+def _prune() -> None:
+    try:
+        summaries = sorted(
+            (name for name in os.listdir(PROFILE_DIR) if name.endswith('.json')),
+            key=lambda name: os.path.getmtime(os.path.join(PROFILE_DIR, name))
+        )
+    except OSError:
+        return
+    for name in summaries[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        profile_id = name[:-len('.json')]
+        for ext in ('json', 'folded', 'prof'):
+            try:
+                os.remove(_profile_path(profile_id, ext))
+            except OSError:
+                pass
+
+
+def save(sampler: Sampler, meta: Dict[str, Any], profile: Optional[cProfile.Profile] = None) -> Dict[str, Any]:
+    """保存分析結果，返回匯總"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = f"{sampler.kind}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    summary = dict(
+        meta,
+        id=profile_id,
+        kind=sampler.kind,
+        target=sampler.target,
+        started_at=sampler.started_at,
+        duration_ms=round(((sampler.stopped_at or time.time()) - sampler.started_at) * 1000, 3),
+        interval_ms=sampler.interval * 1000,
+        samples=sampler.samples,
+        sampled_functions=sampler.functions(),
+    )
+
+    if profile is not None:
+        profile.dump_stats(_profile_path(profile_id, 'prof'))
+        stats = pstats.Stats(profile)
+        rows = []
+        for (filename, lineno, name), (calls, _, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                'function': f"{name} ({_short_path(filename)}:{lineno})",
+                'calls': calls,
+                'self_ms': round(tottime * 1000, 3),
+                'total_ms': round(cumtime * 1000, 3),
+            })
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        summary['functions'] = rows[:TOP_FUNCTIONS]
+
+    with open(_profile_path(profile_id, 'folded'), 'w', encoding='utf-8') as f:
+        f.write(sampler.folded())
+    with open(_profile_path(profile_id, 'json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False)
+    _prune()
+    return summary
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    profiles = []
+    try:
+        names = [name for name in os.listdir(PROFILE_DIR) if name.endswith('.json')]
+    except OSError:
+        return profiles
+    for name in names:
+        try:
+            with open(os.path.join(PROFILE_DIR, name), encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profiles.append({key: summary.get(key) for key in ('id', 'kind', 'target', 'started_at', 'duration_ms', 'samples')})
+    profiles.sort(key=lambda p: p['started_at'] or 0, reverse=True)
+    return profiles
+
+
+def profile_file(profile_id: str, ext: str) -> Optional[str]:
+    """分析結果文件路徑；ID 不合法或文件不存在時返回 None"""
+    if not profile_id or not all(c.isalnum() or c == '-' for c in profile_id):
+        return None
+    path = _profile_path(profile_id, ext)
+    return path if os.path.exists(path) else None
+
+
+def _agent_threads(prefix: str) -> Callable[[Dict[int, str]], Dict[int, str]]:
+    def select(names: Dict[int, str]) -> Dict[int, str]:
+        return {
+            ident: f"task-{_thread_tasks[ident]}" if ident in _thread_tasks else name
+            for ident, name in names.items() if name.startswith(prefix)
+        }
+    return select
+
+
+def start_sampler(interval: float, duration: float, prefix: str = AGENT_THREAD_PREFIX) -> Sampler:
+    """啟動 Agent 線程採樣；已有採樣在進行時拋出 ProfilerBusyError"""
+    global _sampler
+    with _lock:
+        if _sampler is not None and _sampler.running:
+            raise ProfilerBusyError("A sampling profile is already running")
+        _sampler = Sampler(interval, _agent_threads(prefix), duration, target=prefix, on_done=_finish).start()
+        return _sampler
+
+
+def _finish(sampler: Sampler) -> Optional[Dict[str, Any]]:
+    """保存採樣結果；手動停止和到時間結束只有先到的一方保存"""
+    global _sampler
+    with _lock:
+        if _sampler is not sampler:
+            return None
+        _sampler = None
+    sampler.stop()
+    return save(sampler, {'threads': sampler.target})
+
+
+def stop_sampler() -> Optional[Dict[str, Any]]:
+    """停止 Agent 線程採樣並保存，沒有進行中的採樣時返回 None"""
+    with _lock:
+        sampler = _sampler
+    if sampler is None:
+        return None
+    return _finish(sampler)
+
+
+def sampler_status() -> Optional[Dict[str, Any]]:
+    with _lock:
+        sampler = _sampler
+    if sampler is None:
+        return None
+    return {
+        'running': sampler.running,
+        'threads': sampler.target,
+        'interval_ms': sampler.interval * 1000,
+        'elapsed_seconds': round(time.time() - sampler.started_at, 3),
+        'duration_seconds': sampler.duration,
+        'samples': sampler.samples,
+    }
+
+
+def _before_request():
+    if PROFILE_HEADER not in request.headers or not ADMIN_USERS:
+        return
+    user_id = session.get('user_id')
+    if not user_id:
+        return
+    from src.models.user import User
+    if not is_admin(User.query.get(user_id)):
+        return
+
+    ident = threading.get_ident()
+    # 選擇函數在採樣線程中執行，不能訪問 request，根節點名需提前確定
+    root = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+    sampler = Sampler(REQUEST_INTERVAL, lambda names: {ident: root}, kind='request', target=root)
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # 其他線程正在使用 cProfile（Python 3.12+ 同時只能有一個），只做採樣
+        profile = None
+    g.profiling = (sampler.start(), profile)
+
+
+def _after_request(response):
+    state = g.pop('profiling', None)
+    if state is None:
+        return response
+    sampler, profile = state
+    if profile is not None:
+        profile.disable()
+    sampler.stop()
+    try:
+        summary = save(sampler, {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+        }, profile)
+        response.headers['X-Lynus-Profile-Id'] = summary['id']
+    except Exception as e:
+        logging.error(f"Failed to save request profile: {str(e)}")
+    return response
+
+
+def init_profiling(app) -> None:
+    app.before_request(_before_request)
+    app.after_request(_after_request)
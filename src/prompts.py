@@ -0,0 +1,127 @@
+"""
+TAO 各階段的提示詞構建
+
+所有階段共用同一段靜態系統提示詞，緊接着是每個任務不變的任務信息，二者組成
+逐字節相同的前綴；每次調用變化的內容（累積上下文、思考結果、行動結果和階段指令）
+只放在前綴之後。這樣同一任務的所有階段和迭代都能命中提供方的提示詞緩存。
+
+OpenAI 等模型自動緩存前綴；Anthropic、Gemini 等需要顯式標記的模型
+（LYNUS_CACHE_CONTROL_MODELS，按前綴匹配）在前綴末尾加 cache_control 斷點。
+"""
+
+import os
+import json
+from typing import Any, Dict, List
+
+SYSTEM_PROMPT = """你是Lynus AI Agent，一個模仿Manus AI的智能助手。你通過思考（Thought）、行動（Action）、觀察（Observation）的循環完成用戶的任務。
+
+你的能力包括：
+- 圖像生成和編輯
+- 簡報製作
+- 網頁設計和開發
+- 電子表格處理
+- 數據可視化
+- 文檔生成
+- 代碼編寫
+- 網頁分析和模仿
+
+可用的行動類型：
+1. generate_image - 生成圖像
+2. create_slides - 創建簡報
+3. build_webpage - 構建網頁
+4. process_spreadsheet - 處理電子表格
+5. create_visualization - 創建數據可視化
+6. write_document - 編寫文檔
+7. write_code - 編寫代碼
+8. analyze_webpage - 分析網頁
+
+各階段的要求：
+- 思考階段：分析任務需求，思考如何完成這個任務，並制定詳細的執行計劃。
+- 行動階段：基於你的思考選擇一個行動，並提供執行該行動所需的參數。回應格式（JSON）：
+{
+    "action": "行動類型",
+    "parameters": {
+        "key": "value"
+    },
+    "reasoning": "選擇這個行動的原因"
+}
+- 觀察階段：觀察和分析剛才執行的行動結果，判斷是否成功，是否需要進一步的行動。
+
+process_spreadsheet 的參數：file（上傳文件的產物哈希）、operation（summary、filter、aggregate、group_by、pivot），
+以及 filters（[{"column": "列名", "op": ">", "value": 100}]）、columns、group_by、aggregations（{"列名": ["sum", "mean"]}）、
+pivot 的 index/columns/values/agg、output_format（csv 或 xlsx）。
+
+create_visualization 的參數：chart_type（line、area、scatter、bar、pie）、file（上傳文件的產物哈希）或 data（{"列名": [...]}），
+x、y（列名，折線圖等可為多個列）、title，以及 downsample（lttb 或 minmax）。
+
+analyze_webpage 的參數：url、depth（繼續抓取同源鏈接的層數，默認0）、include_resources（是否抓取樣式表）、max_pages。"""
+
+THOUGHT_INSTRUCTION = "當前階段：思考。請分析這個任務，思考需要採取什麼行動來完成它。請詳細說明你的思考過程和計劃。"
+
+ACTION_INSTRUCTION = "當前階段：行動。基於以上信息，請選擇下一步行動。"
+
+OBSERVATION_INSTRUCTION = """當前階段：觀察。請分析這個結果：
+1. 行動是否成功執行？
+2. 結果是否符合預期？
+3. 是否需要進一步的行動？
+4. 如果需要，下一步應該做什麼？"""
+
+# 前綴中的消息數：靜態系統提示詞 + 任務信息
+STABLE_PREFIX_MESSAGES = 2
+
+CACHE_CONTROL_MODELS = [
+    prefix.strip()
+    for prefix in os.getenv('LYNUS_CACHE_CONTROL_MODELS', 'anthropic/,google/gemini').split(',')
+    if prefix.strip()
+]
+
+
+def _prefix(task_type: str, task_description: str) -> List[Dict[str, Any]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"任務類型: {task_type}\n任務描述: {task_description}"},
+    ]
+
+
+def thought_messages(task_type: str, task_description: str, context: str = "") -> List[Dict[str, Any]]:
+    # 上下文逐次迭代只在末尾追加，放在前綴之後也能延長緩存命中的長度
+    return _prefix(task_type, task_description) + [
+        {"role": "user", "content": f"上下文: {context}\n\n{THOUGHT_INSTRUCTION}"},
+    ]
+
+
+def action_messages(task_type: str, task_description: str, thought: str) -> List[Dict[str, Any]]:
+    return _prefix(task_type, task_description) + [
+        {"role": "user", "content": f"我的思考: {thought}\n\n{ACTION_INSTRUCTION}"},
+    ]
+
+
+def observation_messages(task_type: str, task_description: str, action_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    result = json.dumps(action_result, ensure_ascii=False, indent=2)
+    return _prefix(task_type, task_description) + [
+        {"role": "user", "content": f"執行結果：\n{result}\n\n{OBSERVATION_INSTRUCTION}"},
+    ]
+
+
+def supports_cache_control(model: str) -> bool:
+    return any(model.startswith(prefix) for prefix in CACHE_CONTROL_MODELS)
+
+
+def for_model(messages: List[Dict[str, Any]], model: str) -> List[Dict[str, Any]]:
+    """需要顯式緩存斷點的模型在前綴消息上加 cache_control，其他模型原樣返回"""
+    if not supports_cache_control(model):
+        return messages
+
+    marked = []
+    for index, message in enumerate(messages):
+        if index < STABLE_PREFIX_MESSAGES and isinstance(message["content"], str):
+            message = {
+                "role": message["role"],
+                "content": [{
+                    "type": "text",
+                    "text": message["content"],
+                    "cache_control": {"type": "ephemeral"},
+                }],
+            }
+        marked.append(message)
+    return marked
@@ -0,0 +1,369 @@
+"""
+API 限流
+
+按路由或藍圖配置每個 IP 和每個登錄用戶的滑動窗口限額（LYNUS_RATE_LIMITS，
+JSON），查找順序為端點名（如 "auth.login"）、藍圖名（如 "auth"）、"default"：
+
+    {"auth.login": {"ip": "10/minute;100/hour"}, "agent": {"user": "60/minute"}}
+
+滑動窗口按當前和上一個固定窗口的計數加權估算，每個限額只需兩個計數器。
+計數默認保存在本機共享的 SQLite 文件中（LYNUS_RATE_LIMIT_DB），同一台機器上
+的所有 gunicorn 工作進程共用限額；LYNUS_RATE_LIMIT_STORE=memory 時只在進程內
+計數。超限的鍵在進程內記住到可以重試的時間，之後的請求不再訪問共享存儲。
+共享存儲不可用時放行請求（不因限流故障拒絕服務）。
+
+響應帶 RateLimit-Limit / RateLimit-Remaining / RateLimit-Reset / RateLimit-Policy
+頭（取剩餘最少的限額），超限時返回429和 Retry-After。
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import sqlite3
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from flask import g, jsonify, request, session
+
+ENABLED = os.getenv('LYNUS_RATE_LIMIT_ENABLED', '1').lower() not in ('0', 'false', 'no')
+STORE = os.getenv('LYNUS_RATE_LIMIT_STORE', 'sqlite')
+DB_PATH = os.getenv('LYNUS_RATE_LIMIT_DB', os.path.join(tempfile.gettempdir(), 'lynus-ratelimit.db'))
+# 反向代理的層數，用於從 X-Forwarded-For 中取客戶端地址（0 表示直接使用連接地址）
+TRUSTED_PROXIES = int(os.getenv('LYNUS_TRUSTED_PROXIES', 0))
+# 共享存儲加鎖等待的最長時間，超時則放行
+STORE_TIMEOUT = float(os.getenv('LYNUS_RATE_LIMIT_TIMEOUT', 0.5))
+# 每隔多少秒清理一次過期計數
+CLEANUP_INTERVAL = 60
+
+DEFAULT_RULES = {
+    'auth': {'ip': '30/minute;300/hour'},
+    'auth.login': {'ip': '10/minute;100/hour'},
+    'auth.register': {'ip': '5/minute;50/hour'},
+    'auth.check_email': {'ip': '20/minute;200/hour'},
+    'agent': {'user': '60/minute', 'ip': '120/minute'},
+}
+
+SCOPES = ('ip', 'user')
+UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# 不限流的端點（健康檢查、靜態資源）
+EXEMPT_ENDPOINTS = {'health_check', 'serve', 'static'}
+
+
+@dataclass(frozen=True)
+class Limit:
+    amount: int
+    period: int  # 秒
+
+    def __str__(self) -> str:
+        return f"{self.amount}/{self.period}s"
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    limit: Limit
+    remaining: int
+    reset: float  # 當前窗口結束前的秒數
+    retry_after: float = 0.0
+
+
+def parse_limits(value: str) -> List[Limit]:
+    """解析 "10/minute;100/hour" 或 "5/30s" 形式的限額"""
+    limits = []
+    for part in value.replace(',', ';').split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        amount, _, unit = part.partition('/')
+        unit = unit.strip().lower()
+        if unit.rstrip('s') in UNITS:
+            period = UNITS[unit.rstrip('s')]
+        elif unit.endswith('s') and unit[:-1].isdigit():
+            period = int(unit[:-1])
+        else:
+            raise ValueError(f"Invalid rate limit: {part}")
+        if int(amount) < 1 or period < 1:
+            raise ValueError(f"Invalid rate limit: {part}")
+        limits.append(Limit(int(amount), period))
+    return limits
+
+
+def load_rules(raw: Optional[str] = None) -> Dict[str, Dict[str, List[Limit]]]:
+    raw = os.getenv('LYNUS_RATE_LIMITS') if raw is None else raw
+    rules = DEFAULT_RULES
+    if raw:
+        try:
+            rules = json.loads(raw)
+        except ValueError as e:
+            logging.error(f"Invalid LYNUS_RATE_LIMITS, using defaults: {str(e)}")
+    return {
+        name: {scope: parse_limits(value) for scope, value in scopes.items() if scope in SCOPES}
+        for name, scopes in rules.items()
+    }
+
+
+def _estimate(previous: int, current: int, now: float, period: int) -> float:
+    """上一個窗口的計數按未過去的比例計入"""
+    elapsed = (now % period) / period
+    return previous * (1 - elapsed) + current
+
+
+def _retry_after(previous: int, current: int, now: float, limit: Limit) -> float:
+    """估算值降到可以再放行一個請求所需的秒數"""
+    offset = now % limit.period
+    allowance = limit.amount - 1
+    if current <= allowance and previous > 0:
+        # 當前窗口內，上一個窗口的權重下降到足夠小即可
+        target = 1 - (allowance - current) / previous
+        return max(target * limit.period - offset, 0.0)
+    # 要等到下一個窗口，當前計數變為上一個窗口的計數
+    wait = limit.period - offset
+    if current > 0 and current > allowance:
+        wait += limit.period * (1 - allowance / current)
+    return wait
+
+
+class MemoryStore:
+    """進程內計數（單進程部署、測試和 serverless）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (鍵, 窗口) -> [計數, 過期時間]
+        self._counts: Dict[Tuple[str, int], List[float]] = {}
+        self._last_cleanup = time.time()
+
+    def hit(self, keys: List[Tuple[str, Limit]], now: float) -> List[Decision]:
+        with self._lock:
+            counts = []
+            for key, limit in keys:
+                window = int(now // limit.period)
+                previous = self._counts.get((key, window - 1), (0, 0))[0]
+                current = self._counts.get((key, window), (0, 0))[0]
+                counts.append((int(previous), int(current)))
+            decisions = _decide(keys, counts, now)
+            if all(d.allowed for d in decisions):
+                for key, limit in keys:
+                    window = int(now // limit.period)
+                    entry = self._counts.setdefault((key, window), [0, (window + 2) * limit.period])
+                    entry[0] += 1
+
+            if now - self._last_cleanup > CLEANUP_INTERVAL:
+                self._last_cleanup = now
+                self._counts = {k: v for k, v in self._counts.items() if v[1] > now}
+            return decisions
+
+
+class SQLiteStore:
+    """本機共享的 SQLite 計數，每次請求在一個事務內檢查並累加所有限額"""
+
+    def __init__(self, path: str = DB_PATH, timeout: float = STORE_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._last_cleanup = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # 計數丟失只會放寬限流，不需要每次提交都刷盤
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit ("
+                "key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL, expires REAL NOT NULL, "
+                "PRIMARY KEY (key, window)) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def hit(self, keys: List[Tuple[str, Limit]], now: float) -> List[Decision]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            counts = []
+            for key, limit in keys:
+                window = int(now // limit.period)
+                rows = dict(conn.execute(
+                    "SELECT window, count FROM rate_limit WHERE key = ? AND window IN (?, ?)",
+                    (key, window - 1, window)
+                ).fetchall())
+                counts.append((rows.get(window - 1, 0), rows.get(window, 0)))
+            decisions = _decide(keys, counts, now)
+            if all(d.allowed for d in decisions):
+                conn.executemany(
+                    "INSERT INTO rate_limit (key, window, count, expires) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (key, window) DO UPDATE SET count = count + 1",
+                    [
+                        (key, int(now // limit.period), (int(now // limit.period) + 2) * limit.period)
+                        for key, limit in keys
+                    ]
+                )
+
+            if now - self._last_cleanup > CLEANUP_INTERVAL:
+                self._last_cleanup = now
+                conn.execute("DELETE FROM rate_limit WHERE expires < ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return decisions
+
+
+def _decide(keys: List[Tuple[str, Limit]], counts: List[Tuple[int, int]], now: float) -> List[Decision]:
+    decisions = []
+    for (key, limit), (previous, current) in zip(keys, counts):
+        estimate = _estimate(previous, current, now, limit.period)
+        reset = limit.period - now % limit.period
+        if estimate + 1 > limit.amount:
+            decisions.append(Decision(False, limit, 0, reset, _retry_after(previous, current, now, limit)))
+        else:
+            decisions.append(Decision(True, limit, max(int(limit.amount - estimate - 1), 0), reset))
+    return decisions
+
+
+class RateLimiter:
+    def __init__(self, rules: Dict[str, Dict[str, List[Limit]]], store):
+        self.rules = rules
+        self.store = store
+        self._lock = threading.Lock()
+        # 進程內快速路徑：超限的鍵到可以重試的時間
+        self._blocked: Dict[str, Tuple[float, Decision]] = {}
+        self._stats = {'checked': 0, 'limited': 0, 'local_rejects': 0, 'store_errors': 0}
+
+    @classmethod
+    def from_env(cls) -> 'RateLimiter':
+        return cls(load_rules(), MemoryStore() if STORE == 'memory' else SQLiteStore())
+
+    def rules_for(self, endpoint: Optional[str], blueprint: Optional[str]) -> Tuple[Optional[str], Dict[str, List[Limit]]]:
+        for name in (endpoint, blueprint, 'default'):
+            if name and name in self.rules:
+                return name, self.rules[name]
+        return None, {}
+
+    def check(self, rule: str, limits: Dict[str, List[Limit]], identities: Dict[str, Optional[str]],
+              now: Optional[float] = None) -> Optional[Decision]:
+        """累加一次請求，返回剩餘最少（或被拒絕）的限額；沒有適用的限額時返回 None"""
+        now = time.time() if now is None else now
+        keys = [
+            (f"{scope}:{identities[scope]}:{rule}:{limit.period}", limit)
+            for scope, scope_limits in limits.items() if identities.get(scope)
+            for limit in scope_limits
+        ]
+        if not keys:
+            return None
+
+        with self._lock:
+            self._stats['checked'] += 1
+            for key, _ in keys:
+                blocked = self._blocked.get(key)
+                if blocked and blocked[0] > now:
+                    self._stats['limited'] += 1
+                    self._stats['local_rejects'] += 1
+                    decision = blocked[1]
+                    return Decision(False, decision.limit, 0, decision.reset, blocked[0] - now)
+
+        try:
+            decisions = self.store.hit(keys, now)
+        except sqlite3.Error as e:
+            with self._lock:
+                self._stats['store_errors'] += 1
+            logging.warning(f"Rate limit store unavailable, allowing request: {str(e)}")
+            return None
+
+        denied = [(key, d) for (key, _), d in zip(keys, decisions) if not d.allowed]
+        if denied:
+            with self._lock:
+                self._stats['limited'] += 1
+                for key, decision in denied:
+                    self._blocked[key] = (now + decision.retry_after, decision)
+                if len(self._blocked) > 10000:
+                    self._blocked = {k: v for k, v in self._blocked.items() if v[0] > now}
+            return max((d for _, d in denied), key=lambda d: d.retry_after)
+        return min(decisions, key=lambda d: (d.remaining, -d.reset))
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return dict(
+                self._stats,
+                enabled=ENABLED,
+                store=type(self.store).__name__,
+                blocked_keys=sum(1 for until, _ in self._blocked.values() if until > time.time()),
+            )
+
+
+def pick_client_ip(forwarded_for: Optional[str], remote_addr: Optional[str]) -> str:
+    """按 X-Forwarded-For 和連接地址確定客戶端地址（Flask 和 ASGI 入口共用）"""
+    # 每層代理在 X-Forwarded-For 末尾追加它看到的地址，只信任最後 TRUSTED_PROXIES 個
+    if TRUSTED_PROXIES and forwarded_for:
+        route = [part.strip() for part in forwarded_for.split(',') if part.strip()]
+        if len(route) >= TRUSTED_PROXIES:
+            return route[-TRUSTED_PROXIES]
+    return remote_addr or 'unknown'
+
+
+def client_ip() -> str:
+    return pick_client_ip(request.headers.get('X-Forwarded-For'), request.remote_addr)
+
+
+def response_headers(decision: Decision) -> Dict[str, str]:
+    """限流結果對應的響應頭"""
+    headers = {
+        'RateLimit-Limit': str(decision.limit.amount),
+        'RateLimit-Remaining': str(decision.remaining),
+        'RateLimit-Reset': str(math.ceil(decision.reset)),
+        'RateLimit-Policy': f"{decision.limit.amount};w={decision.limit.period}",
+    }
+    if not decision.allowed:
+        headers['Retry-After'] = str(max(math.ceil(decision.retry_after), 1))
+    return headers
+
+
+limiter = RateLimiter.from_env()
+
+
+def get_stats() -> Dict[str, object]:
+    return limiter.snapshot()
+
+
+def _before_request():
+    if request.method == 'OPTIONS' or not request.endpoint or request.endpoint in EXEMPT_ENDPOINTS:
+        return None
+
+    rule, limits = limiter.rules_for(request.endpoint, request.blueprint)
+    if not limits:
+        return None
+
+    user_id = session.get('user_id')
+    decision = limiter.check(rule, limits, {'ip': client_ip(), 'user': str(user_id) if user_id else None})
+    if decision is None:
+        return None
+
+    g.rate_limit = decision
+    if not decision.allowed:
+        return jsonify({
+            'error': 'Rate limit exceeded',
+            'retry_after': math.ceil(decision.retry_after)
+        }), 429
+    return None
+
+
+def _after_request(response):
+    decision = g.pop('rate_limit', None)
+    if decision is None:
+        return response
+
+    response.headers.update(response_headers(decision))
+    return response
+
+
+def init_rate_limit(app) -> None:
+    if not ENABLED:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
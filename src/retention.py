@@ -0,0 +1,153 @@
+"""
+任務步驟保留策略
+
+後台定期將完成超過 N 天的任務步驟壓縮為一條 TaskArchive 記錄，
+然後分批刪除原步驟（每批單獨提交，避免長時間持有寫鎖）。
+歸檔後 /api/tasks/<id> 通過 Task.get_steps() 合併歸檔中和之後新增的步驟。
+
+環境變量：
+- LYNUS_RETENTION_DAYS: 任務完成多少天後歸檔，未設置則不啟動後台任務
+- LYNUS_RETENTION_STATUSES: 需要歸檔的任務狀態，逗號分隔（默認 completed）
+- LYNUS_RETENTION_BATCH: 每批刪除的步驟數（默認 500）
+- LYNUS_RETENTION_MAX_TASKS: 每輪最多歸檔的任務數（默認 200）
+- LYNUS_RETENTION_INTERVAL: 兩輪之間的間隔秒數（默認 3600）
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user import db, Task, TaskStep, TaskArchive
+from src import blob_store
+
+
+@dataclass
+class RetentionPolicy:
+    days: int = 30
+    statuses: List[str] = field(default_factory=lambda: ['completed'])
+    batch_size: int = 500
+    max_tasks: int = 200
+    interval: int = 3600
+
+    @classmethod
+    def from_env(cls) -> Optional['RetentionPolicy']:
+        """從環境變量讀取策略，未設置 LYNUS_RETENTION_DAYS 時返回 None"""
+        days = os.getenv('LYNUS_RETENTION_DAYS')
+        if not days:
+            return None
+        return cls(
+            days=int(days),
+            statuses=[s.strip() for s in os.getenv('LYNUS_RETENTION_STATUSES', 'completed').split(',') if s.strip()],
+            batch_size=int(os.getenv('LYNUS_RETENTION_BATCH', 500)),
+            max_tasks=int(os.getenv('LYNUS_RETENTION_MAX_TASKS', 200)),
+            interval=int(os.getenv('LYNUS_RETENTION_INTERVAL', 3600)),
+        )
+
+
+def archive_task(task_id: int, batch_size: int = 500) -> int:
+    """將任務的步驟壓縮歸檔並分批刪除，返回歸檔的步驟數"""
+    steps = TaskStep.query.filter_by(task_id=task_id).order_by(TaskStep.step_number).all()
+    if not steps:
+        return 0
+
+    archive = TaskArchive.query.filter_by(task_id=task_id).first()
+    # 上一輪歸檔後又新增的步驟合併到同一條記錄
+    archived_steps = archive.get_steps() if archive else []
+    archived_steps.extend(step.to_dict(full=True) for step in steps)
+
+    raw = json.dumps(archived_steps, ensure_ascii=False).encode('utf-8')
+    codec, data = blob_store.compress(raw)
+
+    if archive is None:
+        archive = TaskArchive(task_id=task_id)
+        db.session.add(archive)
+    archive.step_count = len(archived_steps)
+    archive.codec = codec
+    archive.raw_size = len(raw)
+    archive.stored_size = len(data)
+    archive.data = data
+    archive.archived_at = datetime.utcnow()
+
+    step_ids = [step.id for step in steps]
+    db.session.commit()
+    for step in steps:
+        db.session.expunge(step)
+
+    # 歸檔已提交，原步驟可以分批刪除
+    for start in range(0, len(step_ids), batch_size):
+        db.session.execute(
+            db.delete(TaskStep).where(TaskStep.id.in_(step_ids[start:start + batch_size])),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+
+    return len(step_ids)
+
+
+def run_retention(policy: RetentionPolicy) -> Dict[str, int]:
+    """執行一輪歸檔，返回統計"""
+    cutoff = datetime.utcnow() - timedelta(days=policy.days)
+    task_ids = [
+        row.id for row in db.session.execute(
+            db.select(Task.id)
+            .where(Task.status.in_(policy.statuses), Task.updated_at < cutoff)
+            .where(db.select(TaskStep.id).where(TaskStep.task_id == Task.id).exists())
+            .order_by(Task.updated_at)
+            .limit(policy.max_tasks)
+        )
+    ]
+
+    stats = {'tasks': 0, 'steps': 0, 'blobs_removed': 0}
+    for task_id in task_ids:
+        try:
+            archived = archive_task(task_id, policy.batch_size)
+        except IntegrityError:
+            # 其他工作進程同時歸檔了這個任務
+            db.session.rollback()
+            continue
+        if archived:
+            stats['tasks'] += 1
+            stats['steps'] += archived
+
+    if stats['steps']:
+        stats['blobs_removed'] = blob_store.delete_orphans()
+
+    return stats
+
+
+def _worker(app, policy: RetentionPolicy) -> None:
+    # 錯開多個工作進程的啟動時間
+    time.sleep(random.uniform(0, min(policy.interval, 60)))
+    while True:
+        with app.app_context():
+            try:
+                stats = run_retention(policy)
+                if stats['tasks']:
+                    logging.info(f"Retention archived {stats['steps']} steps from {stats['tasks']} tasks")
+            except Exception as e:
+                db.session.rollback()
+                logging.warning(f"Retention run failed: {str(e)}")
+            finally:
+                db.session.remove()
+        time.sleep(policy.interval)
+
+
+def start_worker(app, policy: Optional[RetentionPolicy] = None) -> Optional[threading.Thread]:
+    """啟動後台歸檔線程，未配置策略時不啟動"""
+    policy = policy or RetentionPolicy.from_env()
+    if policy is None:
+        return None
+
+    thread = threading.Thread(target=_worker, args=(app, policy), name='lynus-retention')
+    thread.daemon = True
+    thread.start()
+    logging.info(f"Retention worker started: archive {','.join(policy.statuses)} tasks older than {policy.days} days")
+    return thread
@@ -1,8 +1,11 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, send_file
 from src.models.user import db, User, Task
-from src.agent_engine import LynusAgent
-import threading
+from src.routes.tasks import parse_batch, insert_task_batch
+from src.auth import is_admin
+from src import task_queue, cancellation, checkpoint, circuit_breaker, evaluator, model_router, rate_limit, profiling, task_watch
 import os
+import sys
+from datetime import datetime, timedelta
 
 agent_bp = Blueprint('agent', __name__)
 
@@ -23,15 +26,6 @@ def require_auth(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
-def execute_task_async(task_id: int, openrouter_api_key: str):
-    """異步執行任務"""
-    try:
-        agent = LynusAgent(openrouter_api_key)
-        result = agent.execute_task(task_id, openrouter_api_key)
-        print(f"Task {task_id} execution result: {result}")
-    except Exception as e:
-        print(f"Task {task_id} execution failed: {str(e)}")
-
 @agent_bp.route('/execute', methods=['POST'])
 @require_auth
 def execute_task(user):
@@ -64,7 +58,8 @@ def execute_task(user):
             title=title,
             description=description,
             task_type=task_type,
-            status='pending'
+            status='pending',
+            queued_at=datetime.utcnow()
         )
         
         db.session.add(task)
@@ -79,13 +74,8 @@ def execute_task(user):
         if not openrouter_api_key:
             return jsonify({'error': 'OpenRouter API key is required'}), 400
         
-        # 在後台線程中執行任務
-        thread = threading.Thread(
-            target=execute_task_async,
-            args=(task.id, openrouter_api_key)
-        )
-        thread.daemon = True
-        thread.start()
+        # 提交到後台執行隊列
+        task_queue.enqueue(task.id, openrouter_api_key)
         
         return jsonify({
             'message': 'Task execution started',
@@ -131,7 +121,8 @@ def quick_execute(user):
             title=title,
             description=description,
             task_type=task_type,
-            status='pending'
+            status='pending',
+            queued_at=datetime.utcnow()
         )
         
         db.session.add(task)
@@ -146,12 +137,7 @@ def quick_execute(user):
             return jsonify({'error': 'OpenRouter API key is required'}), 400
         
         # 在後台執行
-        thread = threading.Thread(
-            target=execute_task_async,
-            args=(task.id, openrouter_api_key)
-        )
-        thread.daemon = True
-        thread.start()
+        task_queue.enqueue(task.id, openrouter_api_key)
         
         return jsonify({
             'message': 'Quick task execution started',
@@ -162,6 +148,82 @@ def quick_execute(user):
         db.session.rollback()
         return jsonify({'error': f'Failed to start quick execution: {str(e)}'}), 500
 
+@agent_bp.route('/batch-execute', methods=['POST'])
+@require_auth
+def batch_execute(user):
+    """批量創建任務並提交到執行隊列"""
+    try:
+        data = request.get_json()
+        
+        items, error = parse_batch(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        # 先檢查API密鑰，避免創建無法執行的任務
+        openrouter_api_key = os.getenv('OPENROUTER_API_KEY') or data.get('api_key')
+        if not openrouter_api_key:
+            return jsonify({'error': 'OpenRouter API key is required'}), 400
+        
+        results, tasks = insert_task_batch(user, items, queued=True)
+        
+        for task_id in [r['task_id'] for r in results if r['success']]:
+            task_queue.enqueue(task_id, openrouter_api_key)
+        
+        return jsonify({
+            'message': f'{len(tasks)} tasks queued for execution',
+            'created': len(tasks),
+            'failed': len(results) - len(tasks),
+            'enqueued': len(tasks),
+            'results': results
+        }), 202 if tasks else 400
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to start batch execution: {str(e)}'}), 500
+
+@agent_bp.route('/resume/<int:task_id>', methods=['POST'])
+@require_auth
+def resume_task(user, task_id):
+    """從檢查點恢復被中斷或失敗的任務"""
+    try:
+        task = Task.query.filter_by(id=task_id, user_id=user.id).first()
+        
+        if not task:
+            return jsonify({'error': 'Task not found'}), 404
+        
+        if task.checkpoint is None:
+            return jsonify({'error': 'Task has no checkpoint to resume from'}), 409
+        
+        # 仍在其他進程中正常執行的任務不能重複執行
+        stale_before = datetime.utcnow() - timedelta(seconds=checkpoint.STALE_SECONDS)
+        if task.status == 'running' and task.updated_at and task.updated_at >= stale_before:
+            return jsonify({'error': 'Task is still running'}), 409
+        
+        if task.status not in ['running', 'failed']:
+            return jsonify({'error': f'Task is already {task.status}'}), 409
+        
+        data = request.get_json(silent=True) or {}
+        openrouter_api_key = os.getenv('OPENROUTER_API_KEY') or data.get('api_key')
+        if not openrouter_api_key:
+            return jsonify({'error': 'OpenRouter API key is required'}), 400
+        
+        task.status = 'pending'
+        task.updated_at = task.queued_at = datetime.utcnow()
+        db.session.commit()
+        
+        task_queue.enqueue(task.id, openrouter_api_key)
+        
+        return jsonify({
+            'message': 'Task resumed from checkpoint',
+            'iteration': task.checkpoint.iteration + 1,
+            'phase': task.checkpoint.phase,
+            'task': task.to_dict(full=False)
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to resume task: {str(e)}'}), 500
+
 @agent_bp.route('/capabilities', methods=['GET'])
 def get_capabilities():
     """獲取Agent能力列表"""
@@ -247,9 +309,21 @@ def get_agent_status():
             'agent_version': '1.0.0',
             'database': db_status,
             'api_key': api_key_status,
-            'supported_models': ['openai/gpt-oss-20b:free'],
+            'supported_models': model_router.router.all_models(),
+            'model_routes': model_router.router.routes,
+            'model_stats': model_router.router.stats.snapshot(),
+            'hedging': model_router.router.hedger.snapshot(),
+            'circuit_breaker': circuit_breaker.breaker.snapshot(),
+            'observation': evaluator.get_stats(),
+            # 圖表渲染和網頁抓取模塊延遲加載，只在使用過後才有統計
+            'charts': sys.modules['src.chart_renderer'].get_stats() if 'src.chart_renderer' in sys.modules else None,
+            'web_fetch': sys.modules['src.web_analyzer'].get_stats() if 'src.web_analyzer' in sys.modules else None,
             'max_iterations': 10,
-            'status': 'operational' if db_status == "healthy" else 'degraded'
+            'queued_tasks': task_queue.queued_count(),
+            'cancellation': cancellation.get_stats(),
+            'rate_limit': rate_limit.get_stats(),
+            'task_watch': task_watch.get_stats(),
+            'status': 'operational' if db_status == "healthy" and circuit_breaker.breaker.state == 'closed' else 'degraded'
         }
         
         return jsonify(status), 200
@@ -260,3 +334,76 @@ def get_agent_status():
             'error': str(e)
         }), 500
 
+@agent_bp.route('/profiling', methods=['GET'])
+@require_auth
+def list_profiles(user):
+    """列出已保存的性能分析結果和當前的採樣狀態（僅管理員）"""
+    if not is_admin(user):
+        return jsonify({'error': 'Admin access required'}), 403
+
+    return jsonify({
+        'sampler': profiling.sampler_status(),
+        'profiles': profiling.list_profiles()
+    }), 200
+
+@agent_bp.route('/profiling/sampler', methods=['POST'])
+@require_auth
+def start_profiling(user):
+    """開始採樣本進程中執行的 Agent 線程"""
+    if not is_admin(user):
+        return jsonify({'error': 'Admin access required'}), 403
+
+    data = request.get_json(silent=True) or {}
+    try:
+        rate = float(data.get('rate', 100))
+        duration = float(data.get('duration', 30))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'rate and duration must be numbers'}), 400
+    if not 1 <= rate <= 1000 or duration <= 0:
+        return jsonify({'error': 'rate must be between 1 and 1000 Hz and duration positive'}), 400
+
+    try:
+        profiling.start_sampler(1 / rate, duration, data.get('threads') or profiling.AGENT_THREAD_PREFIX)
+    except profiling.ProfilerBusyError as e:
+        return jsonify({'error': str(e)}), 409
+
+    return jsonify({'sampler': profiling.sampler_status()}), 202
+
+@agent_bp.route('/profiling/sampler', methods=['DELETE'])
+@require_auth
+def stop_profiling(user):
+    """提前停止採樣並保存結果（到時間後自動保存）"""
+    if not is_admin(user):
+        return jsonify({'error': 'Admin access required'}), 403
+
+    try:
+        summary = profiling.stop_sampler()
+    except Exception as e:
+        return jsonify({'error': f'Failed to save profile: {str(e)}'}), 500
+    if summary is None:
+        return jsonify({'error': 'No sampling profile is running'}), 404
+    return jsonify(summary), 200
+
+@agent_bp.route('/profiling/<profile_id>', methods=['GET'])
+@require_auth
+def get_profile(user, profile_id):
+    """下載分析結果：format=json（默認，函數耗時匯總）、folded（火焰圖）或 prof（cProfile）"""
+    if not is_admin(user):
+        return jsonify({'error': 'Admin access required'}), 403
+
+    output_format = request.args.get('format', 'json')
+    if output_format not in ('json', 'folded', 'prof'):
+        return jsonify({'error': 'format must be json, folded or prof'}), 400
+
+    path = profiling.profile_file(profile_id, output_format)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+
+    if output_format == 'json':
+        return send_file(path, mimetype='application/json')
+    return send_file(
+        path,
+        mimetype='text/plain' if output_format == 'folded' else 'application/octet-stream',
+        as_attachment=True,
+        download_name=os.path.basename(path)
+    )
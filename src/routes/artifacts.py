@@ -0,0 +1,97 @@
+from flask import Blueprint, request, jsonify, session, send_file
+from src.models.user import User
+from src import artifact_store
+import os
+
+artifacts_bp = Blueprint('artifacts', __name__)
+
+# 上傳文件大小上限（默認2GB）
+MAX_UPLOAD_BYTES = int(os.getenv('LYNUS_UPLOAD_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+
+# 可在瀏覽器中直接顯示的類型；其餘（HTML、SVG、腳本等）一律作為附件下載，
+# 避免用戶或模型生成的內容在本站源下執行
+INLINE_MIMETYPES = {
+    'image/png', 'image/jpeg', 'image/gif', 'image/webp',
+    'text/csv', 'text/plain',
+}
+
+def require_auth(f):
+    """認證裝飾器"""
+    def decorated_function(*args, **kwargs):
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        user = User.query.get(user_id)
+        if not user or not user.is_active:
+            session.pop('user_id', None)
+            return jsonify({'error': 'User not found or inactive'}), 401
+        
+        return f(user, *args, **kwargs)
+    
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+@artifacts_bp.route('/upload', methods=['POST'])
+@require_auth
+def upload_artifact(user):
+    """
+    上傳文件（如供 Agent 處理的 CSV/XLSX），邊接收邊寫入產物存儲。
+    支持 multipart 表單的 file 字段，或直接以請求體上傳（?filename= 指定文件名）。
+    """
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            stream = upload.stream
+            filename = upload.filename
+            mimetype = upload.mimetype
+        else:
+            stream = request.stream
+            filename = request.args.get('filename')
+            mimetype = request.mimetype
+        
+        if mimetype in (None, '', 'application/octet-stream') and filename:
+            mimetype = 'text/csv' if filename.lower().endswith('.csv') else mimetype
+        
+        meta = artifact_store.put_stream(stream, mimetype or 'application/octet-stream', max_size=MAX_UPLOAD_BYTES)
+        if meta['size'] == 0:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        artifact_store.add_owner(meta['hash'], user.id)
+        
+        return jsonify({
+            'message': 'File uploaded successfully',
+            'artifact': artifact_store.make_ref(meta, filename)
+        }), 201
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        return jsonify({'error': f'Failed to upload file: {str(e)}'}), 500
+
+@artifacts_bp.route('/<digest>', methods=['GET'])
+@require_auth
+def download_artifact(user, digest):
+    """下載產物，支持 Range 和 ETag；內容尋址的文件永不改變，可長期緩存"""
+    found = artifact_store.get(digest)
+    # 不屬於當前用戶的產物與不存在的產物返回相同結果
+    if not found or not artifact_store.is_owner(digest, user.id):
+        return jsonify({'error': 'Artifact not found'}), 404
+    
+    path, meta = found
+    filename = request.args.get('filename') or None
+    inline = meta['mimetype'] in INLINE_MIMETYPES and request.args.get('download', 0, type=int) != 1
+    
+    response = send_file(
+        path,
+        mimetype=meta['mimetype'],
+        as_attachment=not inline,
+        download_name=filename or digest,
+        conditional=True,
+        etag=digest,
+        max_age=31536000
+    )
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = 'sandbox'
+    return response
@@ -1,10 +1,16 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.user import db, User, Task, TaskStep
-import json
-from datetime import datetime
+from src.json_provider import dumps
+from src import artifact_store, blob_store, export, search, task_queue, task_watch
+import os
+import logging
+from datetime import datetime, timedelta
 
 tasks_bp = Blueprint('tasks', __name__)
 
+VALID_TASK_TYPES = ['image', 'slides', 'webpage', 'spreadsheet', 'visualization', 'general']
+MAX_BATCH_SIZE = 500
+
 def require_auth(f):
     """認證裝飾器"""
     def decorated_function(*args, **kwargs):
@@ -22,6 +28,76 @@ def require_auth(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+def build_task(user_id, data, queued=False):
+    """根據請求數據構建任務，返回 (task, error)；queued=True 表示創建後提交到執行隊列"""
+    if not isinstance(data, dict):
+        return None, 'Invalid task data'
+
+    description = str(data.get('description') or '').strip()
+    task_type = str(data.get('task_type') or 'general').strip()
+    title = str(data.get('title') or '').strip()
+
+    if not description:
+        return None, 'Task description is required'
+
+    # 如果沒有提供標題，從描述中生成
+    if not title:
+        title = description[:50] + ('...' if len(description) > 50 else '')
+
+    # 驗證任務類型
+    if task_type not in VALID_TASK_TYPES:
+        task_type = 'general'
+
+    return Task(
+        user_id=user_id,
+        title=title[:200],
+        description=description,
+        task_type=task_type,
+        status='pending',
+        queued_at=datetime.utcnow() if queued else None
+    ), None
+
+def insert_task_batch(user, items, queued=False):
+    """驗證並在一個事務中批量插入任務，返回 (每項結果, 創建的任務)"""
+    results = []
+    tasks = []
+    for index, item in enumerate(items):
+        task, error = build_task(user.id, item, queued)
+        if error:
+            results.append({'index': index, 'success': False, 'error': error})
+        else:
+            results.append({'index': index, 'success': True})
+            tasks.append(task)
+
+    if tasks:
+        db.session.add_all(tasks)
+        # flush 時批量插入並取回 id，提交後無需逐個刷新對象
+        db.session.flush()
+        task_ids = iter([task.id for task in tasks])
+        db.session.commit()
+
+        for result in results:
+            if result['success']:
+                result['task_id'] = next(task_ids)
+
+    return results, tasks
+
+def parse_batch(data):
+    """檢查批量請求的任務列表，返回 (items, error)"""
+    if not data:
+        return None, 'No data provided'
+    if not isinstance(data, dict):
+        return None, 'Request body must be a JSON object'
+
+    items = data.get('tasks')
+    if not isinstance(items, list) or not items:
+        return None, 'Tasks list is required'
+
+    if len(items) > MAX_BATCH_SIZE:
+        return None, f'At most {MAX_BATCH_SIZE} tasks per batch'
+
+    return items, None
+
 @tasks_bp.route('/create', methods=['POST'])
 @require_auth
 def create_task(user):
@@ -31,30 +107,9 @@ def create_task(user):
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        description = data.get('description', '').strip()
-        task_type = data.get('task_type', 'general').strip()
-        title = data.get('title', '').strip()
-        
-        if not description:
-            return jsonify({'error': 'Task description is required'}), 400
-        
-        # 如果沒有提供標題，從描述中生成
-        if not title:
-            title = description[:50] + ('...' if len(description) > 50 else '')
-        
-        # 驗證任務類型
-        valid_types = ['image', 'slides', 'webpage', 'spreadsheet', 'visualization', 'general']
-        if task_type not in valid_types:
-            task_type = 'general'
-        
-        # 創建新任務
-        task = Task(
-            user_id=user.id,
-            title=title,
-            description=description,
-            task_type=task_type,
-            status='pending'
-        )
+        task, error = build_task(user.id, data)
+        if error:
+            return jsonify({'error': error}), 400
         
         db.session.add(task)
         db.session.commit()
@@ -68,6 +123,41 @@ def create_task(user):
         db.session.rollback()
         return jsonify({'error': f'Failed to create task: {str(e)}'}), 500
 
+@tasks_bp.route('/batch', methods=['POST'])
+@require_auth
+def create_tasks_batch(user):
+    """批量創建任務，可選提交到執行隊列"""
+    try:
+        data = request.get_json()
+        
+        items, error = parse_batch(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        openrouter_api_key = None
+        if data.get('execute'):
+            openrouter_api_key = os.getenv('OPENROUTER_API_KEY') or data.get('api_key')
+            if not openrouter_api_key:
+                return jsonify({'error': 'OpenRouter API key is required'}), 400
+        
+        results, tasks = insert_task_batch(user, items, queued=bool(openrouter_api_key))
+        
+        if openrouter_api_key:
+            for task_id in [r['task_id'] for r in results if r['success']]:
+                task_queue.enqueue(task_id, openrouter_api_key)
+        
+        return jsonify({
+            'message': f'{len(tasks)} tasks created',
+            'created': len(tasks),
+            'failed': len(results) - len(tasks),
+            'enqueued': len(tasks) if openrouter_api_key else 0,
+            'results': results
+        }), 201 if tasks else 400
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to create tasks: {str(e)}'}), 500
+
 @tasks_bp.route('/list', methods=['GET'])
 @require_auth
 def list_tasks(user):
@@ -96,8 +186,11 @@ def list_tasks(user):
             error_out=False
         )
         
+        # 列表默認不解壓大內容，需要時傳 full=1
+        full = request.args.get('full', 0, type=int) == 1
+
         return jsonify({
-            'tasks': [task.to_dict() for task in tasks.items],
+            'tasks': [task.to_dict(full=full) for task in tasks.items],
             'pagination': {
                 'page': page,
                 'per_page': per_page,
@@ -111,6 +204,134 @@ def list_tasks(user):
     except Exception as e:
         return jsonify({'error': f'Failed to list tasks: {str(e)}'}), 500
 
+@tasks_bp.route('/search', methods=['GET'])
+@require_auth
+def search_tasks(user):
+    """按標題、描述和步驟內容全文搜索任務，結果按相關度排序"""
+    try:
+        q = request.args.get('q', '').strip()
+        if not q:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+        hits, total = search.search(
+            db.session.connection(), user.id, q, page, per_page,
+            status=request.args.get('status'),
+            task_type=request.args.get('task_type')
+        )
+
+        # 一次查詢載入當前頁的任務
+        ids = [hit['task_id'] for hit in hits]
+        tasks = {task.id: task for task in Task.query.filter(Task.id.in_(ids)).all()} if ids else {}
+
+        # 只在步驟中命中的任務，用第一個命中的步驟生成摘要
+        terms = search.parse_terms(q)
+        step_only = [hit['task_id'] for hit in hits if hit['matched_in'] == ['steps']]
+        step_content = {}
+        if step_only:
+            patterns = [TaskStep.content.ilike(search.escape_like(term), escape='\\') for term in terms]
+            steps = TaskStep.query.filter(TaskStep.task_id.in_(step_only), db.or_(*patterns)) \
+                .order_by(TaskStep.task_id, TaskStep.step_number).all()
+            for step in steps:
+                step_content.setdefault(step.task_id, step.content)
+
+        results = []
+        for hit in hits:
+            task = tasks.get(hit['task_id'])
+            if not task:
+                continue
+            content = step_content.get(task.id) or f"{task.title} {task.description}"
+            results.append(dict(
+                task.to_dict(full=False),
+                search={
+                    'score': hit['score'],
+                    'matched_in': hit['matched_in'],
+                    'snippet': search.snippet(content, terms)
+                }
+            ))
+
+        pages = (total + per_page - 1) // per_page
+        return jsonify({
+            'query': q,
+            'tasks': results,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': pages,
+                'has_next': page < pages,
+                'has_prev': page > 1
+            }
+        }), 200
+
+    except search.SearchUnavailableError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to search tasks: {str(e)}'}), 500
+
+@tasks_bp.route('/export', methods=['GET'])
+@require_auth
+def export_tasks(user):
+    """流式導出用戶的全部任務（format=ndjson|csv），內存佔用與任務數無關"""
+    output_format = request.args.get('format', 'ndjson')
+    if output_format not in export.FORMATS:
+        return jsonify({'error': f"Unsupported format, use one of: {', '.join(export.FORMATS)}"}), 400
+
+    batches = export.task_batches(
+        user.id,
+        status=request.args.get('status'),
+        task_type=request.args.get('task_type'),
+        full=request.args.get('full', 0, type=int) == 1
+    )
+    return export.stream_response(batches, output_format, export.TASK_FIELDS, 'tasks')
+
+@tasks_bp.route('/steps/export', methods=['GET'])
+@require_auth
+def export_steps(user):
+    """流式導出任務步驟，默認包含已歸檔的步驟；task_id 限定單個任務"""
+    output_format = request.args.get('format', 'ndjson')
+    if output_format not in export.FORMATS:
+        return jsonify({'error': f"Unsupported format, use one of: {', '.join(export.FORMATS)}"}), 400
+
+    task_id = request.args.get('task_id', type=int)
+    if task_id is not None and not Task.query.filter_by(id=task_id, user_id=user.id).first():
+        return jsonify({'error': 'Task not found'}), 404
+
+    batches = export.step_batches(
+        user.id,
+        task_id=task_id,
+        full=request.args.get('full', 0, type=int) == 1,
+        include_archived=request.args.get('include_archived', 1, type=int) == 1
+    )
+    return export.stream_response(batches, output_format, export.STEP_FIELDS, 'steps')
+
+@tasks_bp.route('/<int:task_id>/wait', methods=['GET'])
+@require_auth
+def wait_task(user, task_id):
+    """長輪詢：狀態與 since（上次返回的 cursor）不同時立即返回，否則等到變化或超時"""
+    try:
+        timeout = task_watch.clamp_timeout(request.args.get('timeout', 25, type=float))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        task = Task.query.filter_by(id=task_id, user_id=user.id).first()
+        if not task:
+            return jsonify({'error': 'Task not found'}), 404
+        # 結束讀事務，等待期間不持有數據庫快照
+        db.session.rollback()
+
+        state, changed = task_watch.wait(task_id, request.args.get('since'), timeout)
+        if state is None:
+            return jsonify({'error': 'Task not found'}), 404
+        return jsonify({'task': state, 'changed': changed}), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to wait for task: {str(e)}'}), 500
+
 @tasks_bp.route('/<int:task_id>', methods=['GET'])
 @require_auth
 def get_task(user, task_id):
@@ -120,7 +341,9 @@ def get_task(user, task_id):
         if not task:
             return jsonify({'error': 'Task not found'}), 404
         
-        return jsonify({'task': task.to_dict()}), 200
+        full = request.args.get('full', 1, type=int) == 1
+        
+        return jsonify({'task': task.to_dict(full=full)}), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to get task: {str(e)}'}), 500
@@ -201,9 +424,10 @@ def update_task_status(user, task_id):
         if status and status not in valid_statuses:
             return jsonify({'error': 'Invalid status'}), 400
         
-        # 更新任務
+        # 更新任務；手動設置狀態的任務不再由後台恢復執行
         if status:
             task.status = status
+            task.queued_at = None
         
         if progress is not None:
             if not isinstance(progress, int) or progress < 0 or progress > 100:
@@ -212,7 +436,7 @@ def update_task_status(user, task_id):
         
         if result_data is not None:
             if isinstance(result_data, dict):
-                task.result_data = json.dumps(result_data)
+                task.result_data = dumps(result_data)
             else:
                 task.result_data = str(result_data)
         
@@ -220,6 +444,9 @@ def update_task_status(user, task_id):
         
         db.session.commit()
         
+        if status == 'cancelled':
+            task_queue.cancel(task_id)
+        
         return jsonify({
             'message': 'Task updated successfully',
             'task': task.to_dict()
@@ -229,6 +456,34 @@ def update_task_status(user, task_id):
         db.session.rollback()
         return jsonify({'error': f'Failed to update task: {str(e)}'}), 500
 
+@tasks_bp.route('/<int:task_id>/cancel', methods=['POST'])
+@require_auth
+def cancel_task(user, task_id):
+    """取消任務：排隊中的任務不再執行，執行中的任務在下一個檢查點停止"""
+    try:
+        task = Task.query.filter_by(id=task_id, user_id=user.id).first()
+        
+        if not task:
+            return jsonify({'error': 'Task not found'}), 404
+        
+        if task.status not in ['pending', 'running']:
+            return jsonify({'error': f'Task is already {task.status}'}), 409
+        
+        task.status = 'cancelled'
+        task.updated_at = datetime.utcnow()
+        db.session.commit()
+        
+        task_queue.cancel(task_id)
+        
+        return jsonify({
+            'message': 'Task cancelled successfully',
+            'task': task.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to cancel task: {str(e)}'}), 500
+
 @tasks_bp.route('/<int:task_id>', methods=['DELETE'])
 @require_auth
 def delete_task(user, task_id):
@@ -238,15 +493,166 @@ def delete_task(user, task_id):
         if not task:
             return jsonify({'error': 'Task not found'}), 404
         
+        # 先取消，執行中的 Agent 在刪除前停止，不再寫入步驟
+        if task.status in ['pending', 'running']:
+            task.status = 'cancelled'
+            task.updated_at = datetime.utcnow()
+            db.session.commit()
+            task_queue.cancel(task_id)
+        
+        content_refs = content_refs_of(Task.id == task_id)
         db.session.delete(task)
         db.session.commit()
         
+        release_content([task_id], content_refs)
+        
         return jsonify({'message': 'Task deleted successfully'}), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to delete task: {str(e)}'}), 500
 
+def content_refs_of(*conditions):
+    """符合條件的任務及其步驟引用的壓縮內容摘要"""
+    task_ids = db.select(Task.id).where(*conditions)
+    refs = db.select(TaskStep.content_ref).where(TaskStep.task_id.in_(task_ids), TaskStep.content_ref.isnot(None)).union(
+        db.select(Task.result_ref).where(*conditions, Task.result_ref.isnot(None))
+    )
+    return db.session.execute(refs).scalars().all()
+
+def release_content(task_ids, content_refs):
+    """任務刪除後清理不再被引用的壓縮內容和產物；失敗不影響刪除結果"""
+    try:
+        blob_store.delete_unreferenced(content_refs)
+    except Exception as e:
+        db.session.rollback()
+        logging.warning(f"Failed to delete unreferenced content: {str(e)}")
+    for task_id in task_ids:
+        try:
+            artifact_store.release_task(task_id)
+        except OSError as e:
+            logging.warning(f"Failed to release artifacts of task {task_id}: {str(e)}")
+
+def bulk_conditions(user, data):
+    """根據 ids 或過濾條件（status、older_than_days）生成批量操作的條件，返回 (conditions, error)"""
+    if not data:
+        return None, 'No data provided'
+    if not isinstance(data, dict):
+        return None, 'Request body must be a JSON object'
+
+    conditions = [Task.user_id == user.id]
+    has_filter = False
+
+    ids = data.get('ids')
+    if ids is not None:
+        # bool 是 int 的子類，true/false 不能當作任務 ID
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return None, 'ids must be a list of integers'
+        if len(ids) > 10000:
+            return None, 'At most 10000 ids per request'
+        conditions.append(Task.id.in_(ids))
+        has_filter = True
+
+    status = data.get('status')
+    if status is not None:
+        statuses = status if isinstance(status, list) else [status]
+        if not all(s in ['pending', 'running', 'completed', 'failed', 'cancelled'] for s in statuses):
+            return None, 'Invalid status'
+        conditions.append(Task.status.in_(statuses))
+        has_filter = True
+
+    older_than_days = data.get('older_than_days')
+    if older_than_days is not None:
+        if not isinstance(older_than_days, int) or older_than_days < 0:
+            return None, 'older_than_days must be a non-negative integer'
+        conditions.append(Task.created_at < datetime.utcnow() - timedelta(days=older_than_days))
+        has_filter = True
+
+    # 至少需要一個條件，避免誤刪全部任務
+    if not has_filter:
+        return None, 'ids, status or older_than_days is required'
+
+    return conditions, None
+
+@tasks_bp.route('/bulk-delete', methods=['POST'])
+@require_auth
+def bulk_delete_tasks(user):
+    """按 ids 或過濾條件批量刪除任務，步驟由數據庫級聯刪除"""
+    try:
+        conditions, error = bulk_conditions(user, request.get_json())
+        if error:
+            return jsonify({'error': error}), 400
+        
+        # 取消會改變狀態，先按條件確定要刪除的任務和它們引用的內容
+        rows = db.session.execute(db.select(Task.id, Task.status).where(*conditions)).all()
+        task_ids = [row.id for row in rows]
+        content_refs = content_refs_of(*conditions)
+        
+        # 先取消尚未結束的任務，執行中的 Agent 在刪除前停止
+        running_ids = [row.id for row in rows if row.status in ['pending', 'running']]
+        for start in range(0, len(running_ids), 500):
+            db.session.execute(
+                db.update(Task)
+                .where(Task.id.in_(running_ids[start:start + 500]))
+                .values(status='cancelled', updated_at=datetime.utcnow()),
+                execution_options={'synchronize_session': False}
+            )
+        db.session.commit()
+        for task_id in running_ids:
+            task_queue.cancel(task_id)
+        
+        deleted = 0
+        for start in range(0, len(task_ids), 500):
+            result = db.session.execute(
+                db.delete(Task).where(Task.user_id == user.id, Task.id.in_(task_ids[start:start + 500])),
+                execution_options={'synchronize_session': False}
+            )
+            deleted += result.rowcount
+        db.session.commit()
+        
+        release_content(task_ids, content_refs)
+        
+        return jsonify({
+            'message': 'Tasks deleted successfully',
+            'deleted': deleted
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to delete tasks: {str(e)}'}), 500
+
+@tasks_bp.route('/bulk-cancel', methods=['POST'])
+@require_auth
+def bulk_cancel_tasks(user):
+    """按 ids 或過濾條件批量取消尚未結束的任務"""
+    try:
+        conditions, error = bulk_conditions(user, request.get_json())
+        if error:
+            return jsonify({'error': error}), 400
+        
+        conditions.append(Task.status.in_(['pending', 'running']))
+        task_ids = db.session.execute(db.select(Task.id).where(*conditions)).scalars().all()
+        
+        result = db.session.execute(
+            db.update(Task)
+            .where(*conditions)
+            .values(status='cancelled', updated_at=datetime.utcnow()),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        
+        for task_id in task_ids:
+            task_queue.cancel(task_id)
+        
+        return jsonify({
+            'message': 'Tasks cancelled successfully',
+            'cancelled': result.rowcount
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to cancel tasks: {str(e)}'}), 500
+
 @tasks_bp.route('/stats', methods=['GET'])
 @require_auth
 def get_task_stats(user):
@@ -1,12 +1,46 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, session, stream_with_context
 from src.models.user import User, db
+from src import export
+from src.auth import is_admin
 
 user_bp = Blueprint('user', __name__)
 
+def require_auth(f):
+    """認證裝飾器"""
+    def decorated_function(*args, **kwargs):
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        user = User.query.get(user_id)
+        if not user or not user.is_active:
+            session.pop('user_id', None)
+            return jsonify({'error': 'User not found or inactive'}), 401
+        
+        return f(user, *args, **kwargs)
+    
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    # 按批讀取並逐批輸出，響應格式與一次性返回的列表相同
+    return Response(
+        stream_with_context(export.encode_json_array(export.user_batches())),
+        mimetype='application/json'
+    )
+
+@user_bp.route('/users/export', methods=['GET'])
+@require_auth
+def export_users(user):
+    """導出所有用戶（含郵箱），僅限 LYNUS_ADMIN_USERS 中的管理員"""
+    if not is_admin(user):
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    output_format = request.args.get('format', 'ndjson')
+    if output_format not in export.FORMATS:
+        return jsonify({'error': f"Unsupported format, use one of: {', '.join(export.FORMATS)}"}), 400
+    return export.stream_response(export.user_batches(), output_format, export.USER_FIELDS, 'users')
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -0,0 +1,234 @@
+"""
+任務全文搜索
+
+索引覆蓋 Task.title、Task.description 和 TaskStep.content，由數據庫自身增量維護，
+ORM 寫入、批量 SQL 和級聯刪除都會同步：
+- SQLite：FTS5 外部內容表 task_fts / task_step_fts，由觸發器在插入、更新（僅
+  相關列）和刪除時同步。使用 trigram 分詞器，支持中文等不以空格分詞的文本的
+  子串匹配；少於3個字符的詞退回到索引表上的 LIKE 匹配。
+- PostgreSQL：task / task_step 上的 tsvector 生成列（LYNUS_SEARCH_PG_CONFIG，
+  默認 simple）和 GIN 索引，標題權重高於描述。
+
+大步驟內容在 task_step.content 中只保留預覽（見 blob_store），歸檔後的步驟不再
+參與搜索；結果按相關度排序，步驟中的命中權重低於標題和描述。
+"""
+
+import os
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+PG_CONFIG = os.getenv('LYNUS_SEARCH_PG_CONFIG', 'simple')
+# 步驟中命中的相關度係數
+STEP_WEIGHT = 0.5
+MAX_TERMS = 10
+SNIPPET_CHARS = 120
+# trigram 分詞器的最短可索引長度
+TRIGRAM_MIN = 3
+
+SQLITE_TOKENIZER = 'trigram' if sqlite3.sqlite_version_info >= (3, 34) else 'unicode61'
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+    f"title, description, content='task', content_rowid='id', tokenize='{SQLITE_TOKENIZER}')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS task_step_fts USING fts5("
+    f"content, content='task_step', content_rowid='id', tokenize='{SQLITE_TOKENIZER}')",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    # 只在標題或描述變化時更新索引，狀態和進度的頻繁更新不觸發
+    """CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_step_fts_ai AFTER INSERT ON task_step BEGIN
+        INSERT INTO task_step_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_step_fts_ad AFTER DELETE ON task_step BEGIN
+        INSERT INTO task_step_fts(task_step_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_step_fts_au AFTER UPDATE OF content ON task_step BEGIN
+        INSERT INTO task_step_fts(task_step_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO task_step_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+SQLITE_TABLES = ('task_fts', 'task_step_fts')
+
+
+def _pg_ddl() -> List[str]:
+    return [
+        f"""ALTER TABLE task ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('{PG_CONFIG}', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('{PG_CONFIG}', coalesce(description, '')), 'B')
+        ) STORED""",
+        "CREATE INDEX IF NOT EXISTS ix_task_search_vector ON task USING GIN (search_vector)",
+        f"""ALTER TABLE task_step ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            to_tsvector('{PG_CONFIG}', coalesce(content, ''))
+        ) STORED""",
+        "CREATE INDEX IF NOT EXISTS ix_task_step_search_vector ON task_step USING GIN (search_vector)",
+    ]
+
+
+class SearchUnavailableError(RuntimeError):
+    """數據庫不支持全文搜索或索引尚未創建"""
+
+
+def install(conn: Connection) -> None:
+    """創建索引和同步觸發器並回填現有數據（可重複執行）"""
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DDL:
+            conn.execute(text(statement))
+        # 外部內容表按內容表重建，修正建表前已有的數據
+        for table in SQLITE_TABLES:
+            conn.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+    elif dialect == 'postgresql':
+        for statement in _pg_ddl():
+            conn.execute(text(statement))
+    else:
+        raise SearchUnavailableError(f"Full-text search is not supported on {dialect}")
+
+
+def drop(conn: Connection) -> None:
+    """刪除搜索表（配合 drop_all 重建數據庫；觸發器和生成列隨表刪除）"""
+    if conn.dialect.name == 'sqlite':
+        for table in SQLITE_TABLES:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+
+def parse_terms(query: str) -> List[str]:
+    """把用戶輸入拆成搜索詞（去掉引號和重複，最多 MAX_TERMS 個）"""
+    terms = []
+    for term in re.split(r'\s+', query.replace('"', ' ').strip()):
+        if term and term.lower() not in (t.lower() for t in terms):
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def escape_like(term: str) -> str:
+    """LIKE 模式（反斜杠轉義），匹配包含 term 的文本"""
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _sqlite_hits(terms: List[str], params: Dict[str, Any]) -> Tuple[str, str]:
+    """返回（任務命中子查詢, 步驟命中子查詢）"""
+    long_terms = [t for t in terms if len(t) >= TRIGRAM_MIN or SQLITE_TOKENIZER != 'trigram']
+    short_terms = [t for t in terms if t not in long_terms]
+
+    task_where = []
+    step_where = []
+    if long_terms:
+        params['match'] = ' AND '.join('"' + t.replace('"', '""') + '"' for t in long_terms)
+        task_where.append("task_fts MATCH :match")
+        step_where.append("task_step_fts MATCH :match")
+    for i, term in enumerate(short_terms):
+        params[f'like{i}'] = escape_like(term)
+        task_where.append(f"(task_fts.title LIKE :like{i} ESCAPE '\\' OR task_fts.description LIKE :like{i} ESCAPE '\\')")
+        step_where.append(f"task_step_fts.content LIKE :like{i} ESCAPE '\\'")
+
+    # bm25 越小越相關，取負數使各方言都是越大越相關；沒有 MATCH 時不能計算 bm25
+    task_score = "-bm25(task_fts, 10.0, 1.0)" if long_terms else "1.0"
+    step_score = f"-bm25(task_step_fts) * {STEP_WEIGHT}" if long_terms else f"{STEP_WEIGHT}"
+    task_hits = (
+        f"SELECT task_fts.rowid AS task_id, {task_score} AS score, 1 AS in_task, 0 AS in_step "
+        f"FROM task_fts WHERE {' AND '.join(task_where)}"
+    )
+    step_hits = (
+        f"SELECT task_step.task_id AS task_id, {step_score} AS score, 0 AS in_task, 1 AS in_step "
+        f"FROM task_step_fts JOIN task_step ON task_step.id = task_step_fts.rowid "
+        f"WHERE {' AND '.join(step_where)}"
+    )
+    return task_hits, step_hits
+
+
+def _pg_hits(query: str, params: Dict[str, Any]) -> Tuple[str, str]:
+    params['query'] = query
+    tsquery = f"websearch_to_tsquery('{PG_CONFIG}', :query)"
+    task_hits = (
+        f"SELECT task.id AS task_id, ts_rank(task.search_vector, {tsquery}) AS score, 1 AS in_task, 0 AS in_step "
+        f"FROM task WHERE task.search_vector @@ {tsquery}"
+    )
+    step_hits = (
+        f"SELECT task_step.task_id AS task_id, ts_rank(task_step.search_vector, {tsquery}) * {STEP_WEIGHT} AS score, "
+        f"0 AS in_task, 1 AS in_step FROM task_step WHERE task_step.search_vector @@ {tsquery}"
+    )
+    return task_hits, step_hits
+
+
+def search(conn: Connection, user_id: int, query: str, page: int = 1, per_page: int = 20,
+           status: Optional[str] = None, task_type: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    搜索用戶的任務，返回（當前頁的命中列表, 命中任務總數）。
+    命中項包含 task_id、score 和 matched_in（title_or_description / steps）。
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return [], 0
+
+    params: Dict[str, Any] = {'user_id': user_id, 'limit': per_page, 'offset': (page - 1) * per_page}
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        task_hits, step_hits = _sqlite_hits(terms, params)
+    elif dialect == 'postgresql':
+        task_hits, step_hits = _pg_hits(query, params)
+    else:
+        raise SearchUnavailableError(f"Full-text search is not supported on {dialect}")
+
+    filters = ["task.user_id = :user_id"]
+    if status:
+        filters.append("task.status = :status")
+        params['status'] = status
+    if task_type:
+        filters.append("task.task_type = :task_type")
+        params['task_type'] = task_type
+
+    grouped = (
+        f"WITH hits AS ({task_hits} UNION ALL {step_hits}) "
+        f"SELECT hits.task_id AS task_id, MAX(hits.score) AS score, "
+        f"MAX(hits.in_task) AS in_task, MAX(hits.in_step) AS in_step "
+        f"FROM hits JOIN task ON task.id = hits.task_id "
+        f"WHERE {' AND '.join(filters)} GROUP BY hits.task_id"
+    )
+    try:
+        rows = conn.execute(text(
+            f"SELECT task_id, score, in_task, in_step, COUNT(*) OVER () AS total FROM ({grouped}) AS matched "
+            f"ORDER BY score DESC, task_id DESC LIMIT :limit OFFSET :offset"
+        ), params).mappings().all()
+        if rows:
+            total = rows[0]['total']
+        else:
+            # 超出最後一頁時單獨計數
+            total = conn.execute(text(f"SELECT COUNT(*) FROM ({grouped}) AS matched"), params).scalar() if page > 1 else 0
+    except Exception as e:
+        if 'no such table' in str(e) or 'search_vector' in str(e):
+            raise SearchUnavailableError("Search index is missing, run `python migrate.py`")
+        raise
+
+    hits = []
+    for row in rows:
+        matched_in = []
+        if row['in_task']:
+            matched_in.append('title_or_description')
+        if row['in_step']:
+            matched_in.append('steps')
+        hits.append({'task_id': row['task_id'], 'score': round(float(row['score']), 6), 'matched_in': matched_in})
+    return hits, total
+
+
+def snippet(content: str, terms: List[str], length: int = SNIPPET_CHARS) -> str:
+    """截取第一個命中詞附近的文本"""
+    if not content:
+        return ''
+    lowered = content.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    positions = [p for p in positions if p >= 0]
+    start = max(min(positions) - length // 4, 0) if positions else 0
+    excerpt = ' '.join(content[start:start + length].split())
+    return ('…' if start > 0 else '') + excerpt + ('…' if start + length < len(content) else '')
@@ -0,0 +1,628 @@
+"""
+流式電子表格處理
+
+上傳的 CSV/XLSX 文件（產物存儲中的哈希）按 LYNUS_SHEET_CHUNK_ROWS（默認100000）行
+分塊讀取，每塊只把用到的列轉成 NumPy 數組，用向量化運算完成過濾和分組聚合，
+內存佔用與文件大小無關：過濾結果邊計算邊寫入產物存儲，聚合只保留每個分組的
+累加器（分組數上限 LYNUS_SHEET_MAX_GROUPS，默認1000000）。
+
+支持的操作（spec）：
+    {"operation": "summary"}
+    {"operation": "filter", "filters": [{"column": "amount", "op": ">", "value": 100}], "columns": ["id", "amount"]}
+    {"operation": "aggregate", "aggregations": {"amount": ["sum", "mean"]}}
+    {"operation": "group_by", "group_by": ["region"], "aggregations": {"amount": ["sum", "count"]}}
+    {"operation": "pivot", "index": "region", "columns": "month", "values": "amount", "agg": "sum"}
+
+XLSX 讀寫需要安裝 openpyxl（只讀/只寫模式，同樣是流式的）。
+"""
+
+import io
+import os
+import csv
+import time
+import itertools
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from src import artifact_store
+
+CHUNK_ROWS = int(os.getenv('LYNUS_SHEET_CHUNK_ROWS', 100000))
+MAX_GROUPS = int(os.getenv('LYNUS_SHEET_MAX_GROUPS', 1000000))
+PREVIEW_ROWS = 20
+
+OPERATIONS = ('summary', 'filter', 'aggregate', 'group_by', 'pivot')
+AGGREGATIONS = ('count', 'sum', 'mean', 'min', 'max')
+FILTER_OPS = ('==', '!=', '>', '>=', '<', '<=', 'contains', 'in')
+
+# 分組鍵多列拼接時的分隔符
+KEY_SEPARATOR = '\x1f'
+
+
+class SpreadsheetError(ValueError):
+    """文件或操作參數無效"""
+
+
+# ---------- 讀取 ----------
+
+def _detect_format(path: str, mimetype: str, filename: Optional[str]) -> str:
+    name = (filename or '').lower()
+    if name.endswith('.xlsx') or 'spreadsheetml' in (mimetype or ''):
+        return 'xlsx'
+    with open(path, 'rb') as f:
+        # XLSX 是 zip 文件
+        if f.read(4) == b'PK\x03\x04':
+            return 'xlsx'
+    return 'csv'
+
+
+def _csv_rows(path: str) -> Tuple[List[str], Any, Callable[[], None]]:
+    """返回表頭和定位在第一條數據記錄的文件對象"""
+    f = open(path, newline='', encoding='utf-8-sig')
+    try:
+        header = next(csv.reader(f))
+    except StopIteration:
+        f.close()
+        raise SpreadsheetError('File is empty')
+    return header, f, f.close
+
+
+def _merge_quoted(block: List[str], f) -> List[str]:
+    """合併引號內含換行的記錄（必要時從文件中繼續讀取），使每個元素是一條完整記錄"""
+    records = []
+    pending = None
+    lines = iter(block)
+    while True:
+        line = next(lines, None)
+        if line is None:
+            if pending is None:
+                break
+            # 塊末尾的記錄不完整，從文件中繼續讀取
+            line = f.readline()
+            if not line:
+                records.append(pending)
+                break
+        if pending is not None:
+            pending += line
+            if pending.count('"') % 2 == 0:
+                records.append(pending)
+                pending = None
+        elif line.count('"') % 2:
+            pending = line
+        else:
+            records.append(line)
+    return records
+
+
+def _csv_chunks(header: List[str], f, chunk_rows: int) -> Iterator['Chunk']:
+    """按塊讀取原始記錄，解析交給 Chunk 按列進行"""
+    while True:
+        block = list(itertools.islice(f, chunk_rows))
+        if not block:
+            return
+        block = [line for line in block if line.strip()]
+        multiline = False
+        if any('"' in line for line in block):
+            merged = _merge_quoted(block, f)
+            multiline = len(merged) != len(block)
+            block = merged
+        if block:
+            yield Chunk(header, lines=block, fast=not multiline)
+
+
+def _xlsx_rows(path: str, sheet: Optional[str] = None) -> Tuple[List[str], Iterator[List[Any]], Callable[[], None]]:
+    try:
+        import openpyxl
+    except ImportError:
+        raise SpreadsheetError('XLSX support requires openpyxl')
+
+    # 產物文件沒有擴展名，openpyxl 只按擴展名識別路徑，因此傳入文件對象
+    f = open(path, 'rb')
+    workbook = openpyxl.load_workbook(f, read_only=True, data_only=True)
+
+    def close():
+        workbook.close()
+        f.close()
+
+    if sheet and sheet not in workbook.sheetnames:
+        close()
+        raise SpreadsheetError(f"Sheet not found: {sheet}")
+    rows = (workbook[sheet] if sheet else workbook.active).iter_rows(values_only=True)
+    try:
+        header = ['' if v is None else str(v) for v in next(rows)]
+    except StopIteration:
+        close()
+        raise SpreadsheetError('Sheet is empty')
+
+    def values():
+        for row in rows:
+            yield ['' if v is None else v for v in row]
+
+    return header, values(), close
+
+
+def _normalize(row: List[Any], width: int) -> List[Any]:
+    # 補齊或截斷不規則的行
+    if len(row) == width:
+        return row
+    return (list(row) + [''] * width)[:width]
+
+
+def _row_chunks(header: List[str], rows: Iterator[List[Any]], chunk_rows: int) -> Iterator['Chunk']:
+    width = len(header)
+    while True:
+        block = [_normalize(row, width) for row in itertools.islice(rows, chunk_rows)]
+        if not block:
+            return
+        yield Chunk(header, rows=block)
+
+
+def to_numeric(values: np.ndarray) -> np.ndarray:
+    """轉換為 float64，無法轉換的值為 NaN"""
+    if values.dtype.kind in 'fiu':
+        return values.astype(np.float64)
+    strings = values.astype(str)
+    try:
+        return np.where(strings == '', 'nan', strings).astype(np.float64)
+    except ValueError:
+        # 含有非數字的值時只逐個轉換不同的值
+        unique, inverse = np.unique(strings, return_inverse=True)
+        converted = np.empty(len(unique), dtype=np.float64)
+        for i, value in enumerate(unique.tolist()):
+            try:
+                converted[i] = float(value) if value != '' else np.nan
+            except ValueError:
+                converted[i] = np.nan
+        return converted[inverse]
+
+
+class Chunk:
+    """
+    一塊行數據，按需把列轉換為 NumPy 數組並緩存。
+    CSV 塊保存原始記錄，用 np.loadtxt（C 實現）只解析用到的列；
+    記錄跨行或列數不規則時退回 csv 模塊逐行解析。
+    """
+
+    def __init__(self, header: List[str], rows: Optional[List[List[Any]]] = None,
+                 lines: Optional[List[str]] = None, fast: bool = True):
+        self.header = header
+        self.rows = rows
+        self.lines = lines
+        self._fast = lines is not None and fast
+        self._index = {name: i for i, name in enumerate(header)}
+        self._columns = None
+        self._text: Dict[str, np.ndarray] = {}
+        self._numeric: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.lines) if self.lines is not None else len(self.rows)
+
+    def _parse_rows(self) -> None:
+        if self.rows is None:
+            width = len(self.header)
+            self.rows = [_normalize(row, width) for row in csv.reader(self.lines)]
+        if self._columns is None:
+            self._columns = list(zip(*self.rows)) or [()] * len(self.header)
+
+    def _loadtxt(self, column: str, dtype) -> np.ndarray:
+        return np.loadtxt(self.lines, delimiter=',', quotechar='"', comments=None,
+                          dtype=dtype, usecols=(self._index[column],), ndmin=1, encoding=None)
+
+    def text(self, column: str) -> np.ndarray:
+        if column not in self._text:
+            if self._fast:
+                try:
+                    self._text[column] = self._loadtxt(column, str)
+                    return self._text[column]
+                except ValueError:
+                    self._fast = False
+            self._parse_rows()
+            self._text[column] = np.array(self._columns[self._index[column]], dtype=str)
+        return self._text[column]
+
+    def numeric(self, column: str) -> np.ndarray:
+        if column not in self._numeric:
+            values = None
+            if self._fast:
+                try:
+                    values = self._loadtxt(column, np.float64)
+                except ValueError:
+                    # 含空值或非數字時按文本解析後轉換
+                    pass
+            if values is None:
+                if self.lines is not None:
+                    values = to_numeric(self.text(column))
+                else:
+                    self._parse_rows()
+                    values = to_numeric(np.array(self._columns[self._index[column]], dtype=object))
+            self._numeric[column] = values
+        return self._numeric[column]
+
+    def select(self, indices: np.ndarray, columns: List[str]) -> Union[str, List[List[Any]]]:
+        """返回選中的行；選中整行且有原始記錄時直接返回 CSV 文本，避免重新編碼"""
+        indices = indices.tolist()
+        if self.lines is not None and columns == self.header:
+            selected = [self.lines[i] for i in indices]
+            if selected and not selected[-1].endswith('\n'):
+                selected[-1] += '\n'
+            return ''.join(selected)
+        if self.rows is None and self._fast:
+            if not indices:
+                return []
+            return np.column_stack([self.text(c)[indices] for c in columns]).tolist()
+        self._parse_rows()
+        positions = [self._index[c] for c in columns]
+        return [[self.rows[i][p] for p in positions] for i in indices]
+
+
+# ---------- 運算 ----------
+
+def _filter_mask(chunk: Chunk, filters: List[Dict[str, Any]]) -> np.ndarray:
+    mask = np.ones(len(chunk), dtype=bool)
+    for condition in filters:
+        column, op, value = condition['column'], condition['op'], condition.get('value')
+        if op == 'contains':
+            mask &= np.char.find(chunk.text(column), str(value)) >= 0
+        elif op == 'in':
+            mask &= np.isin(chunk.text(column), [str(v) for v in (value or [])])
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values = chunk.numeric(column)
+            mask &= {
+                '==': values == value, '!=': values != value,
+                '>': values > value, '>=': values >= value,
+                '<': values < value, '<=': values <= value,
+            }[op]
+        else:
+            values = chunk.text(column)
+            value = '' if value is None else str(value)
+            mask &= {
+                '==': values == value, '!=': values != value,
+                '>': values > value, '>=': values >= value,
+                '<': values < value, '<=': values <= value,
+            }[op]
+    return mask
+
+
+class GroupAccumulator:
+    """按分組鍵累加 count/sum/min/max，每塊用 bincount 和 ufunc.at 向量化更新"""
+
+    def __init__(self, value_columns: List[str], max_groups: int = MAX_GROUPS):
+        self.value_columns = value_columns
+        self.max_groups = max_groups
+        self.keys: Dict[str, int] = {}
+        self._capacity = 0
+        self._rows = np.zeros(0, dtype=np.int64)
+        self.count = {c: np.zeros(0, dtype=np.int64) for c in value_columns}
+        self.sum = {c: np.zeros(0) for c in value_columns}
+        self.min = {c: np.zeros(0) for c in value_columns}
+        self.max = {c: np.zeros(0) for c in value_columns}
+
+    def _grow(self, size: int) -> None:
+        """容量按倍數增長，避免每塊都複製累加器"""
+        if size <= self._capacity:
+            return
+        capacity = max(size, self._capacity * 2, 16)
+        extra = capacity - self._capacity
+        self._rows = np.concatenate([self._rows, np.zeros(extra, dtype=np.int64)])
+        for c in self.value_columns:
+            self.count[c] = np.concatenate([self.count[c], np.zeros(extra, dtype=np.int64)])
+            self.sum[c] = np.concatenate([self.sum[c], np.zeros(extra)])
+            self.min[c] = np.concatenate([self.min[c], np.full(extra, np.inf)])
+            self.max[c] = np.concatenate([self.max[c], np.full(extra, -np.inf)])
+        self._capacity = capacity
+
+    def add(self, keys: np.ndarray, values: Dict[str, np.ndarray]) -> None:
+        unique, inverse = np.unique(keys, return_inverse=True)
+        # 只在本塊的唯一鍵上做 Python 循環
+        ids = np.fromiter((self.keys.setdefault(k, len(self.keys)) for k in unique.tolist()),
+                          dtype=np.int64, count=len(unique))
+        if len(self.keys) > self.max_groups:
+            raise SpreadsheetError(f"Too many groups (limit {self.max_groups})")
+        self._grow(len(self.keys))
+
+        groups = ids[inverse]
+        size = len(self.keys)
+        self._rows[:size] += np.bincount(groups, minlength=size)
+        for c in self.value_columns:
+            column = values[c]
+            valid = ~np.isnan(column)
+            g, v = groups[valid], column[valid]
+            self.count[c][:size] += np.bincount(g, minlength=size)
+            self.sum[c][:size] += np.bincount(g, weights=v, minlength=size)
+            np.minimum.at(self.min[c], g, v)
+            np.maximum.at(self.max[c], g, v)
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self._rows[:len(self.keys)]
+
+    def result(self, column: str, agg: str) -> np.ndarray:
+        size = len(self.keys)
+        count = self.count[column][:size]
+        if agg == 'count':
+            return count.astype(np.float64)
+        if agg == 'sum':
+            return self.sum[column][:size]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if agg == 'mean':
+                return np.where(count > 0, self.sum[column][:size] / count, np.nan)
+            if agg == 'min':
+                return np.where(count > 0, self.min[column][:size], np.nan)
+            return np.where(count > 0, self.max[column][:size], np.nan)
+
+
+def _format(value: Any) -> Any:
+    if isinstance(value, float):
+        if np.isnan(value):
+            return ''
+        if value.is_integer() and abs(value) < 1e15:
+            return int(value)
+        return round(value, 10)
+    return value
+
+
+# ---------- 輸出 ----------
+
+def _block_rows(block: Union[str, List[List[Any]]]) -> Iterator[List[Any]]:
+    """行塊可以是行列表，也可以是原樣複製的 CSV 文本"""
+    if isinstance(block, str):
+        return csv.reader(io.StringIO(block))
+    return iter(block)
+
+
+def _csv_bytes(header: List[str], rows: Iterable[Union[str, List[List[Any]]]]) -> Iterator[bytes]:
+    """把行塊編碼為 CSV 字節流"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for block in rows:
+        if isinstance(block, str):
+            buffer.write(block)
+        else:
+            writer.writerows(block)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _write_output(header: List[str], rows: Iterable[Union[str, List[List[Any]]]], output_format: str) -> Dict[str, Any]:
+    if output_format == 'xlsx':
+        try:
+            import openpyxl
+        except ImportError:
+            raise SpreadsheetError('XLSX output requires openpyxl')
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(header)
+        for block in rows:
+            for row in _block_rows(block):
+                sheet.append(row)
+        with tempfile.TemporaryFile() as f:
+            workbook.save(f)
+            f.seek(0)
+            return artifact_store.put_stream(f, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+    return artifact_store.put_stream(_csv_bytes(header, rows), 'text/csv')
+
+
+# ---------- 入口 ----------
+
+def _validate(spec: Dict[str, Any], header: List[str]) -> None:
+    operation = spec.get('operation', 'summary')
+    if operation not in OPERATIONS:
+        raise SpreadsheetError(f"Unsupported operation: {operation}")
+
+    def require(columns):
+        for column in columns:
+            if column not in header:
+                raise SpreadsheetError(f"Unknown column: {column}")
+
+    for condition in spec.get('filters') or []:
+        if not isinstance(condition, dict) or condition.get('op') not in FILTER_OPS:
+            raise SpreadsheetError(f"Invalid filter: {condition}")
+        require([condition.get('column')])
+    if operation != 'pivot':
+        require(spec.get('columns') or [])
+    require(spec.get('group_by') or [])
+    for column, aggs in (spec.get('aggregations') or {}).items():
+        require([column])
+        for agg in (aggs if isinstance(aggs, list) else [aggs]):
+            if agg not in AGGREGATIONS:
+                raise SpreadsheetError(f"Unsupported aggregation: {agg}")
+    if operation == 'pivot':
+        require([spec.get('index'), spec.get('columns'), spec.get('values')])
+        if spec.get('agg', 'sum') not in AGGREGATIONS:
+            raise SpreadsheetError(f"Unsupported aggregation: {spec.get('agg')}")
+    if operation == 'group_by' and not spec.get('group_by'):
+        raise SpreadsheetError('group_by requires at least one column')
+
+
+def _open(digest: str, spec: Dict[str, Any], chunk_rows: int) -> Tuple[List[str], Iterator[Chunk], Callable[[], None]]:
+    """打開產物存儲中的文件，返回表頭、塊迭代器和關閉函數"""
+    found = artifact_store.get(digest)
+    if not found:
+        raise SpreadsheetError(f"File not found: {digest}")
+    path, meta = found
+
+    input_format = _detect_format(path, meta.get('mimetype'), spec.get('filename'))
+    if input_format == 'xlsx':
+        header, rows, close = _xlsx_rows(path, spec.get('sheet'))
+        return header, _row_chunks(header, rows, chunk_rows), close
+    header, f, close = _csv_rows(path)
+    return header, _csv_chunks(header, f, chunk_rows), close
+
+
+def read_columns(digest: str, numeric: List[str], text: Optional[List[str]] = None,
+                 spec: Optional[Dict[str, Any]] = None, on_chunk: Optional[Callable[[int], None]] = None,
+                 chunk_rows: int = CHUNK_ROWS) -> Dict[str, np.ndarray]:
+    """
+    分塊讀取指定的列並拼接為完整數組（numeric 中的列為 float64，text 中的列為字符串）。
+    只保留用到的列，供需要整列數據的調用方（如圖表降採樣）使用。
+    """
+    text = text or []
+    header, chunks, close = _open(digest, spec or {}, chunk_rows)
+    try:
+        missing = [c for c in numeric + text if c not in header]
+        if missing:
+            raise SpreadsheetError(f"Unknown columns: {', '.join(missing)}")
+        parts: Dict[str, List[np.ndarray]] = {c: [] for c in numeric + text}
+        rows_read = 0
+        for chunk in chunks:
+            if on_chunk:
+                on_chunk(rows_read)
+            rows_read += len(chunk)
+            for column in numeric:
+                parts[column].append(chunk.numeric(column))
+            for column in text:
+                parts[column].append(chunk.text(column))
+    finally:
+        close()
+
+    return {
+        column: np.concatenate(arrays) if arrays else np.empty(0, dtype=np.float64 if column in numeric else str)
+        for column, arrays in parts.items()
+    }
+
+
+def process(digest: str, spec: Dict[str, Any], on_chunk: Optional[Callable[[int], None]] = None,
+            chunk_rows: int = CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    處理產物存儲中的 CSV/XLSX 文件，結果寫回產物存儲。
+    on_chunk 在每塊處理前以已讀行數調用（可拋出異常中止，如任務取消）。
+    """
+    start = time.perf_counter()
+    header, raw_chunks, close = _open(digest, spec, chunk_rows)
+
+    try:
+        _validate(spec, header)
+        operation = spec.get('operation', 'summary')
+        stats = {'rows_read': 0, 'chunks': 0}
+
+        def chunks():
+            for chunk in raw_chunks:
+                if on_chunk:
+                    on_chunk(stats['rows_read'])
+                stats['rows_read'] += len(chunk)
+                stats['chunks'] += 1
+                yield chunk
+
+        if operation == 'filter':
+            out_header, out_rows = _run_filter(spec, header, chunks(), stats)
+            output_format = spec.get('output_format', 'csv')
+            preview = []
+
+            def blocks():
+                for block in out_rows:
+                    if len(preview) < PREVIEW_ROWS:
+                        rows = _block_rows(block[:PREVIEW_ROWS * 1024] if isinstance(block, str) else block)
+                        preview.extend(itertools.islice(rows, PREVIEW_ROWS - len(preview)))
+                    yield block
+
+            artifact = _write_output(out_header, blocks(), output_format)
+        else:
+            out_header, table = _run_aggregation(operation, spec, header, chunks())
+            output_format = spec.get('output_format', 'csv')
+            preview = table[:PREVIEW_ROWS]
+            stats['rows_written'] = len(table)
+            artifact = _write_output(out_header, [table], output_format)
+    finally:
+        close()
+
+    extension = 'xlsx' if output_format == 'xlsx' else 'csv'
+    return {
+        'operation': operation,
+        'columns': out_header,
+        'preview': preview,
+        'rows_read': stats['rows_read'],
+        'rows_written': stats.get('rows_written', 0),
+        'chunks': stats['chunks'],
+        'elapsed_seconds': round(time.perf_counter() - start, 3),
+        **artifact_store.make_ref(artifact, f"{operation}.{extension}"),
+    }
+
+
+def _run_filter(spec, header, chunks, stats):
+    filters = spec.get('filters') or []
+    columns = spec.get('columns') or header
+    stats['rows_written'] = 0
+
+    def out_rows():
+        for chunk in chunks:
+            selected = np.flatnonzero(_filter_mask(chunk, filters))
+            stats['rows_written'] += len(selected)
+            yield chunk.select(selected, columns)
+
+    return columns, out_rows()
+
+
+def _run_aggregation(operation, spec, header, chunks):
+    filters = spec.get('filters') or []
+
+    if operation == 'pivot':
+        index_col, columns_col, value_col = spec['index'], spec['columns'], spec['values']
+        group_cols, aggregations = [index_col, columns_col], {value_col: [spec.get('agg', 'sum')]}
+    elif operation == 'summary':
+        group_cols, aggregations = [], {c: list(AGGREGATIONS) for c in header}
+    else:
+        group_cols = (spec.get('group_by') or []) if operation == 'group_by' else []
+        aggregations = {
+            c: (aggs if isinstance(aggs, list) else [aggs])
+            for c, aggs in (spec.get('aggregations') or {}).items()
+        }
+
+    accumulator = GroupAccumulator(list(aggregations))
+    for chunk in chunks:
+        mask = _filter_mask(chunk, filters) if filters else None
+        if group_cols:
+            keys = chunk.text(group_cols[0])
+            for column in group_cols[1:]:
+                keys = np.char.add(np.char.add(keys, KEY_SEPARATOR), chunk.text(column))
+        else:
+            keys = np.zeros(len(chunk), dtype=str)
+        values = {c: chunk.numeric(c) for c in aggregations}
+        if mask is not None:
+            keys = keys[mask]
+            values = {c: v[mask] for c, v in values.items()}
+        if len(keys):
+            accumulator.add(keys, values)
+
+    group_keys = list(accumulator.keys)
+    results = {(c, agg): accumulator.result(c, agg) for c, aggs in aggregations.items() for agg in aggs}
+
+    if operation == 'pivot':
+        agg = spec.get('agg', 'sum')
+        values = results[(value_col, agg)]
+        cells: Dict[str, Dict[str, Any]] = {}
+        pivot_columns: List[str] = []
+        for gid, key in enumerate(group_keys):
+            row_key, column_key = key.split(KEY_SEPARATOR, 1)
+            if column_key not in pivot_columns:
+                pivot_columns.append(column_key)
+            cells.setdefault(row_key, {})[column_key] = _format(float(values[gid]))
+        pivot_columns.sort()
+        table = [[row_key] + [row.get(c, '') for c in pivot_columns] for row_key, row in sorted(cells.items())]
+        return [index_col] + pivot_columns, table
+
+    if operation == 'summary':
+        table = []
+        for column in header:
+            table.append([column] + [_format(float(results[(column, agg)][0])) if group_keys else ''
+                                     for agg in AGGREGATIONS])
+        return ['column'] + list(AGGREGATIONS), table
+
+    out_header = group_cols + [f"{c}_{agg}" for c, aggs in aggregations.items() for agg in aggs]
+    if not aggregations:
+        out_header.append('rows')
+    order = sorted(range(len(group_keys)), key=lambda i: group_keys[i])
+    table = []
+    for gid in order:
+        row = group_keys[gid].split(KEY_SEPARATOR) if group_cols else []
+        row += [_format(float(results[(c, agg)][gid])) for c, aggs in aggregations.items() for agg in aggs]
+        if not aggregations:
+            row.append(int(accumulator.rows[gid]))
+        table.append(row)
+    return out_header, table
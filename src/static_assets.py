@@ -0,0 +1,173 @@
+"""
+靜態資源清單
+
+啟動時掃描 src/static 一次，在內存中保存每個文件的內容、強 ETag、
+MIME 類型和預壓縮版本（gzip，安裝 brotli 後還有 br），請求時只查字典：
+- 文件名帶十六進制內容哈希（如 index-3f9a1c2b.js）或列在 Vite 構建清單
+  （.vite/manifest.json 或 manifest.json）中的資源使用一年的 immutable 緩存
+- 其他資源（包括 index.html）使用 no-cache，依靠 ETag 返回 304
+- 磁盤上已有的 .gz / .br 文件直接作為預壓縮版本
+"""
+
+import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+import mimetypes
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+
+from flask import Response, send_file
+
+try:
+    import brotli
+except ImportError:  # 可選依賴
+    brotli = None
+
+# 文件名中的十六進制內容哈希，例如 app.3f9a1c2b.js、index-3f9a1c2b.min.css；
+# 其他格式的哈希（如 Vite 的 index-BX3a9c_d.css）只按構建清單識別
+FINGERPRINT_RE = re.compile(r'[.-][0-9a-f]{8,}(?:\.\w+)+$')
+# 構建工具輸出的清單，記錄帶哈希的文件名
+BUILD_MANIFESTS = ('.vite/manifest.json', 'manifest.json')
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+# 值得壓縮的類型和最小大小
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/xml',
+                      'image/svg+xml', 'application/manifest+json', 'image/x-icon', 'image/vnd.microsoft.icon')
+MIN_COMPRESS_SIZE = 1024
+# 超過此大小的文件不放入內存，請求時從磁盤發送
+MAX_INMEMORY_SIZE = int(os.getenv('LYNUS_STATIC_MAX_INMEMORY', 4 * 1024 * 1024))
+
+# 內容編碼優先順序
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+@dataclass
+class StaticAsset:
+    path: str
+    abspath: str
+    mimetype: str
+    etag: str
+    size: int
+    cache_control: str
+    data: Optional[bytes] = None
+    variants: Dict[str, bytes] = field(default_factory=dict)
+
+
+def _is_compressible(mimetype: str) -> bool:
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def _build_manifest_files(root: str) -> Set[str]:
+    """讀取 Vite 構建清單中的輸出文件（file、css、assets）"""
+    files: Set[str] = set()
+    for name in BUILD_MANIFESTS:
+        try:
+            with open(os.path.join(root, name)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(manifest, dict):
+            continue
+        # 同名的 PWA manifest.json 沒有 {"file": ...} 條目，不會誤判
+        for entry in manifest.values():
+            if not isinstance(entry, dict) or not isinstance(entry.get('file'), str):
+                continue
+            files.add(entry['file'])
+            for key in ('css', 'assets'):
+                files.update(item for item in entry.get(key) or [] if isinstance(item, str))
+    return files
+
+
+def _file_digest(abspath: str) -> str:
+    digest = hashlib.sha256()
+    with open(abspath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StaticManifest:
+    """靜態資源的內存清單"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.assets: Dict[str, StaticAsset] = {}
+        self.hashed: Set[str] = set()
+        self.build()
+
+    def build(self) -> None:
+        assets = {}
+        self.hashed = _build_manifest_files(self.root)
+        if os.path.isdir(self.root):
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                for filename in filenames:
+                    # 預壓縮文件作為原文件的變體加載
+                    if filename.endswith(('.gz', '.br')) and os.path.exists(os.path.join(dirpath, filename[:-3])):
+                        continue
+                    abspath = os.path.join(dirpath, filename)
+                    path = os.path.relpath(abspath, self.root).replace(os.sep, '/')
+                    assets[path] = self._load(path, abspath)
+
+        self.assets = assets
+        logging.info(f"Static manifest built: {len(assets)} files from {self.root}")
+
+    def _load(self, path: str, abspath: str) -> StaticAsset:
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        size = os.path.getsize(abspath)
+        hashed = path in self.hashed or FINGERPRINT_RE.search(path)
+        cache_control = IMMUTABLE_CACHE if hashed else REVALIDATE_CACHE
+
+        if size > MAX_INMEMORY_SIZE:
+            return StaticAsset(path, abspath, mimetype, _file_digest(abspath), size, cache_control)
+
+        with open(abspath, 'rb') as f:
+            data = f.read()
+        asset = StaticAsset(path, abspath, mimetype, hashlib.sha256(data).hexdigest(), size, cache_control, data)
+
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(abspath + suffix):
+                with open(abspath + suffix, 'rb') as f:
+                    asset.variants[encoding] = f.read()
+
+        if _is_compressible(mimetype) and size >= MIN_COMPRESS_SIZE:
+            if 'gzip' not in asset.variants:
+                asset.variants['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+            if brotli and 'br' not in asset.variants:
+                asset.variants['br'] = brotli.compress(data)
+
+        # 壓縮後沒有變小的版本不值得發送
+        asset.variants = {k: v for k, v in asset.variants.items() if len(v) < size}
+        return asset
+
+    def get(self, path: str) -> Optional[StaticAsset]:
+        return self.assets.get(path)
+
+    def respond(self, asset: StaticAsset, request) -> Response:
+        """生成帶緩存頭的響應，支持 304 和預壓縮版本"""
+        encoding = None
+        for candidate, _ in ENCODINGS:
+            if candidate in asset.variants and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+
+        # 不同編碼是不同的表示，強 ETag 必須不同
+        etag = f"{asset.etag[:32]}-{encoding}" if encoding else asset.etag[:32]
+
+        if request.if_none_match.contains(etag) or request.if_none_match.star_tag:
+            response = Response(status=304)
+        elif asset.data is None:
+            response = send_file(asset.abspath, mimetype=asset.mimetype, conditional=True, etag=False)
+        else:
+            response = Response(asset.variants[encoding] if encoding else asset.data, mimetype=asset.mimetype)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = asset.cache_control
+        if asset.variants:
+            response.headers['Vary'] = 'Accept-Encoding'
+        return response
@@ -0,0 +1,93 @@
+"""
+Agent 任務執行隊列
+
+任務提交到固定大小的線程池（LYNUS_AGENT_WORKERS，默認4），而不是每個任務
+開一個線程；批量提交數百個任務時，多出的任務保持 pending 排隊等待。
+每個任務在自己的應用上下文中執行。取消時尚未開始的任務直接出隊，
+執行中的任務由 cancellation 令牌通知 Agent 停止。
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from flask import current_app
+
+from src import cancellation, profiling
+
+MAX_WORKERS = int(os.getenv('LYNUS_AGENT_WORKERS', 4))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+# task_id -> 尚未完成的 Future
+_futures: Dict[int, Future] = {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='lynus-agent')
+        return _executor
+
+
+def _run(app, task_id: int, openrouter_api_key: str):
+    # 延遲導入，冷啟動時不加載 Agent 引擎和 requests
+    from src.agent_engine import LynusAgent
+    from src.models.user import db
+
+    with app.app_context():
+        # 採樣分析時 Agent 線程的調用棧歸到所屬任務下
+        profiling.tag_thread(task_id)
+        try:
+            agent = LynusAgent(openrouter_api_key)
+            result = agent.execute_task(task_id, openrouter_api_key)
+            logging.info(f"Task {task_id} execution result: {result.get('message')}")
+            return result
+        except Exception as e:
+            logging.error(f"Task {task_id} execution failed: {str(e)}")
+        finally:
+            profiling.tag_thread(None)
+            db.session.remove()
+
+
+def enqueue(task_id: int, openrouter_api_key: str) -> Future:
+    """提交任務到執行隊列（需在應用上下文中調用）"""
+    app = current_app._get_current_object()
+    future = _get_executor().submit(_run, app, task_id, openrouter_api_key)
+
+    with _lock:
+        _futures[task_id] = future
+
+    def _done(f, task_id=task_id):
+        with _lock:
+            if _futures.get(task_id) is f:
+                del _futures[task_id]
+
+    future.add_done_callback(_done)
+    return future
+
+
+def local_task_ids() -> List[int]:
+    """本進程中排隊或執行中的任務ID"""
+    with _lock:
+        return list(_futures)
+
+
+def queued_count() -> int:
+    """尚未完成（排隊中或執行中）的任務數"""
+    with _lock:
+        return len(_futures)
+
+
+def cancel(task_id: int) -> bool:
+    """取消任務：排隊中的直接出隊，執行中的通知 Agent 停止；返回是否在本進程中找到該任務"""
+    with _lock:
+        future = _futures.get(task_id)
+
+    if future is not None and future.cancel():
+        cancellation.record(cancellation.MAX_LLM_CALLS_PER_TASK, before_start=True)
+        return True
+    return cancellation.cancel(task_id)
@@ -0,0 +1,254 @@
+"""
+任務進度監聽
+
+客戶端用長輪詢（GET /api/tasks/<id>/wait）或 SSE（GET /api/tasks/<id>/events，
+僅 ASGI 入口）等待任務狀態、進度或步驟變化。任務狀態由
+(status, progress, updated_at, 最後步驟號) 組成，cursor 是它的短哈希，客戶端
+把上次收到的 cursor 作為 since 傳回，有變化時立即返回。
+
+- Flask（同步）：每個等待中的請求佔用一個工作線程，每 LYNUS_WATCH_INTERVAL
+  秒（默認0.5）查詢一次數據庫。
+- ASGI（src/asgi.py）：TaskWatcher 在每個進程中只運行一個輪詢協程，每個間隔用
+  一次查詢讀取所有被監聽任務的狀態，有變化的任務再用一次查詢讀取新步驟，
+  然後喚醒等待的協程；空閒的監聽者只佔用一個協程，不佔用線程。
+"""
+
+import os
+import math
+import time
+import asyncio
+import logging
+import hashlib
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select
+
+from src.models.user import db, User, Task, TaskStep
+
+POLL_INTERVAL = float(os.getenv('LYNUS_WATCH_INTERVAL', 0.5))
+# 長輪詢的最長等待時間
+MAX_WAIT = float(os.getenv('LYNUS_WATCH_MAX_WAIT', 30))
+# SSE 保活註釋的間隔
+HEARTBEAT = float(os.getenv('LYNUS_WATCH_HEARTBEAT', 15))
+TERMINAL_STATUSES = {'completed', 'failed', 'cancelled'}
+# 每個任務保留的最近事件數，落後更多的監聽者直接收到最新狀態
+HISTORY = 50
+
+_stats_lock = threading.Lock()
+_stats = {'polls': 0, 'events': 0, 'watchers': 0, 'peak_watchers': 0, 'watched_tasks': 0}
+
+
+def _count(key: str, value: int = 1) -> None:
+    with _stats_lock:
+        _stats[key] += value
+        if key == 'watchers':
+            _stats['peak_watchers'] = max(_stats['peak_watchers'], _stats['watchers'])
+
+
+def get_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def is_final(state: Dict[str, Any]) -> bool:
+    """任務已結束或已刪除，之後不會再有變化"""
+    return state['status'] in TERMINAL_STATUSES or state.get('deleted', False)
+
+
+def make_cursor(state: Dict[str, Any]) -> str:
+    raw = f"{state['status']}|{state['progress']}|{state['updated_at']}|{state['last_step']}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def read_states(task_ids: Iterable[int]) -> Dict[int, Tuple[int, Dict[str, Any]]]:
+    """讀取任務狀態，返回 {task_id: (user_id, state)}；使用獨立連接，每次都讀到最新數據"""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return {}
+    last_step = select(func.max(TaskStep.step_number)) \
+        .where(TaskStep.task_id == Task.id).correlate(Task).scalar_subquery()
+    statement = select(Task.id, Task.user_id, Task.status, Task.progress, Task.updated_at,
+                       last_step.label('last_step')).where(Task.id.in_(task_ids))
+
+    states = {}
+    with db.engine.connect() as conn:
+        for row in conn.execute(statement):
+            state = {
+                'task_id': row.id,
+                'status': row.status,
+                'progress': row.progress,
+                'updated_at': row.updated_at.isoformat() if row.updated_at else None,
+                'last_step': row.last_step or 0,
+            }
+            state['cursor'] = make_cursor(state)
+            states[row.id] = (row.user_id, state)
+    return states
+
+
+def read_steps(after: Dict[int, int]) -> Dict[int, List[Dict[str, Any]]]:
+    """讀取各任務中步驟號大於給定值的新步驟（大內容只返回預覽）"""
+    steps: Dict[int, List[Dict[str, Any]]] = {}
+    if not after:
+        return steps
+    condition = or_(*(and_(TaskStep.task_id == task_id, TaskStep.step_number > number)
+                      for task_id, number in after.items()))
+    for step in TaskStep.query.filter(condition).order_by(TaskStep.task_id, TaskStep.step_number):
+        steps.setdefault(step.task_id, []).append(step.to_dict(full=False))
+    db.session.remove()
+    return steps
+
+
+def authorize(task_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+    """任務屬於該（有效）用戶時返回當前狀態，否則返回 None"""
+    states = read_states([task_id])
+    if task_id not in states or states[task_id][0] != user_id:
+        return None
+    user = db.session.get(User, user_id)
+    active = user is not None and user.is_active
+    db.session.remove()
+    return states[task_id][1] if active else None
+
+
+def clamp_timeout(timeout: float) -> float:
+    """把客戶端給出的等待時間限制在 [0, MAX_WAIT]；NaN 和無窮大拋出 ValueError"""
+    if not math.isfinite(timeout):
+        raise ValueError('timeout must be a finite number')
+    return min(max(timeout, 0.0), MAX_WAIT)
+
+
+def wait(task_id: int, since: Optional[str], timeout: float) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """同步長輪詢：返回（當前狀態, 是否與 since 不同）；等待期間任務被刪除時狀態為 None"""
+    deadline = time.monotonic() + clamp_timeout(timeout)
+    _count('watchers')
+    try:
+        while True:
+            states = read_states([task_id])
+            if task_id not in states:
+                return None, True
+            state = states[task_id][1]
+            if state['cursor'] != since:
+                return state, True
+            if is_final(state) or time.monotonic() >= deadline:
+                return state, False
+            time.sleep(min(POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+    finally:
+        _count('watchers', -1)
+
+
+class Channel:
+    """單個任務的最新狀態和最近事件，publish 時喚醒所有等待者"""
+
+    def __init__(self, task_id: int, user_id: int, state: Dict[str, Any]):
+        self.task_id = task_id
+        self.user_id = user_id
+        self.state = state
+        self.version = 0
+        self.subscribers = 0
+        self.history: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=HISTORY)
+        self._event = asyncio.Event()
+
+    def publish(self, state: Dict[str, Any], steps: List[Dict[str, Any]]) -> None:
+        self.state = state
+        self.version += 1
+        self.history.append((self.version, dict(state, steps=steps)))
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    def since(self, version: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """版本號之後的事件；落後超過保留數量時只返回最新狀態"""
+        if self.version <= version:
+            return []
+        if not self.history or self.history[0][0] > version + 1:
+            return [(self.version, dict(self.state, steps=[]))]
+        return [(v, payload) for v, payload in self.history if v > version]
+
+    async def changed(self, timeout: float) -> bool:
+        """等待下一次 publish，超時返回 False"""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class TaskWatcher:
+    """每個進程一個：一個協程批量輪詢所有被監聽的任務"""
+
+    def __init__(self, run_sync: Callable, interval: float = POLL_INTERVAL):
+        # run_sync(fn, *args) 在線程中（應用上下文內）執行同步數據庫查詢
+        self.run_sync = run_sync
+        self.interval = interval
+        self.channels: Dict[int, Channel] = {}
+        self._poller: Optional[asyncio.Task] = None
+
+    async def subscribe(self, task_id: int, user_id: int) -> Optional[Channel]:
+        """開始監聽；任務不存在或不屬於該用戶時返回 None"""
+        channel = self.channels.get(task_id)
+        if channel is not None and channel.user_id != user_id:
+            return None
+        if channel is None:
+            state = await self.run_sync(authorize, task_id, user_id)
+            if state is None:
+                return None
+            # 查詢期間可能已有其他協程建立了頻道
+            channel = self.channels.setdefault(task_id, Channel(task_id, user_id, state))
+
+        channel.subscribers += 1
+        _count('watchers')
+        with _stats_lock:
+            _stats['watched_tasks'] = len(self.channels)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+        return channel
+
+    def unsubscribe(self, channel: Channel) -> None:
+        channel.subscribers -= 1
+        _count('watchers', -1)
+        if channel.subscribers <= 0 and self.channels.get(channel.task_id) is channel:
+            del self.channels[channel.task_id]
+        with _stats_lock:
+            _stats['watched_tasks'] = len(self.channels)
+
+    async def poll_once(self) -> None:
+        channels = dict(self.channels)
+        states = await self.run_sync(read_states, list(channels))
+        _count('polls')
+
+        changed = {}
+        for task_id, channel in channels.items():
+            # 查詢期間監聽者可能都已離開，或已為該任務建立了新頻道
+            if self.channels.get(task_id) is not channel:
+                continue
+            if task_id not in states:
+                # 任務已刪除：通知監聽者結束，之後不再輪詢
+                changed[task_id] = dict(channel.state, deleted=True, cursor='deleted')
+                del self.channels[task_id]
+            elif states[task_id][1]['cursor'] != channel.state['cursor']:
+                changed[task_id] = states[task_id][1]
+        if not changed:
+            return
+
+        after = {
+            task_id: channels[task_id].state['last_step'] for task_id, state in changed.items()
+            if state['last_step'] > channels[task_id].state['last_step']
+        }
+        steps = await self.run_sync(read_steps, after) if after else {}
+        for task_id, state in changed.items():
+            channel = channels[task_id]
+            # 已刪除任務的頻道已被移除，仍需通知；其餘頻道在讀取步驟期間被註銷時跳過
+            if not state.get('deleted') and self.channels.get(task_id) is not channel:
+                continue
+            channel.publish(state, steps.get(task_id, []))
+            _count('events')
+
+    async def _poll(self) -> None:
+        while self.channels:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll_once()
+            except Exception as e:
+                # 數據庫暫時不可用時下一個間隔重試
+                logging.warning(f"Task watcher poll failed: {str(e)}")
+                await asyncio.sleep(self.interval)
@@ -0,0 +1,733 @@
+"""
+網頁抓取與分析
+
+analyze_webpage 行動用共享連接池的 requests.Session 併發抓取頁面，並可按層
+（depth，最多 LYNUS_FETCH_MAX_DEPTH）繼續抓取同源鏈接和樣式表。響應邊下載邊交給
+標準庫的流式 HTMLParser 解析，提取頁面結構（標題、地標元素、標題層級、鏈接、
+圖片、表單）、樣式（顏色、字體、媒體查詢）和文本摘要。
+
+每次抓取限制大小（LYNUS_FETCH_MAX_BYTES，默認5MB，超出部分截斷）和總時間
+（LYNUS_FETCH_TIMEOUT，默認10秒）。響應體存入產物存儲，元數據緩存在
+<LYNUS_ARTIFACT_DIR>/http_cache/ 下：Cache-Control max-age 內直接使用緩存，
+過期後帶 If-None-Match/If-Modified-Since 重新驗證，304 時沿用緩存內容。
+緩存條目的修改時間記錄最近一次使用，超過 LYNUS_FETCH_CACHE_MAX_AGE（默認7天）
+未使用的條目，以及總大小超過 LYNUS_FETCH_CACHE_MAX_BYTES（默認256MB）時最久
+未使用的條目，連同產物存儲中的響應體一起刪除。
+
+默認拒絕解析到內網、回環等地址的主機（LYNUS_FETCH_ALLOW_PRIVATE=1 時允許，
+如用本地 HTTP 服務測試）。地址在建立連接時解析並檢查，然後直接連接檢查過的
+IP（SNI、證書校驗和 Host 頭仍使用原主機名），不會因再次解析被 DNS 重綁定繞過。
+經環境變量配置的代理訪問時由代理解析地址，不做此檢查。
+"""
+
+import os
+import re
+import json
+import time
+import codecs
+import socket
+import hashlib
+import tempfile
+import ipaddress
+import threading
+from collections import Counter
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urldefrag, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import create_connection
+
+from src import artifact_store
+
+MAX_BYTES = int(os.getenv('LYNUS_FETCH_MAX_BYTES', 5 * 1024 * 1024))
+TIMEOUT = float(os.getenv('LYNUS_FETCH_TIMEOUT', 10))
+MAX_PAGES = int(os.getenv('LYNUS_FETCH_MAX_PAGES', 20))
+MAX_DEPTH = int(os.getenv('LYNUS_FETCH_MAX_DEPTH', 2))
+MAX_STYLESHEETS = int(os.getenv('LYNUS_FETCH_MAX_STYLESHEETS', 10))
+WORKERS = int(os.getenv('LYNUS_FETCH_WORKERS', 8))
+ALLOW_PRIVATE = os.getenv('LYNUS_FETCH_ALLOW_PRIVATE', '0') == '1'
+CACHE_DIR = os.path.join(artifact_store.ARTIFACT_DIR, 'http_cache')
+CACHE_MAX_BYTES = int(os.getenv('LYNUS_FETCH_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+CACHE_MAX_AGE = int(os.getenv('LYNUS_FETCH_CACHE_MAX_AGE', 7 * 24 * 3600))
+# 新寫入的緩存超過上限的1/10，或距上次清理超過此秒數時掃描緩存目錄
+CACHE_EVICT_INTERVAL = 300
+USER_AGENT = 'LynusAgent/1.0 (+webpage analysis)'
+
+READ_CHUNK = 64 * 1024
+MAX_REDIRECTS = 5
+# 文本摘要和樣式分析保留的最大長度
+SUMMARY_CHARS = 500
+MAX_CSS_CHARS = 512 * 1024
+MAX_HEADINGS = 50
+
+LANDMARK_TAGS = ('header', 'nav', 'main', 'section', 'article', 'aside', 'footer')
+SKIP_TEXT_TAGS = {'script', 'style', 'noscript', 'template', 'svg'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+             'param', 'source', 'track', 'wbr'}
+
+COLOR_RE = re.compile(r'#[0-9a-fA-F]{6}\b|#[0-9a-fA-F]{3}\b|(?:rgba?|hsla?)\([^)]*\)')
+FONT_RE = re.compile(r'font-family\s*:\s*([^;}{]+)', re.IGNORECASE)
+MEDIA_RE = re.compile(r'@media\b', re.IGNORECASE)
+CSS_VAR_RE = re.compile(r'(?<![\w-])--[\w-]+\s*:')
+
+
+class FetchError(Exception):
+    """頁面無法抓取（地址無效、被拒絕、網絡錯誤或狀態碼錯誤）"""
+
+
+# ---------- HTTP ----------
+
+_session: Optional[requests.Session] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_stats = Counter()
+# 上次清理以來新寫入緩存的字節數和清理時間
+_cache_added = 0
+_last_evict = time.monotonic()
+_evict_lock = threading.Lock()
+
+
+def _count(**values: int) -> None:
+    with _lock:
+        _stats.update(values)
+
+
+def _resolve(host: str, port: int) -> List[str]:
+    """解析主機地址；不允許內網地址時，任一地址不合格即拒絕"""
+    addresses = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    ips = []
+    for address in addresses:
+        ip = address[4][0]
+        if not ALLOW_PRIVATE:
+            parsed = ipaddress.ip_address(ip.split('%')[0])
+            if parsed.is_private or parsed.is_loopback or parsed.is_link_local or parsed.is_reserved or parsed.is_multicast:
+                raise FetchError(f"Refusing to fetch private address {parsed} ({host})")
+        if ip not in ips:
+            ips.append(ip)
+    return ips
+
+
+class _PinnedConnectionMixin:
+    """只解析一次主機名，檢查後直接連接解析出的地址"""
+
+    def _new_conn(self):
+        try:
+            ips = _resolve(self.host, self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+
+        error = None
+        for ip in ips:
+            try:
+                return create_connection((ip, self.port), self.timeout,
+                                         source_address=self.source_address,
+                                         socket_options=self.socket_options)
+            except socket.timeout as e:
+                error = ConnectTimeoutError(
+                    self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})")
+                error.__cause__ = e
+            except OSError as e:
+                error = NewConnectionError(self, f"Failed to establish a new connection: {e}")
+                error.__cause__ = e
+        raise error
+
+
+class _PinnedHTTPConnection(_PinnedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _PinnedHTTPSConnection(_PinnedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _PinnedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _PinnedHTTPConnection
+
+
+class _PinnedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _PinnedHTTPSConnection
+
+
+class _PinnedAdapter(HTTPAdapter):
+    """直接連接（不經代理）時使用檢查過地址的連接池"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _PinnedHTTPConnectionPool,
+            'https': _PinnedHTTPSConnectionPool,
+        }
+
+
+def _get_session() -> requests.Session:
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = _PinnedAdapter(pool_connections=WORKERS, pool_maxsize=WORKERS * 2, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _session = session
+        return _session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='lynus-fetch')
+        return _executor
+
+
+def _check_url(url: str) -> None:
+    """只檢查地址格式；主機地址在連接時由 _PinnedAdapter 檢查"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise FetchError(f"Only http(s) URLs are supported: {url}")
+
+
+# ---------- 響應緩存 ----------
+
+def _cache_path(url: str) -> str:
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, key[:2], key + '.json')
+
+
+def _cache_get(url: str) -> Optional[Dict[str, Any]]:
+    path = _cache_path(url)
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not artifact_store.get(entry.get('artifact', '')):
+        return None
+    # 修改時間記錄最近一次使用，清理時按此淘汰
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entry
+
+
+def _cache_put(url: str, entry: Dict[str, Any], added: int = 0) -> None:
+    """寫入緩存條目；added 為新存入產物的響應體大小"""
+    path = _cache_path(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+    global _cache_added, _last_evict
+    with _lock:
+        _cache_added += added
+        if _cache_added < CACHE_MAX_BYTES // 10 and time.monotonic() - _last_evict < CACHE_EVICT_INTERVAL:
+            return
+        _cache_added = 0
+        _last_evict = time.monotonic()
+    evict_cache()
+
+
+def evict_cache(max_bytes: Optional[int] = None, max_age: Optional[int] = None) -> Dict[str, int]:
+    """
+    刪除超過 max_age 秒未使用的緩存條目，再按最近使用時間淘汰到總大小不超過
+    max_bytes；響應體產物在沒有其他條目引用且不屬於任何用戶時一起刪除。
+    """
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_age = CACHE_MAX_AGE if max_age is None else max_age
+    stats = {'entries': 0, 'evicted': 0, 'artifacts': 0}
+    # 同一進程內只有一個線程在清理
+    if not _evict_lock.acquire(blocking=False):
+        return stats
+
+    try:
+        entries = []
+        refs = Counter()
+        for dirpath, _, filenames in os.walk(CACHE_DIR):
+            for name in filenames:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    mtime = os.path.getmtime(path)
+                    with open(path) as f:
+                        entry = json.load(f)
+                    artifact = entry.get('artifact', '')
+                    size = int(entry.get('response', {}).get('size', 0))
+                except (OSError, ValueError, TypeError, AttributeError):
+                    continue
+                entries.append((mtime, path, artifact, size))
+                refs[artifact] += 1
+
+        entries.sort()
+        total = sum(size for _, _, _, size in entries)
+        cutoff = time.time() - max_age
+        stats['entries'] = len(entries)
+        for mtime, path, artifact, size in entries:
+            if mtime >= cutoff and total <= max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            refs[artifact] -= 1
+            stats['evicted'] += 1
+            # 相同內容的響應共用一個產物，最後一個引用刪除時才刪除產物
+            if refs[artifact] == 0 and artifact_store.delete_unowned(artifact):
+                stats['artifacts'] += 1
+    finally:
+        _evict_lock.release()
+
+    if stats['evicted']:
+        _count(cache_evicted=stats['evicted'])
+    return stats
+
+
+def _max_age(headers) -> Optional[int]:
+    """解析 Cache-Control；no-store 返回 None（不緩存），無 max-age 時為0（每次重新驗證）"""
+    directives = [d.strip().lower() for d in headers.get('Cache-Control', '').split(',') if d.strip()]
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+    for directive in directives:
+        if directive.startswith('max-age='):
+            try:
+                return max(int(directive[8:]), 0)
+            except ValueError:
+                return 0
+    expires = headers.get('Expires')
+    date = headers.get('Date')
+    if expires and date:
+        try:
+            return max(int((parsedate_to_datetime(expires) - parsedate_to_datetime(date)).total_seconds()), 0)
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+def _cached_chunks(entry: Dict[str, Any]):
+    path, _ = artifact_store.get(entry['artifact'])
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(READ_CHUNK), b'')
+
+
+def fetch(url: str, sink: Callable[[bytes], None], accept: str = '*/*',
+          on_headers: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    抓取 url，響應體按塊交給 sink（邊下載邊解析）；返回響應元數據。
+    on_headers 在響應體之前以 Content-Type 調用（可拋出 FetchError 拒絕該響應）。
+    cache 字段為 fresh（未發請求）、revalidated（304）或 miss。
+    """
+    start = time.monotonic()
+    entry = _cache_get(url)
+    if entry and time.time() - entry['stored_at'] < entry['max_age']:
+        if on_headers:
+            on_headers(entry['response']['content_type'])
+        for chunk in _cached_chunks(entry):
+            sink(chunk)
+        _count(fetches=1, cache_fresh=1)
+        return dict(entry['response'], cache='fresh', elapsed=round(time.monotonic() - start, 3))
+
+    headers = {'Accept': accept}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    session = _get_session()
+    current = url
+    for _ in range(MAX_REDIRECTS + 1):
+        _check_url(current)
+        remaining = TIMEOUT - (time.monotonic() - start)
+        if remaining <= 0:
+            raise FetchError(f"Timed out fetching {url}")
+        try:
+            response = session.get(current, headers=headers, stream=True, allow_redirects=False,
+                                   timeout=(min(remaining, 5), remaining))
+        except FetchError:
+            # 連接時地址檢查失敗
+            _count(fetches=1, errors=1)
+            raise
+        except requests.RequestException as e:
+            _count(fetches=1, errors=1)
+            raise FetchError(f"Failed to fetch {current}: {e}")
+        if response.is_redirect:
+            # 手動跟隨重定向，每一跳都檢查地址
+            current = urljoin(current, response.headers['Location'])
+            response.close()
+            continue
+        break
+    else:
+        raise FetchError(f"Too many redirects fetching {url}")
+
+    with response:
+        if response.status_code == 304 and entry:
+            entry['stored_at'] = time.time()
+            entry['max_age'] = _max_age(response.headers) or entry['max_age']
+            _cache_put(url, entry)
+            if on_headers:
+                on_headers(entry['response']['content_type'])
+            for chunk in _cached_chunks(entry):
+                sink(chunk)
+            _count(fetches=1, cache_revalidated=1)
+            return dict(entry['response'], cache='revalidated', elapsed=round(time.monotonic() - start, 3))
+        if response.status_code >= 400:
+            _count(fetches=1, errors=1)
+            raise FetchError(f"HTTP {response.status_code} fetching {current}")
+
+        if on_headers:
+            on_headers(response.headers.get('Content-Type', ''))
+        body = []
+        size = 0
+        truncated = False
+        try:
+            for chunk in response.iter_content(READ_CHUNK):
+                if size + len(chunk) > MAX_BYTES:
+                    chunk = chunk[:MAX_BYTES - size]
+                    truncated = True
+                size += len(chunk)
+                body.append(chunk)
+                sink(chunk)
+                if truncated:
+                    break
+                if time.monotonic() - start > TIMEOUT:
+                    truncated = True
+                    break
+        except requests.RequestException as e:
+            _count(fetches=1, errors=1)
+            raise FetchError(f"Failed to read {current}: {e}")
+
+    meta = {
+        'url': current,
+        'status': response.status_code,
+        'content_type': response.headers.get('Content-Type', ''),
+        'size': size,
+        'truncated': truncated,
+    }
+    max_age = _max_age(response.headers)
+    if max_age is not None and not truncated:
+        artifact = artifact_store.put_bytes(b''.join(body), meta['content_type'].split(';')[0] or 'application/octet-stream')
+        _cache_put(url, {
+            'artifact': artifact['hash'],
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'stored_at': time.time(),
+            'max_age': max_age,
+            'response': meta,
+        }, added=size)
+    _count(fetches=1, cache_miss=1, bytes=size)
+    return dict(meta, cache='miss', elapsed=round(time.monotonic() - start, 3))
+
+
+# ---------- 解析 ----------
+
+def _charset(content_type: str) -> str:
+    match = re.search(r'charset=([\w-]+)', content_type or '', re.IGNORECASE)
+    if match:
+        try:
+            codecs.lookup(match.group(1))
+            return match.group(1)
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+class PageParser(HTMLParser):
+    """流式 HTML 解析器：邊接收數據邊統計結構、樣式和文本"""
+
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.title = ''
+        self.description = ''
+        self.lang = ''
+        self.headings: List[Tuple[int, str]] = []
+        self.tags = Counter()
+        self.links: List[str] = []
+        self.stylesheets: List[str] = []
+        self.scripts = 0
+        self.images = 0
+        self.images_without_alt = 0
+        self.forms = 0
+        self.css: List[str] = []
+        self._css_size = 0
+        self.text_chars = 0
+        self.words = 0
+        self._summary: List[str] = []
+        self._summary_size = 0
+        self._stack: List[str] = []
+        self._skip_depth = 0
+        self._heading: Optional[List[Any]] = None
+        self._in_title = False
+        self._in_style = False
+
+    def _add_css(self, text: str) -> None:
+        if self._css_size < MAX_CSS_CHARS:
+            text = text[:MAX_CSS_CHARS - self._css_size]
+            self.css.append(text)
+            self._css_size += len(text)
+
+    def _resolve(self, href: Optional[str]) -> Optional[str]:
+        if not href or href.startswith(('javascript:', 'mailto:', 'tel:', 'data:')):
+            return None
+        return urldefrag(urljoin(self.base_url, href.strip()))[0]
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        self.tags[tag] += 1
+        if tag not in VOID_TAGS:
+            self._stack.append(tag)
+        if tag in SKIP_TEXT_TAGS:
+            self._skip_depth += 1
+        if attrs.get('style'):
+            self._add_css(attrs['style'])
+
+        if tag == 'html':
+            self.lang = attrs.get('lang') or ''
+        elif tag == 'title':
+            self._in_title = True
+        elif tag == 'style':
+            self._in_style = True
+        elif tag == 'base' and attrs.get('href'):
+            self.base_url = urljoin(self.base_url, attrs['href'])
+        elif tag == 'meta' and (attrs.get('name') or '').lower() == 'description':
+            self.description = (attrs.get('content') or '').strip()
+        elif tag == 'link' and 'stylesheet' in (attrs.get('rel') or '').lower().split():
+            url = self._resolve(attrs.get('href'))
+            if url:
+                self.stylesheets.append(url)
+        elif tag == 'a':
+            url = self._resolve(attrs.get('href'))
+            if url:
+                self.links.append(url)
+        elif tag == 'img':
+            self.images += 1
+            if not (attrs.get('alt') or '').strip():
+                self.images_without_alt += 1
+        elif tag == 'script':
+            self.scripts += 1
+        elif tag == 'form':
+            self.forms += 1
+        elif tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+            self._heading = [int(tag[1]), []]
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in self._stack:
+            return
+        # 容忍未閉合的標籤：彈出到匹配的開始標籤為止
+        while self._stack:
+            open_tag = self._stack.pop()
+            if open_tag in SKIP_TEXT_TAGS:
+                self._skip_depth -= 1
+            if open_tag == 'title':
+                self._in_title = False
+            elif open_tag == 'style':
+                self._in_style = False
+            elif open_tag.startswith('h') and open_tag[1:].isdigit() and self._heading:
+                text = ' '.join(''.join(self._heading[1]).split())
+                if text and len(self.headings) < MAX_HEADINGS:
+                    self.headings.append((self._heading[0], text))
+                self._heading = None
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self._in_style:
+            self._add_css(data)
+            return
+        if self._skip_depth:
+            return
+        if self._heading is not None:
+            self._heading[1].append(data)
+        text = data.strip()
+        if not text:
+            return
+        self.text_chars += len(text)
+        self.words += len(text.split())
+        if self._summary_size < SUMMARY_CHARS:
+            piece = ' '.join(text.split())[:SUMMARY_CHARS - self._summary_size]
+            self._summary.append(piece)
+            self._summary_size += len(piece) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        origin = urlsplit(self.base_url).netloc
+        internal = [link for link in self.links if urlsplit(link).netloc == origin]
+        return {
+            'title': ' '.join(self.title.split()),
+            'description': self.description,
+            'lang': self.lang,
+            'headings': [{'level': level, 'text': text} for level, text in self.headings],
+            'landmarks': {tag: self.tags[tag] for tag in LANDMARK_TAGS if self.tags[tag]},
+            'elements': sum(self.tags.values()),
+            'top_tags': dict(self.tags.most_common(10)),
+            'links': {'internal': len(internal), 'external': len(self.links) - len(internal)},
+            'images': {'total': self.images, 'without_alt': self.images_without_alt},
+            'scripts': self.scripts,
+            'stylesheets': len(self.stylesheets),
+            'forms': self.forms,
+            'text': {'chars': self.text_chars, 'words': self.words, 'summary': ' '.join(self._summary)},
+        }
+
+
+def analyze_css(css: str) -> Dict[str, Any]:
+    colors = Counter(color.lower().replace(' ', '') for color in COLOR_RE.findall(css))
+    fonts = Counter(' '.join(font.split()).strip('\'" ') for font in FONT_RE.findall(css))
+    return {
+        'colors': [color for color, _ in colors.most_common(10)],
+        'fonts': [font for font, _ in fonts.most_common(5)],
+        'media_queries': len(MEDIA_RE.findall(css)),
+        'custom_properties': len(CSS_VAR_RE.findall(css)),
+        'chars': len(css),
+    }
+
+
+def _fetch_page(url: str) -> Tuple[Dict[str, Any], PageParser]:
+    parser = PageParser(url)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def on_headers(content_type: str) -> None:
+        nonlocal decoder
+        if content_type and 'html' not in content_type:
+            raise FetchError(f"Not an HTML page ({content_type}): {url}")
+        decoder = codecs.getincrementaldecoder(_charset(content_type))(errors='replace')
+
+    meta = fetch(url, lambda chunk: parser.feed(decoder.decode(chunk)),
+                 accept='text/html,application/xhtml+xml;q=0.9,*/*;q=0.5', on_headers=on_headers)
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    return meta, parser
+
+
+def _fetch_stylesheet(url: str) -> Tuple[Dict[str, Any], str]:
+    parts: List[str] = []
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def on_headers(content_type: str) -> None:
+        nonlocal decoder
+        decoder = codecs.getincrementaldecoder(_charset(content_type))(errors='replace')
+
+    meta = fetch(url, lambda chunk: parts.append(decoder.decode(chunk)), accept='text/css,*/*;q=0.1',
+                 on_headers=on_headers)
+    parts.append(decoder.decode(b'', final=True))
+    return meta, ''.join(parts)[:MAX_CSS_CHARS]
+
+
+# ---------- 分析入口 ----------
+
+def _same_origin(url: str, origin: str) -> bool:
+    parts = urlsplit(url)
+    return parts.scheme in ('http', 'https') and parts.netloc == origin
+
+
+def analyze(url: str, depth: int = 0, include_resources: bool = False, max_pages: int = MAX_PAGES,
+            on_progress: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    抓取並分析 url；depth > 0 時按層併發抓取同源鏈接，include_resources 時抓取同源樣式表。
+    on_progress 在每個抓取完成後調用（可拋出異常中止，如任務取消）。
+    起始頁抓取失敗時拋出 FetchError，其餘頁面的錯誤記錄在結果中。
+    """
+    start = time.monotonic()
+    url = urldefrag(url.strip())[0]
+    _check_url(url)
+    origin = urlsplit(url).netloc
+    depth = max(0, min(int(depth), MAX_DEPTH))
+    max_pages = max(1, min(int(max_pages), MAX_PAGES))
+    executor = _get_executor()
+
+    pages: List[Dict[str, Any]] = []
+    errors: List[Dict[str, str]] = []
+    parsers: List[PageParser] = []
+    cache = Counter()
+    seen = {url}
+    level = [url]
+
+    for current_depth in range(depth + 1):
+        futures = {executor.submit(_fetch_page, page_url): page_url for page_url in level}
+        next_level: List[str] = []
+        try:
+            for future in as_completed(futures):
+                page_url = futures[future]
+                try:
+                    meta, parser = future.result()
+                except FetchError as e:
+                    if page_url == url:
+                        raise
+                    errors.append({'url': page_url, 'error': str(e)})
+                    continue
+                finally:
+                    if on_progress:
+                        on_progress()
+                cache[meta['cache']] += 1
+                parsers.append(parser)
+                pages.append(dict(parser.summary(), url=page_url, depth=current_depth, status=meta['status'],
+                                  size=meta['size'], truncated=meta['truncated'], cache=meta['cache'],
+                                  elapsed=meta['elapsed']))
+                for link in parser.links:
+                    if link not in seen and _same_origin(link, origin):
+                        seen.add(link)
+                        next_level.append(link)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        remaining = max_pages - len(pages) - len(errors)
+        level = next_level[:max(remaining, 0)]
+        if not level:
+            break
+
+    css = [''.join(parser.css) for parser in parsers]
+    stylesheets: List[str] = []
+    if include_resources:
+        for parser in parsers:
+            for link in parser.stylesheets:
+                if link not in stylesheets and _same_origin(link, origin):
+                    stylesheets.append(link)
+        stylesheets = stylesheets[:MAX_STYLESHEETS]
+        futures = {executor.submit(_fetch_stylesheet, link): link for link in stylesheets}
+        for future in as_completed(futures):
+            try:
+                meta, text = future.result()
+            except FetchError as e:
+                errors.append({'url': futures[future], 'error': str(e)})
+                continue
+            finally:
+                if on_progress:
+                    on_progress()
+            cache[meta['cache']] += 1
+            css.append(text)
+
+    pages.sort(key=lambda page: (page['depth'], page['url'] != url, page['url']))
+    return {
+        'url': url,
+        'pages': pages,
+        'styles': analyze_css('\n'.join(css)),
+        'stylesheets_fetched': len(stylesheets),
+        'errors': errors,
+        'cache': dict(cache),
+        'elapsed_seconds': round(time.monotonic() - start, 3),
+    }
+
+
+def get_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)